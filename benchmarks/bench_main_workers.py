@@ -0,0 +1,96 @@
+"""Benchmark task preparation of ``ink.vasp.main`` against the worker count.
+
+A stub ``vaspkit`` that sleeps for ``--latency`` seconds stands in for the
+real binary, and tasks carry no jobscript so nothing is submitted.
+``global.native_inputs`` is off so the vaspkit commands actually run the
+stub instead of being handled in-process by native.py. Run with
+
+    python benchmarks/bench_main_workers.py --tasks 50 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import shutil
+import stat
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+from typer.testing import CliRunner
+
+from ink.vasp.main import app
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _write_stub_vaspkit(bin_dir: Path, latency: float) -> None:
+    stub = bin_dir / "vaspkit"
+    stub.write_text(f"#!/bin/sh\nsleep {latency}\n", encoding="utf-8")
+    stub.chmod(stub.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _write_config(work_dir: Path, n_tasks: int) -> Path:
+    data_dir = work_dir / "data"
+    data_dir.mkdir()
+    shutil.copyfile(REPO_ROOT / "data" / "POSCAR", data_dir / "POSCAR")
+
+    # The KPOINTS/POTCAR commands must reach the stub, not native.py
+    config: dict = {"global": {"work_dir": str(work_dir), "native_inputs": False}}
+    for i in range(n_tasks):
+        config[f"task{i:04d}"] = {
+            "poscar": "data/POSCAR",
+            "potcar": "vaspkit -task 103",
+            "kpoints": "vaspkit -task 102 -kpr 0.03",
+            "incar": {"ENCUT": 500, "ISMEAR": 0},
+        }
+
+    config_path = work_dir / "vasp_config.yaml"
+    config_path.write_text(yaml.safe_dump(config, sort_keys=False), encoding="utf-8")
+    return config_path
+
+
+def run(n_tasks: int, workers: int, latency: float) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        bin_dir = tmp_dir / "bin"
+        bin_dir.mkdir()
+        work_dir = tmp_dir / "work"
+        work_dir.mkdir()
+
+        _write_stub_vaspkit(bin_dir, latency)
+        config_path = _write_config(work_dir, n_tasks)
+
+        env = {"PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"}
+        cwd = os.getcwd()
+        start = time.perf_counter()
+        try:
+            result = CliRunner().invoke(
+                app, ["-c", str(config_path), "-y", "-j", str(workers)], env=env
+            )
+        finally:
+            os.chdir(cwd)
+        elapsed = time.perf_counter() - start
+
+        if result.exit_code != 0:
+            raise RuntimeError(result.output) from result.exception
+        return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+    for workers in args.workers:
+        elapsed = run(args.tasks, workers, args.latency)
+        baseline = baseline or elapsed
+        print(f"{workers:>8d} {elapsed:>10.3f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
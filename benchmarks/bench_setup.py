@@ -0,0 +1,298 @@
+"""End-to-end job-setup benchmark for ``ink vaspjobs`` and ``ink.vasp.main``.
+
+Every run builds a scratch tree with N synthetic structures (randomly
+displaced copies of ``data/POSCAR``), a config using ``data/POTCAR``, and
+stub ``qsub``/``qstat``/``vaspkit`` executables on PATH, then runs one
+scenario in a fresh interpreter with cold caches:
+
+- ``batch``: ``ink vaspjobs batch structures --stage relax -y`` (PBS arrays),
+- ``main``: ``python -m ink.vasp.main -y`` with one task per structure.
+
+Reported per scenario and size: wall time, files written, bytes written
+(new regular files, hardlinks counted once) and peak RSS of the process
+tree. Results can be stored as a baseline and compared later::
+
+    python benchmarks/bench_setup.py --sizes 10 100 --save-baseline
+    python benchmarks/bench_setup.py --sizes 10 100 --compare
+
+``--compare`` exits non-zero when a run is slower than the baseline by
+more than ``--time-tolerance``, uses more memory than ``--memory-tolerance``
+allows, or writes more files or bytes than the baseline. ``--repeat 3``
+keeps the fastest of three runs, which steadies the times of small sizes.
+
+The ``batch`` scenario writes task directories with one process per CPU,
+so its times only compare between hosts with the same CPU count. When the
+baseline's ``cpus`` differ from this host, ``--compare`` skips the time
+check of ``batch`` and still guards its files, bytes, memory and qsub calls.
+"""
+
+import argparse
+import json
+import os
+import random
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = REPO_ROOT / "data"
+BASELINE = Path(__file__).with_name("setup_baseline.json")
+
+SCENARIOS = ("batch", "main")
+
+# Scenarios whose wall time scales with os.cpu_count()
+PARALLEL_SCENARIOS = ("batch",)
+
+JOBSCRIPT = """#!/bin/bash
+#PBS -l walltime=1:00:00
+#PBS -l nodes=1:ppn=4
+cd ${PBS_O_WORKDIR}
+mpirun vasp_std > log.dat
+"""
+
+STUBS = {
+    # Prints a PBS-style job id; counts calls so the report can show them
+    "qsub": '#!/bin/sh\necho x >> "$INK_BENCH_CALLS"\nprintf "%07d.bench\\n" $$\n',
+    "qstat": "#!/bin/sh\nexit 0\n",
+    "qdel": "#!/bin/sh\nexit 0\n",
+    # -task 103 writes POTCAR, -task 102 writes KPOINTS
+    "vaspkit": (
+        "#!/bin/sh\n"
+        'case "$*" in\n'
+        f'  *103*) cp "{DATA_DIR / "POTCAR"}" POTCAR ;;\n'
+        "  *102*) printf 'auto\\n0\\nGamma\\n6 6 6\\n0 0 0\\n' > KPOINTS ;;\n"
+        "esac\n"
+    ),
+}
+
+
+def _write_stubs(bin_dir: Path) -> None:
+    bin_dir.mkdir()
+    for name, text in STUBS.items():
+        path = bin_dir / name
+        path.write_text(text)
+        path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _write_structures(target: Path, n: int, seed: int = 0) -> None:
+    """``n`` POSCARs with the atoms of data/POSCAR displaced by up to 0.02 (fractional)."""
+    lines = (DATA_DIR / "POSCAR").read_text().splitlines()
+    natoms = sum(int(x) for x in lines[6].split())
+    first = 8
+    rng = random.Random(seed)
+    target.mkdir()
+    for i in range(n):
+        out = list(lines)
+        out[0] = f"synthetic-{i:05d}"
+        for j in range(first, first + natoms):
+            coords = [float(x) + rng.uniform(-0.02, 0.02) for x in lines[j].split()[:3]]
+            out[j] = "  " + "  ".join(f"{c:.10f}" for c in coords)
+        (target / f"POSCAR_{i:05d}").write_text("\n".join(out) + "\n")
+
+
+def _matching_potcar() -> bytes:
+    """A Li/Sb/Te POTCAR for data/POSCAR made from the Sb dataset of data/POTCAR.
+
+    batch refuses a POTCAR whose species differ from the structure's;
+    Li and Te have two-letter symbols like Sb, so the size stays the same.
+    """
+    data = (DATA_DIR / "POTCAR").read_bytes()
+    end = data.index(b"End of Dataset")
+    sb = data[: data.index(b"\n", end) + 1]
+    return b"".join(
+        sb.replace(b" Sb ", f" {el} ".encode()).replace(b"=Sb:", f"={el}:".encode())
+        for el in ("Li", "Sb", "Te")
+    )
+
+
+def _write_batch_config(root: Path) -> None:
+    config = {
+        "global": {"work_dir": "./", "scheduler": "pbs"},
+        "relax": {
+            "poscar": "data/POSCAR",
+            "potcar": "data/POTCAR",
+            "kpoints": 0.03,
+            "incar": {"ENCUT": 500, "ISMEAR": 0, "SIGMA": 0.02, "NSW": 100, "IBRION": 2},
+            "jobscript": JOBSCRIPT,
+        },
+    }
+    (root / "vasp_config.yaml").write_text(yaml.safe_dump(config, sort_keys=False))
+
+
+def _write_main_config(root: Path, n: int) -> None:
+    config: dict = {"global": {"work_dir": str(root / "work"), "scheduler": "pbs"}}
+    for i in range(n):
+        config[f"task{i:05d}"] = {
+            "poscar": f"../structures/POSCAR_{i:05d}",
+            "potcar": "vaspkit -task 103",
+            "kpoints": "vaspkit -task 102 -kpr 0.03",
+            "incar": {"ENCUT": 500, "ISMEAR": 0},
+            "jobscript": JOBSCRIPT,
+        }
+    (root / "main.yaml").write_text(yaml.safe_dump(config, sort_keys=False))
+
+
+def prepare(root: Path, scenario: str, n: int) -> list:
+    """Write inputs for ``scenario`` below ``root`` and return the command to run."""
+    data = root / "data"
+    data.mkdir()
+    for name in ("POSCAR", "POTCAR"):
+        (data / name).write_bytes((DATA_DIR / name).read_bytes())
+    _write_structures(root / "structures", n)
+    _write_stubs(root / "bin")
+
+    if scenario == "batch":
+        (data / "POTCAR").write_bytes(_matching_potcar())
+        _write_batch_config(root)
+        return [sys.executable, "-c", "from ink import app; app()",
+                "vaspjobs", "batch", "structures", "--stage", "relax", "-y"]
+    _write_main_config(root, n)
+    return [sys.executable, "-m", "ink.vasp.main", "-c", str(root / "main.yaml"), "-y"]
+
+
+def _snapshot(root: Path) -> Dict[str, int]:
+    """Path -> inode of every file below ``root``."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            files[path] = os.lstat(path).st_ino
+    return files
+
+
+def _written(root: Path, before: Dict[str, int]) -> Dict[str, int]:
+    after = _snapshot(root)
+    # Only inodes still behind their old path are old data; replaced files free
+    # their inode for reuse by new files
+    old_inodes = {inode for path, inode in before.items() if after.get(path) == inode}
+    seen = set()
+    files = written = 0
+    for path, inode in after.items():
+        if path in before:
+            continue
+        files += 1
+        st = os.lstat(path)
+        if stat.S_ISREG(st.st_mode) and inode not in old_inodes and inode not in seen:
+            seen.add(inode)
+            written += st.st_size
+    return {"files": files, "bytes": written}
+
+
+def run(scenario: str, n: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="ink-bench-") as tmp:
+        root = Path(tmp)
+        cmd = prepare(root, scenario, n)
+        cache = root / "cache"
+        env = dict(
+            os.environ,
+            PATH=f"{root / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}",
+            INK_BENCH_CALLS=str(root / "qsub.calls"),
+            INK_JOBDB=str(cache / "jobs.sqlite"),
+            INK_CONFIG_CACHE=str(cache / "config"),
+            INK_KPATH_CACHE=str(cache / "kpaths"),
+        )
+        env.pop("INK_STRUCTURE_CACHE", None)
+
+        before = _snapshot(root)
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=root, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = proc.stdout.read()
+        # wait4 reports the peak RSS of the process tree below the child
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{scenario} n={n} failed:\n{output.decode(errors='replace')[-4000:]}")
+
+        result = _written(root, before)
+        calls = root / "qsub.calls"
+        result.update(
+            seconds=elapsed,
+            peak_rss_mb=usage.ru_maxrss / 1024,
+            qsub_calls=len(calls.read_text().splitlines()) if calls.exists() else 0,
+        )
+        return result
+
+
+def compare(result: dict, base: dict, time_tol: float, memory_tol: float, check_time: bool = True) -> list:
+    """Regressions of ``result`` against ``base`` as readable strings."""
+    problems = []
+    if check_time and result["seconds"] > base["seconds"] * (1 + time_tol):
+        problems.append(f"time {result['seconds']:.2f}s > {base['seconds']:.2f}s +{time_tol:.0%}")
+    if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + memory_tol):
+        problems.append(f"peak RSS {result['peak_rss_mb']:.0f}MB > {base['peak_rss_mb']:.0f}MB +{memory_tol:.0%}")
+    for key in ("files", "bytes", "qsub_calls"):
+        if result[key] > base[key]:
+            problems.append(f"{key} {result[key]} > {base[key]}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.15)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario and size; the fastest counts")
+    args = parser.parse_args()
+
+    baseline: Optional[dict] = None
+    same_cpus = True
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        same_cpus = baseline.get("cpus") == os.cpu_count()
+        if not same_cpus and set(args.scenarios) & set(PARALLEL_SCENARIOS):
+            print(
+                f"Note: baseline was recorded with {baseline.get('cpus')} CPUs, this host has "
+                f"{os.cpu_count()}; times of {', '.join(PARALLEL_SCENARIOS)} are not compared."
+            )
+
+    results: dict = {}
+    failures = []
+    print(f"{'scenario':<8} {'tasks':>6} {'seconds':>8} {'tasks/s':>8} {'files':>7} {'MB written':>10} {'peak MB':>8} {'qsub':>5}")
+    for scenario in args.scenarios:
+        for n in args.sizes:
+            key = f"{scenario}/{n}"
+            result = min((run(scenario, n) for _ in range(max(1, args.repeat))), key=lambda r: r["seconds"])
+            results[key] = result
+            line = (
+                f"{scenario:<8} {n:>6d} {result['seconds']:>8.2f} {n / result['seconds']:>8.1f} "
+                f"{result['files']:>7d} {result['bytes'] / 1e6:>10.2f} {result['peak_rss_mb']:>8.0f} "
+                f"{result['qsub_calls']:>5d}"
+            )
+            if baseline is not None:
+                if key in baseline["results"]:
+                    check_time = same_cpus or scenario not in PARALLEL_SCENARIOS
+                    problems = compare(
+                        result, baseline["results"][key], args.time_tolerance, args.memory_tolerance, check_time
+                    )
+                    line += "  " + ("; ".join(problems) if problems else "ok")
+                    failures += [f"{key}: {p}" for p in problems]
+                else:
+                    line += "  (no baseline)"
+            print(line)
+
+    if args.save_baseline:
+        stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"results": {}}
+        stored["results"].update(results)
+        stored["python"] = sys.version.split()[0]
+        stored["cpus"] = os.cpu_count()
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if failures:
+        print("Regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark ``ink`` CLI startup and guard against heavy imports.
+
+Each command runs in a fresh interpreter. The script fails if ``import ink``
+loads any of the heavy scientific packages, if ``ink vaspjobs --help``
+loads pymatgen or the other scientific packages (ink.vasp.jobs itself is
+expected there), or if a command's median time exceeds ``--max-seconds``.
+Run with
+
+    python benchmarks/bench_startup.py --repeat 10 --max-seconds 0.5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = [
+    ["--help"],
+    ["hello"],
+    ["vaspjobs", "--help"],
+]
+
+# Must not be imported by `import ink` or `ink --help`
+HEAVY_MODULES = ("pymatgen", "ase", "f90nml", "numpy", "spglib", "ink.vasp.jobs")
+
+# Must not be imported by `ink vaspjobs --help` either: jobs.py imports them
+# inside the methods that write inputs
+HEAVY_FOR_VASPJOBS = tuple(m for m in HEAVY_MODULES if m != "ink.vasp.jobs")
+
+
+def time_command(args, repeat: int) -> float:
+    cmd = [sys.executable, "-c", "from ink import app; app()", *args]
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def heavy_imports(args=None, modules=HEAVY_MODULES) -> list:
+    """Heavy ``modules`` loaded by ``import ink``, or by running ``ink <args>``."""
+    code = (
+        "import contextlib, io, sys, ink\n"
+        f"args = {args!r}\n"
+        "if args is not None:\n"
+        "    with contextlib.redirect_stdout(io.StringIO()):\n"
+        "        try:\n"
+        "            ink.app(args, prog_name='ink')\n"
+        "        except SystemExit:\n"
+        "            pass\n"
+        f"print(' '.join(m for m in {modules!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, stdout=subprocess.PIPE, text=True
+    )
+    return result.stdout.split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    failed = False
+    loaded = heavy_imports()
+    if loaded:
+        print(f"FAIL: `import ink` loads {', '.join(loaded)}")
+        failed = True
+    loaded = heavy_imports(["vaspjobs", "--help"], HEAVY_FOR_VASPJOBS)
+    if loaded:
+        print(f"FAIL: `ink vaspjobs --help` loads {', '.join(loaded)}")
+        failed = True
+
+    print(f"{'command':<24} {'median s':>10}")
+    for command in COMMANDS:
+        elapsed = time_command(command, args.repeat)
+        label = "ink " + " ".join(command)
+        over = args.max_seconds is not None and elapsed > args.max_seconds
+        print(f"{label:<24} {elapsed:>10.3f}{'  FAIL' if over else ''}")
+        failed = failed or over
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
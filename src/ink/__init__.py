@@ -1,12 +1,17 @@
 import typer
 
 from .dotfiles import run_dotbot as _run_dotbot
-from .tools import app as tools_app
-from .ShengBTE import app as shengbte_app
+from .lazy import lazy_group
 
-from .vasp.jobs import app as vaspjobs_app
+# Subcommand groups pull in pymatgen/ASE/f90nml, so they are imported only
+# when run: name -> ("module:app", help shown by `ink --help`)
+SUBCOMMANDS = {
+    "shengbte": ("ink.ShengBTE:app", "ink.ShengBTE command-line interface"),
+    "tools": ("ink.tools:app", "ink.tools command-line interface"),
+    "vaspjobs": ("ink.vasp.jobs:app", "vasp jobs command-line interface"),
+}
 
-app = typer.Typer(help="Ink CLI")
+app = typer.Typer(help="Ink CLI", cls=lazy_group(SUBCOMMANDS))
 
 
 @app.command()
@@ -19,12 +24,3 @@ def dotbot() -> None:
 def hello(name: str = "world") -> None:
     """Print a friendly greeting."""
     typer.echo(f"Hello, {name}!")
-
-# Register ShengBTE subcommand group: `ink shengbte ...`
-app.add_typer(shengbte_app, name="shengbte")
-
-# Register tools subcommand group: `ink tools ...`
-app.add_typer(tools_app, name="tools")
-
-app.add_typer(vaspjobs_app,name="vaspjobs")
-
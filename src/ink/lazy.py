@@ -0,0 +1,61 @@
+"""Subcommand groups that are imported only when they are run.
+
+``ink --help`` and light commands must not pay for pymatgen, ASE or f90nml.
+A lazy group is registered with its import path and help text; listing it in
+``--help`` uses a placeholder, and the real Typer app is imported once the
+group is actually invoked (or completed in the shell).
+"""
+
+import importlib
+from typing import Dict, List, Optional, Tuple
+
+import typer
+from typer.core import TyperGroup
+
+
+class LazyTyperGroup(TyperGroup):
+    """TyperGroup that imports registered subcommand groups on first use.
+
+    ``lazy_subcommands`` maps a command name to ``("module:attr", help)``
+    where ``attr`` is a ``typer.Typer`` app.
+    """
+
+    lazy_subcommands: Dict[str, Tuple[str, str]] = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded: Dict[str, object] = {}
+
+    def list_commands(self, ctx) -> List[str]:
+        names = super().list_commands(ctx)
+        return names + [name for name in self.lazy_subcommands if name not in names]
+
+    def get_command(self, ctx, cmd_name: str):
+        command = super().get_command(ctx, cmd_name)
+        if command is not None or cmd_name not in self.lazy_subcommands:
+            return command
+        if cmd_name in self._loaded:
+            return self._loaded[cmd_name]
+        # Only listed (e.g. in --help): describe it without importing it
+        return TyperGroup(name=cmd_name, help=self.lazy_subcommands[cmd_name][1])
+
+    def resolve_command(self, ctx, args: List[str]):
+        if args and args[0] in self.lazy_subcommands:
+            self._load(args[0])
+        return super().resolve_command(ctx, args)
+
+    def _load(self, cmd_name: str) -> Optional[object]:
+        if cmd_name not in self._loaded:
+            import_path, help_text = self.lazy_subcommands[cmd_name]
+            module_name, attr = import_path.split(":", 1)
+            sub_app = getattr(importlib.import_module(module_name), attr)
+            # Build it the way add_typer() would, so single-command apps stay groups
+            parent = typer.Typer()
+            parent.add_typer(sub_app, name=cmd_name, help=sub_app.info.help or help_text)
+            self._loaded[cmd_name] = typer.main.get_command(parent).commands[cmd_name]
+        return self._loaded[cmd_name]
+
+
+def lazy_group(subcommands: Dict[str, Tuple[str, str]]) -> type:
+    """A LazyTyperGroup subclass for ``typer.Typer(cls=...)``."""
+    return type("InkLazyGroup", (LazyTyperGroup,), {"lazy_subcommands": dict(subcommands)})
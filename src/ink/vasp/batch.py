@@ -0,0 +1,196 @@
+"""Set up one stage for thousands of structures at once.
+
+``ink vaspjobs batch SOURCE --stage relax`` creates
+``<work_dir>/<name>/<structure id>/`` for every structure in SOURCE, using
+the stage's incar/potcar/kpoints/jobscript from vasp_config.yaml. SOURCE
+can be
+
+- a directory: structure files in it (POSCAR*, CONTCAR*, *.vasp, *.cif) and
+  subdirectories containing a POSCAR,
+- a glob pattern, e.g. ``'candidates/*/POSCAR'``,
+- an (ext)xyz file whose frames become ``frame-00000``, ``frame-00001``, ...
+
+Files that would share a task directory (``X.vasp`` and ``X.cif``, or
+``a/POSCAR`` and ``a.vasp``) keep their full name instead; if even those
+clash the batch is refused.
+
+Every structure gets a POTCAR for its own species: with a library
+(``potcar: vaspkit -task 103`` or a variant mapping, see native.py) it is
+assembled per structure, and a fixed ``potcar`` file must list the same
+species as the POSCAR or the structure fails.
+
+Directories are written by a process pool; submission goes through
+``Job.submit_array`` in chunks.
+"""
+
+import glob
+import os
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import to_plain
+from .jobs import Job
+from .native import check_potcar, potcar_options, write_potcar
+from .potcar import dataset_species
+
+STRUCTURE_PATTERNS = ("POSCAR*", "CONTCAR*", "*.vasp", "*.cif")
+XYZ_SUFFIXES = (".xyz", ".extxyz")
+
+
+def _structure_id(path: Path, root: Optional[Path], full: bool = False) -> str:
+    """Readable id of a structure file from its path below ``root``.
+
+    ``full`` keeps the file name (suffix, trailing POSCAR) to tell apart
+    files whose short ids clash.
+    """
+    rel = path.relative_to(root) if root is not None else Path(path.name)
+    if not full and rel.name == "POSCAR" and len(rel.parts) > 1:
+        rel = rel.parent
+    elif not full and rel.suffix in (".vasp", ".cif"):
+        rel = rel.with_suffix("")
+    return "_".join(rel.parts)
+
+
+def _unique_ids(files: List[Path], root: Optional[Path]) -> List[str]:
+    """Ids of ``files``, using the full name where short ids clash."""
+    ids = [_structure_id(file, root) for file in files]
+    counts = Counter(ids)
+    ids = [
+        _structure_id(file, root, full=True) if counts[sid] > 1 else sid
+        for file, sid in zip(files, ids)
+    ]
+    clashes = sorted(sid for sid, n in Counter(ids).items() if n > 1)
+    if clashes:
+        raise ValueError(f"Several structures map to the same task directory: {', '.join(clashes)}")
+    return ids
+
+
+def collect_structures(source: str) -> Iterator[Tuple[str, Any]]:
+    """Yield (structure id, path or pymatgen Structure) for every structure in ``source``."""
+    path = Path(source).expanduser()
+
+    if path.is_file() and path.suffix in XYZ_SUFFIXES:
+        from ase.io import iread
+        from pymatgen.io.ase import AseAtomsAdaptor
+
+        for i, atoms in enumerate(iread(path, index=":")):
+            yield f"frame-{i:05d}", AseAtomsAdaptor.get_structure(atoms)
+        return
+
+    if path.is_dir():
+        root = path.resolve()
+        files = set()
+        for pattern in STRUCTURE_PATTERNS:
+            files.update(p.resolve() for p in root.glob(pattern) if p.is_file())
+        files.update(p.resolve() for p in root.glob("*/POSCAR") if p.is_file())
+    else:
+        root = None
+        matches = glob.glob(os.path.expanduser(source))
+        files = {Path(p).resolve() for p in matches if Path(p).is_file()}
+        if files:
+            root = Path(os.path.commonpath([str(p.parent) for p in files]))
+
+    files = sorted(files)
+    yield from zip(_unique_ids(files, root), files)
+
+
+# Job of the current worker process, built once by _init_worker
+_worker_job: Optional[Job] = None
+
+# Dataset species of the fixed POTCAR files this worker has staged
+_worker_potcar_species: Dict[str, List[str]] = {}
+
+
+def _init_worker(config: dict) -> None:
+    global _worker_job
+    _worker_job = Job(config)
+
+
+def setup_structure(
+    stage: str, structure_id: str, structure: Any, batch_dir: Path
+) -> Tuple[str, Optional[str]]:
+    """Write all inputs of one structure. Returns (structure id, error or None).
+
+    Runs in a worker process set up by ``_init_worker``.
+    """
+    job = _worker_job
+    try:
+        cwd = batch_dir / structure_id
+        cwd.mkdir(parents=True, exist_ok=True)
+
+        job._write_poscar(structure, cwd)
+        job._write_incar(job._resolve_path(None, stage, "incar"), cwd)
+        potcar = job._resolve_path(None, stage, "potcar")
+        overrides = potcar_options(potcar, job.config["global"])
+        if overrides is not None:
+            write_potcar(cwd, job.config["global"], overrides)
+        else:
+            # One file for every structure: it must fit this composition
+            job._write_potcar(potcar, cwd)
+            if str(potcar) not in _worker_potcar_species:
+                _worker_potcar_species[str(potcar)] = dataset_species(Path(potcar))
+            check_potcar(cwd, _worker_potcar_species[str(potcar)])
+        job._write_kpoints(job._resolve_path(None, stage, "kpoints"), cwd, poscar=cwd / "POSCAR")
+        job._write_jobscript(job._resolve_path(None, stage, "jobscript"), cwd)
+        job._handle_cp(stage, cwd)
+    except Exception:
+        return structure_id, traceback.format_exc(limit=3)
+    return structure_id, None
+
+
+def run_batch(
+    job: Job,
+    source: str,
+    stage: str,
+    name: str,
+    workers: int,
+) -> Tuple[List[Path], List[Tuple[str, str]]]:
+    """Set up ``stage`` for every structure in ``source`` with a process pool.
+
+    Progress and errors are printed as tasks finish. Returns the prepared
+    directories (in structure order) and the failures.
+    """
+    if stage not in job.config:
+        raise ValueError(f"Stage '{stage}' not found in vasp_config.yaml.")
+
+    batch_dir = job.work_dir.resolve() / name
+    batch_dir.mkdir(parents=True, exist_ok=True)
+
+    config = to_plain(job.config)
+    config["global"]["work_dir"] = str(job.work_dir.resolve())
+
+    structures = list(collect_structures(source))
+    if not structures:
+        raise ValueError(f"No structures found in '{source}'.")
+    print(f"Setting up {len(structures)} '{stage}' tasks in {batch_dir} with {workers} workers...")
+
+    done: List[str] = []
+    errors: List[Tuple[str, str]] = []
+    total = len(structures)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(config,)
+    ) as executor:
+        futures = [
+            executor.submit(setup_structure, stage, sid, structure, batch_dir)
+            for sid, structure in structures
+        ]
+        for n, future in enumerate(as_completed(futures), start=1):
+            sid, error = future.result()
+            if error is None:
+                done.append(sid)
+                print(f"[{n}/{total}] {sid} ok")
+            else:
+                errors.append((sid, error))
+                print(f"[{n}/{total}] {sid} FAILED: {error.strip().splitlines()[-1]}")
+
+    if errors:
+        with (batch_dir / "errors.txt").open("w", encoding="utf-8") as f:
+            for sid, error in errors:
+                f.write(f"== {sid}\n{error}\n")
+        print(f"{len(errors)} structures failed, see {batch_dir / 'errors.txt'}")
+
+    ok = set(done)
+    return [batch_dir / sid for sid, _ in structures if sid in ok], errors
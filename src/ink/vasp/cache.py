@@ -0,0 +1,129 @@
+"""Process-wide cache of parsed POSCAR/CONTCAR structures.
+
+Every Job writer reads its structure through ``structure_cache``, so a
+POSCAR used by several stages or tasks is parsed once per process. A file
+is looked up by (path, mtime, size); a file rewritten in place gets a new
+key and is read again. Parsed structures are kept per content hash, so
+identical copies in different directories share one parse. Setting
+``INK_STRUCTURE_CACHE`` to a directory also pickles the parsed structures
+there for later processes.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .timing import timer
+
+if TYPE_CHECKING:
+    from pymatgen.core.structure import Structure
+
+
+def file_digest(path: Path) -> str:
+    """Return the sha256 hex digest of a file's content."""
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class StructureCache:
+    """Process-wide cache of parsed structures.
+
+    Lookups are keyed by (resolved path, mtime, size), which maps to the
+    content hash of the file; parsed structures are stored per content hash,
+    so copies of the same POSCAR in different directories are parsed once.
+    If ``cache_dir`` is set, parsed structures are also pickled there and
+    reused by later processes.
+
+    The returned structures are shared between callers: call ``.copy()``
+    before modifying one.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self._structures: Dict[str, "Structure"] = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path) -> str:
+        """Content hash of ``path``, memoized on its path, mtime and size."""
+        path = Path(path).resolve()
+        st = path.stat()
+        key = (str(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def get(self, path) -> "Structure":
+        """Return the parsed structure of ``path``, parsing it at most once."""
+        path = Path(path)
+        digest = self.digest(path)
+
+        with self._lock:
+            structure = self._structures.get(digest)
+        if structure is not None:
+            return structure
+
+        structure = self._load_pickle(digest)
+        if structure is None:
+            from pymatgen.core.structure import Structure
+
+            with timer.span("parse_structure"):
+                structure = Structure.from_file(path)
+            self._dump_pickle(digest, structure)
+
+        with self._lock:
+            # Another thread may have parsed the same file meanwhile; keep one.
+            structure = self._structures.setdefault(digest, structure)
+        return structure
+
+    def clear(self) -> None:
+        with self._lock:
+            self._digests.clear()
+            self._structures.clear()
+
+    def _pickle_path(self, digest: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{digest}.pickle"
+
+    def _load_pickle(self, digest: str) -> Optional["Structure"]:
+        pickle_path = self._pickle_path(digest)
+        if pickle_path is None or not pickle_path.is_file():
+            return None
+        try:
+            with pickle_path.open("rb") as f:
+                return pickle.load(f)
+        except Exception:
+            # Corrupt or incompatible pickle (e.g. pymatgen upgrade): re-parse.
+            return None
+
+    def _dump_pickle(self, digest: str, structure: "Structure") -> None:
+        pickle_path = self._pickle_path(digest)
+        if pickle_path is None:
+            return
+        tmp_path = pickle_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            pickle_path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp_path.open("wb") as f:
+                pickle.dump(structure, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, pickle_path)
+        except OSError:
+            # Read-only or full cache directory: keep the in-memory entry.
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+# Shared by all Job writers and stages in one process.
+structure_cache = StructureCache(os.environ.get("INK_STRUCTURE_CACHE") or None)
@@ -0,0 +1,213 @@
+"""Submit relax -> static -> dos -> band in one go with afterok dependencies.
+
+All stage directories are prepared up front. Inputs produced by an
+upstream stage (its ``poscar`` spec such as ``relax/CONTCAR``, ``cp``
+entries like ``static/CHGCAR``, and the CHGCAR that dos/band read) are
+pulled by a ``stagein.sh`` that the jobscript runs at job start. Until then
+POSCAR holds the upstream stage's input structure; once stagein.sh has
+pulled the relaxed one it regenerates KPOINTS from it (k-mesh, or the
+band path) with::
+
+    python -m ink.vasp.chain <stage dir>
+
+which reads the stage's kpoints spec from ``.ink_chain.json``. The inputs
+stagein.sh replaces are listed in ``.ink_stagein.json`` so the manifest
+tracks their upstream spec instead of the placeholder (see manifest.py);
+rerunning a finished chain then skips every stage. Pulled files
+are copied (reflinked where the filesystem can), never linked: dos/band
+rewrite CHGCAR with ``LCHARG = .TRUE.``.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import typer
+
+from .config import to_plain
+from .jobs import Job
+from .manifest import STAGED_INPUTS_NAME, TRACKED_INPUTS, needs_submission, write_text_if_changed
+
+CHAIN_STAGES = ("relax", "static", "dos", "band")
+
+# Inputs a stage pulls from upstream even without a poscar/cp entry for them
+DEFAULT_PULLS = {
+    "dos": {"CHGCAR": "static/CHGCAR"},
+    "band": {"CHGCAR": "static/CHGCAR"},
+}
+
+# Settings stagein.sh needs to regenerate KPOINTS on the compute node
+CHAIN_NAME = ".ink_chain.json"
+
+STAGE_IN_CALL = "bash stagein.sh || exit 1\n"
+
+
+def _stage_of(spec: str) -> str:
+    return Path(spec).parts[0]
+
+
+def upstream_pulls(job: Job, stage: str, upstream: Sequence[str]) -> Dict[str, str]:
+    """Map file name in ``stage`` -> ``<upstream stage>/<file>`` it is pulled from."""
+    section = job.config.get(stage) or {}
+    pulls: Dict[str, str] = {}
+
+    poscar = section.get("poscar")
+    if isinstance(poscar, str) and _stage_of(poscar) in upstream:
+        pulls["POSCAR"] = poscar
+
+    cp_cfg = section.get("cp")
+    if isinstance(cp_cfg, dict):
+        for src, dst in cp_cfg.items():
+            if _stage_of(str(src)) in upstream:
+                pulls[str(dst)] = str(src)
+
+    for dst, src in DEFAULT_PULLS.get(stage, {}).items():
+        if _stage_of(src) in upstream:
+            pulls.setdefault(dst, src)
+
+    return pulls
+
+
+def _structure_dependent(kpoints) -> bool:
+    """Whether a kpoints spec is generated from POSCAR (KPR mesh or band path)."""
+    return isinstance(kpoints, (int, float, dict)) or kpoints == "line"
+
+
+def stage_in_script(work_dir: Path, pulls: Dict[str, str], kpoints_dir: Optional[Path] = None) -> str:
+    """Script pulling ``pulls``; with ``kpoints_dir`` it then regenerates KPOINTS there."""
+    lines = [
+        "#!/bin/bash",
+        "# Generated by `ink vaspjobs chain`: pull inputs from upstream stages",
+        "set -e",
+    ]
+    for dst, src in pulls.items():
+        src_path = work_dir / src
+        lines.append(f'cp --reflink=auto "{src_path}" "{dst}"')
+    if kpoints_dir is not None:
+        lines.append(f'"{sys.executable}" -m ink.vasp.chain "{kpoints_dir}"')
+    return "\n".join(lines) + "\n"
+
+
+def regenerate_kpoints(stage_dir: Path) -> None:
+    """Rewrite KPOINTS of a chain stage from the POSCAR stagein.sh pulled."""
+    stage_dir = Path(stage_dir).resolve()
+    settings = json.loads((stage_dir / CHAIN_NAME).read_text())
+    job = Job({"global": settings["global"]})
+    job._write_kpoints(settings["kpoints"], stage_dir, poscar=stage_dir / "POSCAR")
+
+
+def insert_stage_in(jobscript: str) -> str:
+    """Run stagein.sh right after the jobscript changes into its directory."""
+    lines = jobscript.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith("cd") and ("PBS_O_WORKDIR" in stripped or "SLURM_SUBMIT_DIR" in stripped):
+            return "".join(lines[: i + 1] + [STAGE_IN_CALL] + lines[i + 1 :])
+
+    # No explicit cd: insert before the first command after the header
+    i = 0
+    while i < len(lines) and (lines[i].startswith("#") or not lines[i].strip()):
+        i += 1
+    return "".join(lines[:i] + [STAGE_IN_CALL] + lines[i:])
+
+
+def run_chain(job: Job, stages: Sequence[str], yes: bool, force: bool) -> Dict[str, str]:
+    """Prepare and submit ``stages`` in order. Returns {stage: job id} of submitted stages."""
+    for stage in stages:
+        if stage not in job.config:
+            raise ValueError(f"Stage '{stage}' not found in vasp_config.yaml.")
+
+    work_dir = job.work_dir.resolve()
+    prepared: List[tuple] = []
+    done: List[str] = []
+
+    for stage in stages:
+        cwd = work_dir / stage
+        cwd.mkdir(exist_ok=True)
+        pulls = upstream_pulls(job, stage, done)
+
+        cp_cfg = (job.config.get(stage) or {}).get("cp")
+        if isinstance(cp_cfg, dict) and any(str(dst) not in pulls for dst in cp_cfg.values()):
+            job._handle_cp(stage, cwd)
+
+        if "POSCAR" in pulls:
+            poscar_path = work_dir / pulls["POSCAR"]
+            if not poscar_path.is_file():
+                # Placeholder until stagein.sh pulls the upstream result
+                poscar_path = work_dir / _stage_of(pulls["POSCAR"]) / "POSCAR"
+        else:
+            poscar_path = job._resolve_path(None, stage, "poscar")
+        job._write_poscar(poscar_path, cwd)
+        job._write_incar(job._resolve_path(None, stage, "incar"), cwd)
+        job._write_potcar(job._resolve_path(None, stage, "potcar"), cwd)
+        kpoints = job._resolve_path(None, stage, "kpoints")
+        job._write_kpoints(kpoints, cwd, poscar=poscar_path)
+
+        jobscript = job._resolve_path(None, stage, "jobscript")
+        if isinstance(jobscript, Path):
+            jobscript = jobscript.read_text()
+        staged = {dst: src for dst, src in pulls.items() if dst in TRACKED_INPUTS}
+        if pulls:
+            kpoints_dir = None
+            if "POSCAR" in pulls and _structure_dependent(kpoints):
+                # KPOINTS above came from the placeholder structure
+                settings = {"global": {**job.config["global"], "work_dir": str(work_dir)}, "kpoints": kpoints}
+                (cwd / CHAIN_NAME).write_text(json.dumps(to_plain(settings), indent=2))
+                kpoints_dir = cwd
+                staged["KPOINTS"] = json.dumps(to_plain(kpoints), sort_keys=True)
+            (cwd / "stagein.sh").write_text(stage_in_script(work_dir, pulls, kpoints_dir))
+            jobscript = insert_stage_in(jobscript)
+        job._write_jobscript(jobscript, cwd)
+        if staged:
+            write_text_if_changed(cwd / STAGED_INPUTS_NAME, json.dumps(staged, indent=2, sort_keys=True))
+        else:
+            (cwd / STAGED_INPUTS_NAME).unlink(missing_ok=True)
+
+        prepared.append((stage, cwd, sorted({_stage_of(src) for src in pulls.values()})))
+        done.append(stage)
+
+    if not yes:
+        typer.confirm(f"Submit chain {' -> '.join(stages)}?", abort=True)
+
+    job_ids: Dict[str, str] = {}
+    for stage, cwd, upstream in prepared:
+        depends_on = []
+        for up in upstream:
+            if up in job_ids:
+                depends_on.append(job_ids[up])
+                continue
+            # Upstream was not resubmitted: still wait for it if it is in the queue
+            pid_file = work_dir / up / "qsub.pid"
+            if pid_file.is_file():
+                up_id = pid_file.read_text().strip()
+                if up_id and job.scheduler.is_active(up_id):
+                    depends_on.append(up_id)
+
+        resubmitted_upstream = any(up in job_ids for up in upstream)
+        if not force and not resubmitted_upstream:
+            reason = needs_submission(cwd, job.scheduler)
+            if reason is None:
+                print(f"[{stage}] inputs unchanged since last submission, skip.")
+                continue
+            print(f"[{stage}] submitting: {reason}.")
+
+        job_id = job.submit(cwd, depends_on=depends_on)
+        if job_id:
+            job_ids[stage] = job_id
+            if depends_on:
+                print(f"[{stage}] {job_id} runs after {', '.join(depends_on)}")
+
+    return job_ids
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Regenerate KPOINTS of a chain stage after stage-in.")
+    parser.add_argument("stage_dir", type=Path)
+    args = parser.parse_args(argv)
+    regenerate_kpoints(args.stage_dir)
+
+
+if __name__ == "__main__":
+    main()
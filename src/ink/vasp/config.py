@@ -0,0 +1,183 @@
+"""Load the merged vasp_config.yaml without re-parsing it on every command.
+
+The module-level and cwd ``vasp_config.yaml`` are merged per top-level
+key. Round-trip parsing (needed to keep comments in the merged file) is
+slow, so the merged config and its YAML text are pickled in a cache keyed
+by the source files. A cache entry is valid while every source has the
+same mtime and size, or the same sha256 if only its mtime changed. The
+merged file is written only when its content changes, via a temporary
+file and ``os.replace`` so concurrent commands never see a partial file.
+
+The cache lives in ``~/.cache/ink/config`` (``INK_CONFIG_CACHE``
+overrides it); it is only an accelerator and failures to use it are
+ignored.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+from ruamel.yaml import YAML
+
+DEFAULT_CACHE_DIR = Path("~/.cache/ink/config")
+
+# Bump when the cached layout changes
+CACHE_VERSION = 1
+
+
+def to_plain(obj: Any) -> Any:
+    """Convert ruamel round-trip containers into plain dicts/lists."""
+    if isinstance(obj, dict):
+        return {str(k): to_plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_plain(v) for v in obj]
+    if isinstance(obj, bool) or obj is None:
+        return obj
+    for base in (int, float, str):
+        if isinstance(obj, base):
+            return base(obj)
+    return obj
+
+
+def _sha256(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _source_info(path: Path) -> Optional[tuple]:
+    """(mtime_ns, size, sha256) of ``path``, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, _sha256(path))
+
+
+def validate(config: dict, sources: Sequence[Path]) -> None:
+    """Reject configs the Job cannot work with, naming the source files."""
+    where = " + ".join(str(p) for p in sources) or "vasp_config.yaml"
+    global_cfg = config.get("global")
+    if not isinstance(global_cfg, dict):
+        raise ValueError(f"{where}: a 'global' mapping is required.")
+    for key in ("work_dir", "structure_cache", "kpath_cache", "jobdb", "scheduler"):
+        value = global_cfg.get(key)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{where}: global.{key} must be a string, got {value!r}.")
+
+
+class ConfigLoader:
+    """Merged config of ``paths``; later files override top-level keys of earlier ones."""
+
+    def __init__(self, paths: Sequence[Path], cache_dir: Optional[Path] = None):
+        self.paths = [Path(p).resolve() for p in paths]
+        cache_dir = cache_dir or os.environ.get("INK_CONFIG_CACHE") or DEFAULT_CACHE_DIR
+        key = hashlib.sha256("\0".join(map(str, self.paths)).encode()).hexdigest()[:24]
+        self.cache_file = Path(cache_dir).expanduser() / f"{key}.pickle"
+        self.text = ""
+        self._sources: List[Optional[tuple]] = []
+
+    def load(self) -> dict:
+        entry = self._read_cache()
+        if entry is not None and self._fresh(entry):
+            self.text = entry["text"]
+            return entry["config"]
+
+        yaml = YAML(typ="rt")
+        merged: dict = {}
+        for path in self.paths:
+            if path.is_file():
+                with path.open("r", encoding="utf-8") as f:
+                    data = yaml.load(f) or {}
+                if isinstance(data, dict):
+                    merged.update(data)
+
+        buf = io.StringIO()
+        yaml.dump(merged, buf)
+        config = to_plain(merged)
+        validate(config, [p for p in self.paths if p.is_file()])
+
+        self.text = buf.getvalue()
+        self._sources = [_source_info(p) for p in self.paths]
+        self._write_cache(config)
+        return config
+
+    def write_merged(self, target: Path) -> bool:
+        """Write the merged YAML to ``target`` if it differs. Returns True if written."""
+        target = Path(target)
+        data = self.text.encode("utf-8")
+        try:
+            if target.stat().st_size == len(data) and target.read_bytes() == data:
+                return False
+        except FileNotFoundError:
+            pass
+
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+
+        # Merging the sources again yields the same text, so if we just
+        # overwrote a source the cached config stays valid.
+        if target.resolve() in self.paths:
+            entry = self._read_cache()
+            if entry is not None:
+                self._sources = [_source_info(p) for p in self.paths]
+                self._write_cache(entry["config"])
+        return True
+
+    def _fresh(self, entry: dict) -> bool:
+        cached = entry["sources"]
+        if len(cached) != len(self.paths):
+            return False
+        current = []
+        refreshed = False
+        for path, old in zip(self.paths, cached):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                if old is not None:
+                    return False
+                current.append(None)
+                continue
+            if old is None or old[1] != st.st_size:
+                return False
+            if old[0] != st.st_mtime_ns:
+                # Touched but maybe not changed: fall back to the content hash
+                if _sha256(path) != old[2]:
+                    return False
+                old = (st.st_mtime_ns, old[1], old[2])
+                refreshed = True
+            current.append(old)
+        self._sources = current
+        if refreshed:
+            self._write_cache(entry["config"], entry["text"])
+        return True
+
+    def _read_cache(self) -> Optional[dict]:
+        try:
+            with self.cache_file.open("rb") as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+            return None
+        return entry
+
+    def _write_cache(self, config: dict, text: Optional[str] = None) -> None:
+        entry = {
+            "version": CACHE_VERSION,
+            "sources": self._sources,
+            "config": config,
+            "text": self.text if text is None else text,
+        }
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with tmp.open("wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            pass
@@ -0,0 +1,102 @@
+"""Run vaspkit and other helper commands on a bounded asyncio subprocess pool.
+
+Task preparation threads hand their ``potcar``/``kpoints`` commands to
+``helper_pool``; an event loop in a background thread runs them with at
+most ``limit`` processes alive at once. Output is captured and printed as a
+block prefixed with the task name when the command ends, so concurrent
+tasks do not interleave mid-line. The limit is set in vasp_config.yaml::
+
+    global:
+      vaspkit_jobs: 8   # default: number of CPUs, at most 8
+
+Tasks are only prepared concurrently with ``-j N``; the limit applies to
+the helper processes of those tasks.
+"""
+
+import asyncio
+import os
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+import typer
+
+DEFAULT_LIMIT = min(8, os.cpu_count() or 1)
+
+
+class HelperError(subprocess.CalledProcessError):
+    """A helper command of a task exited with a non-zero status."""
+
+    def __init__(self, task_name: str, cmd: str, returncode: int, output: str):
+        super().__init__(returncode, cmd, output)
+        self.task_name = task_name
+
+    def __str__(self) -> str:
+        last = self.output.strip().splitlines()[-1:] if self.output else []
+        detail = f": {last[0]}" if last else ""
+        return f"'{self.cmd}' exited with status {self.returncode}{detail}"
+
+
+class HelperPool:
+    """Bounded pool of shell commands driven by a private event loop."""
+
+    def __init__(self, limit: int = DEFAULT_LIMIT, echo: Callable[[str], None] = typer.echo):
+        self.limit = max(1, int(limit))
+        self._echo = echo
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def set_limit(self, limit: int) -> None:
+        """Change the concurrency limit; takes effect before the first command."""
+        with self._lock:
+            if self._loop is None:
+                self.limit = max(1, int(limit))
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="ink-helpers", daemon=True).start()
+                self._semaphore = asyncio.run_coroutine_threadsafe(
+                    self._make_semaphore(), loop
+                ).result()
+                self._loop = loop
+            return self._loop
+
+    async def _make_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.limit)
+
+    async def _run(self, task_name: str, cwd: Path, cmd: str) -> str:
+        async with self._semaphore:
+            proc = await asyncio.create_subprocess_shell(
+                cmd,
+                cwd=str(cwd),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            raw, _ = await proc.communicate()
+        output = raw.decode("utf-8", errors="replace")
+        if output.strip():
+            prefix = f"[task {task_name}] "
+            self._echo("\n".join(prefix + line for line in output.rstrip().splitlines()))
+        if proc.returncode:
+            raise HelperError(task_name, cmd, proc.returncode, output)
+        return output
+
+    def run(self, task_name: str, cwd: Path, cmd: str) -> str:
+        """Run ``cmd`` in ``cwd``, blocking the caller; returns the captured output."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._run(task_name, cwd, cmd), loop).result()
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+# Shared by all preparation threads of one process.
+helper_pool = HelperPool()
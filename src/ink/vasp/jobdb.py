@@ -0,0 +1,152 @@
+"""Local SQLite record of every job submitted by ``ink``.
+
+Each submission (single job, array element, pack member or main.py task)
+adds a row with the task, directory, job id and input hash; a new
+submission for a directory marks its previous row cancelled. ``refresh``
+updates the rows from one bulk scheduler snapshot. A job missing from
+``MISSING_SNAPSHOTS`` consecutive snapshots has left the queue, and its
+OUTCAR decides between completed and failed. The database lives at
+``~/.ink/jobs.sqlite`` unless ``INK_JOBDB`` or ``global.jobdb`` says
+otherwise::
+
+    global:
+      jobdb: /scratch/me/ink-jobs.sqlite
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .manifest import NORMAL_TERMINATION
+from .scheduler import job_key
+
+DEFAULT_DB = Path("~/.ink/jobs.sqlite")
+
+# States that are no longer polled
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+# Consecutive snapshots a job must be missing from before it counts as finished;
+# one failed or truncated qstat/squeue listing must not finalize running jobs
+MISSING_SNAPSHOTS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    task TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    input_hash TEXT,
+    state TEXT NOT NULL DEFAULT 'submitted',
+    missed INTEGER NOT NULL DEFAULT 0,
+    submitted_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_job_key ON jobs(job_key);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state);
+CREATE INDEX IF NOT EXISTS jobs_directory ON jobs(directory);
+"""
+
+
+def _finished_state(directory: str) -> str:
+    """Decide whether a job that left the queue completed, from its OUTCAR tail."""
+    outcar = Path(directory) / "OUTCAR"
+    try:
+        with outcar.open("rb") as f:
+            f.seek(max(0, outcar.stat().st_size - 64 * 1024))
+            tail = f.read()
+    except OSError:
+        return "failed"
+    return "completed" if NORMAL_TERMINATION in tail else "failed"
+
+
+class JobDB:
+    """Local record of every submission made by ``ink vaspjobs``."""
+
+    def __init__(self, path: Path = DEFAULT_DB):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, global_cfg: dict) -> "JobDB":
+        path = os.environ.get("INK_JOBDB") or (global_cfg or {}).get("jobdb") or DEFAULT_DB
+        return cls(Path(path))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def record_submission(
+        self, task: str, directory: Path, job_id: str, input_hash: Optional[str] = None
+    ) -> None:
+        self.record_submissions([(task, directory, job_id, input_hash)])
+
+    def record_submissions(self, rows: Iterable[Tuple[str, Path, str, Optional[str]]]) -> None:
+        now = time.time()
+        rows = [
+            (task, str(Path(d).resolve()), job_id, input_hash)
+            for task, d, job_id, input_hash in rows
+        ]
+        placeholders = ", ".join("?" for _ in TERMINAL_STATES)
+        with self.conn:
+            # A new submission replaces (and qdel's) the previous job of that directory
+            self.conn.executemany(
+                "UPDATE jobs SET state = 'cancelled', updated_at = ? "
+                f"WHERE directory = ? AND state NOT IN ({placeholders})",
+                [(now, d, *TERMINAL_STATES) for _, d, _, _ in rows],
+            )
+            self.conn.executemany(
+                "INSERT INTO jobs (task, directory, job_id, job_key, input_hash, state, "
+                "submitted_at, updated_at) VALUES (?, ?, ?, ?, ?, 'submitted', ?, ?)",
+                [
+                    (task, d, job_id, job_key(job_id), input_hash, now, now)
+                    for task, d, job_id, input_hash in rows
+                ],
+            )
+
+    def refresh(self, scheduler_states: Dict[str, str]) -> int:
+        """Update all non-terminal jobs from one scheduler snapshot.
+
+        Jobs missing from ``MISSING_SNAPSHOTS`` consecutive snapshots have
+        left the queue; their OUTCAR decides between completed and failed.
+        Returns the number of state changes.
+        """
+        now = time.time()
+        placeholders = ", ".join("?" for _ in TERMINAL_STATES)
+        rows = self.conn.execute(
+            "SELECT id, job_key, directory, state, missed FROM jobs "
+            f"WHERE state NOT IN ({placeholders})",
+            TERMINAL_STATES,
+        ).fetchall()
+
+        updates: List[Tuple[str, int, float, int]] = []
+        changed = 0
+        for row_id, key, directory, state, old_missed in rows:
+            new_state = scheduler_states.get(key)
+            missed = 0 if new_state is not None else old_missed + 1
+            if new_state is None:
+                new_state = _finished_state(directory) if missed >= MISSING_SNAPSHOTS else state
+            elif new_state == "completed":
+                new_state = _finished_state(directory)
+            if new_state != state or missed != old_missed:
+                changed += new_state != state
+                updates.append((new_state, missed, now, row_id))
+
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE jobs SET state = ?, missed = ?, updated_at = ? WHERE id = ?", updates
+            )
+        return changed
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+
+    def jobs(self, state: Optional[str] = None) -> List[tuple]:
+        query = "SELECT task, directory, job_id, state, submitted_at FROM jobs"
+        if state is None:
+            return self.conn.execute(query + " ORDER BY id").fetchall()
+        return self.conn.execute(query + " WHERE state = ? ORDER BY id", (state,)).fetchall()
@@ -1,41 +1,47 @@
 import os
-import math
+import json
+import time
 import typer
 import subprocess
-import shutil
+import tempfile
 from pathlib import Path
-from typing import Optional
-from ruamel.yaml import YAML
-from pymatgen.core.structure import Structure
-from pymatgen.io.vasp.inputs import Kpoints,Incar
+from typing import TYPE_CHECKING, List, Optional, Sequence
 import inspect
 from functools import wraps
 
+from .cache import structure_cache
+from .config import ConfigLoader
+from .staging import shared_store
+from .manifest import needs_submission, write_manifest, write_text_if_changed
+from .jobdb import JobDB
+from .scheduler import SchedulerQueryError, scheduler_from_config
+from .timing import timed, timer
 
-yaml = YAML(typ="rt")
+# pymatgen is imported by the writers that need it, so `ink vaspjobs --help`
+# and commands that only submit do not pay for it
+if TYPE_CHECKING:
+    from pymatgen.core.structure import Structure
+
+# Files routed through the staging store by _handle_cp
+STAGED_FILES = {"CHGCAR", "WAVECAR", "POTCAR"}
 
 
 class Job:
-    def __init__(self):
-        # Load configuration from vasp_config.yaml
-        # 1) module directory
-        # 2) current working directory (overrides previous keys)
-        base_config_path = Path(__file__).parent / "vasp_config.yaml"
-        cwd_config_path = Path.cwd() / "vasp_config.yaml"
-
-        config: dict = {}
-
-        if base_config_path.is_file():
-            with base_config_path.open("r", encoding="utf-8") as f:
-                data = yaml.load(f) or {}
-                if isinstance(data, dict):
-                    config.update(data)
-
-        if cwd_config_path.is_file():
-            with cwd_config_path.open("r", encoding="utf-8") as f:
-                data = yaml.load(f) or {}
-                if isinstance(data, dict):
-                    config.update(data)
+    def __init__(self, config: Optional[dict] = None):
+        # When ``config`` is given (e.g. in batch worker processes) it is used
+        # as is: no vasp_config.yaml is read or written and cwd is unchanged.
+        standalone = config is None
+
+        if standalone:
+            # Load configuration from vasp_config.yaml
+            # 1) module directory
+            # 2) current working directory (overrides previous keys)
+            # The merged result is cached, see config.py.
+            base_config_path = Path(__file__).parent / "vasp_config.yaml"
+            cwd_config_path = Path.cwd() / "vasp_config.yaml"
+
+            self._config_loader = ConfigLoader([base_config_path, cwd_config_path])
+            config = self._config_loader.load()
 
         # merged config
         self.config = config
@@ -48,185 +54,398 @@ class Job:
         else:
             self.work_dir = Path(work_dir_cfg)
 
-        self.work_dir.mkdir(exist_ok=True)
-        os.chdir(self.work_dir)
+        if standalone:
+            self.work_dir.mkdir(exist_ok=True)
+            os.chdir(self.work_dir)
+
+        # Optional on-disk layers of the shared structure and k-path caches
+        cache_dir_cfg = self.config.get("global").get("structure_cache")
+        if cache_dir_cfg:
+            structure_cache.cache_dir = Path(cache_dir_cfg).expanduser().resolve()
+        kpath_cache_cfg = self.config.get("global").get("kpath_cache")
+        if kpath_cache_cfg:
+            from .kpath import kpath_cache
+            kpath_cache.cache_dir = Path(kpath_cache_cfg).expanduser().resolve()
+
+        # Content-addressed store for large inputs (POTCAR, CHGCAR, WAVECAR)
+        self.store = shared_store(self.config.get("global"), self.work_dir.resolve())
+
+        # Local database of all submissions (see `ink vaspjobs status`)
+        self.jobdb = JobDB.from_config(self.config.get("global"))
 
-        self._write_merged_config_to_cwd()
+        # Batch system backend: pbs, torque, slurm or local
+        self.scheduler = scheduler_from_config(self.config.get("global"))
+
+        if standalone:
+            self._write_merged_config_to_cwd()
 
     def _write_merged_config_to_cwd(self) -> None:
-        """Overwrite vasp_config.yaml in the current directory with merged cfg."""
-        cfg_path = Path.cwd() / "vasp_config.yaml"
-        with cfg_path.open("w", encoding="utf-8") as f:
-            yaml.dump(self.config, f)
+        """Write the merged cfg to vasp_config.yaml in the current directory if it changed."""
+        self._config_loader.write_merged(Path.cwd() / "vasp_config.yaml")
 
-    def _calculate_grid_dimensions(self, bnorm, kpr: float):
+    @staticmethod
+    def _calculate_grid_dimensions(bnorm, kpr: float):
         """Calculate K-mesh using VASPKIT-like KPR formula.
 
         For each direction i, the number of k-points is
 
-            N_i = max(1, ceil(|b_i| / kpr))
+            N_i = max(1, floor(|b_i| / (2 pi kpr)))
 
-        where |b_i| are the norms of the reciprocal lattice vectors and
-        ``kpr`` is the user-defined KPT-resolved value.
+        where |b_i| are the norms of the reciprocal lattice vectors
+        (including 2 pi) and ``kpr`` is the user-defined KPT-resolved value.
+        The formula lives in ``kmesh.kpr_mesh`` (importable without pymatgen),
+        shared with the native KPOINTS writer.
         """
+        from .kmesh import kpr_mesh
 
-        b1, b2, b3 = bnorm
-        nkpx = max(1, math.floor(b1 / kpr/2/math.pi))
-        nkpy = max(1, math.floor(b2 / kpr/2/math.pi))
-        nkpz = max(1, math.floor(b3 / kpr/2/math.pi))
-
-        return nkpx, nkpy, nkpz
+        return kpr_mesh(bnorm, kpr)
 
-    def submit(self, cwd: Path):
+    @timed("submit")
+    def submit(self, cwd: Path, depends_on: Sequence[str] = ()) -> Optional[str]:
         """Submit the job.
         
         If a qsub.pid file exists in the directory, read the PID and cancel the old job
         before submitting a new one. The new job ID is then saved to qsub.pid.
+        ``depends_on`` lists job IDs that must finish successfully first (afterok).
         """
         pid_file = cwd / "qsub.pid"
 
         # 1. Check and cancel existing job
-        if pid_file.is_file():
-            old_pid = pid_file.read_text().strip()
-            if old_pid:
-                print(f"Found existing job ID {old_pid} in {pid_file}. Cancelling...")
-                try:
-                    subprocess.run(["qdel", old_pid], check=False)
-                except Exception as e:
-                    print(f"Failed to cancel job {old_pid}: {e}")
-        
-        # 2. Submit new job and capture stdout
-        result = subprocess.run(
-            ["qsub", "jobscript.sh"], 
-            check=True, 
-            cwd=cwd, 
-            stdout=subprocess.PIPE, 
-            text=True
-        )
-        
-        # 3. Extract job ID (assuming qsub prints the job ID to stdout)
-        # Output format varies by scheduler (Torque, PBS, Slurm wrapper), 
-        # but usually it's "12345.server" or just "12345".
-        # We save the whole stripped output for now.
-        new_pid = result.stdout.strip()
+        old_pid = self._own_job_id(cwd)
+        if old_pid:
+            print(f"Found existing job ID {old_pid} in {pid_file}. Cancelling...")
+            try:
+                self.scheduler.cancel([old_pid])
+            except Exception as e:
+                print(f"Failed to cancel job {old_pid}: {e}")
+
+        # 2. Submit new job and capture its ID
+        new_pid = self.scheduler.submit(cwd / "jobscript.sh", cwd, depends_on=depends_on)
         if new_pid:
             pid_file.write_text(new_pid)
+            manifest = write_manifest(cwd, new_pid)
+            self.jobdb.record_submission(cwd.name, cwd, new_pid, manifest["input_hash"])
             print(f"Submitted job {new_pid}. PID saved to {pid_file}.")
-    
+        return new_pid
+
+    def _needs_submission(self, cwd: Path) -> Optional[str]:
+        """``needs_submission`` that aborts the command when the scheduler cannot be queried."""
+        try:
+            return needs_submission(cwd, self.scheduler)
+        except SchedulerQueryError as e:
+            print(f"{e}; cannot tell whether the last job of {cwd} is still running, not submitting.")
+            raise typer.Exit(1)
+
+    def _submit_if_needed(self, cwd: Path, yes: bool, force: bool) -> None:
+        """Submit unless the inputs match the last submission and it did not fail."""
+        if not force:
+            reason = self._needs_submission(cwd)
+            if reason is None:
+                print(f"Inputs in {cwd} unchanged since last submission, skip (use --force to resubmit).")
+                return
+            print(f"Submitting {cwd}: {reason}.")
+
+        if not yes:
+            typer.confirm("Submit job?", abort=True)
+        self.submit(cwd)
+
+    @timed("submit_array")
+    def submit_array(self, dirs: List[Path]) -> str:
+        """Submit several prepared task directories as one scheduler job array.
+
+        The directives (``#PBS``/``#SBATCH`` lines) of the first directory's
+        jobscript.sh are reused for the array script; array index ``i`` runs
+        ``jobscript.sh`` inside ``dirs[i]``. Old jobs listed in the qsub.pid
+        files are cancelled with a single call, and every directory gets the
+        id of its own array element in qsub.pid.
+        """
+        if not dirs:
+            raise ValueError("No task directories given for array submission.")
+
+        dirs = [Path(d).resolve() for d in dirs]
+        for d in dirs:
+            if not (d / "jobscript.sh").is_file():
+                raise FileNotFoundError(f"jobscript.sh not found in {d}")
+
+        # 1. Cancel existing jobs in one call
+        self._cancel_existing(dirs)
+
+        # 2. Stage the array: index -> directory map plus a driver script
+        arrays_dir = self.work_dir.resolve() / "arrays"
+        arrays_dir.mkdir(parents=True, exist_ok=True)
+        stage_dir = Path(
+            tempfile.mkdtemp(prefix=time.strftime("array-%Y%m%d-%H%M%S-"), dir=arrays_dir)
+        )
+        (stage_dir / "dirs.txt").write_text("".join(f"{d}\n" for d in dirs))
+
+        directive = self.scheduler.directive
+        header = [
+            line
+            for line in (dirs[0] / "jobscript.sh").read_text().splitlines()
+            if directive and line.startswith(directive)
+        ]
+        script = "\n".join(
+            [
+                "#!/bin/bash",
+                *header,
+                'IDX=${PBS_ARRAY_INDEX:-${PBS_ARRAYID:-${SLURM_ARRAY_TASK_ID}}}',
+                f'TASK_DIR=$(sed -n "$((IDX + 1))p" {stage_dir / "dirs.txt"})',
+                'cd "$TASK_DIR" || exit 1',
+                # jobscript.sh usually does `cd ${PBS_O_WORKDIR}`
+                'export PBS_O_WORKDIR="$TASK_DIR" SLURM_SUBMIT_DIR="$TASK_DIR"',
+                "bash jobscript.sh",
+                "",
+            ]
+        )
+        (stage_dir / "array.sh").write_text(script)
+
+        # 3. One scheduler call for the whole array
+        array_id = self.scheduler.submit(stage_dir / "array.sh", stage_dir, array_size=len(dirs))
+        (stage_dir / "qsub.pid").write_text(array_id)
+
+        # 4. Per-directory bookkeeping so submit()/qdel keep working per task
+        records = []
+        for i, d in enumerate(dirs):
+            element_id = self.scheduler.array_element(array_id, i)
+            (d / "qsub.pid").write_text(element_id)
+            manifest = write_manifest(d, element_id)
+            records.append((d.name, d, element_id, manifest["input_hash"]))
+        self.jobdb.record_submissions(records)
+
+        print(f"Submitted array job {array_id} with {len(dirs)} tasks from {stage_dir}.")
+        return array_id
+
+    @staticmethod
+    def _own_job_id(cwd: Path) -> str:
+        """Job id in qsub.pid, or "" if there is none or it is a packed job.
+
+        A packed job runs other tasks as well, so it is never cancelled on
+        behalf of one of them.
+        """
+        from .pack import pack_job_id
+
+        pid_file = cwd / "qsub.pid"
+        old_pid = pid_file.read_text().strip() if pid_file.is_file() else ""
+        if old_pid and old_pid == pack_job_id(cwd):
+            print(f"{cwd} ran in packed job {old_pid}; not cancelling the whole pack.")
+            return ""
+        return old_pid
+
+    def _cancel_existing(self, dirs: List[Path]) -> None:
+        """Cancel the jobs listed in the qsub.pid files of ``dirs`` with one call."""
+        old_pids = list(dict.fromkeys(filter(None, map(self._own_job_id, dirs))))
+        if old_pids:
+            print(f"Cancelling {len(old_pids)} existing jobs...")
+            try:
+                self.scheduler.cancel(old_pids)
+            except Exception as e:
+                print(f"Failed to cancel jobs: {e}")
+
+    @timed("submit_pack")
+    def submit_pack(self, dirs: List[Path], cores_per_task: int, cores: Optional[int] = None) -> str:
+        """Submit several prepared task directories as one packed job (see pack.py).
+
+        Every directory gets a manifest and a job database entry for the pack
+        job, and the pack id with its index in .ink_pack.json. Its qsub.pid
+        is removed (after cancelling the job in it), so a later ``submit``
+        of one task cannot cancel the pack.
+        """
+        from .pack import write_pack, write_status
+
+        if not dirs:
+            raise ValueError("No task directories given for packed submission.")
+
+        dirs = [Path(d).resolve() for d in dirs]
+        for d in dirs:
+            if not (d / "jobscript.sh").is_file():
+                raise FileNotFoundError(f"jobscript.sh not found in {d}")
+
+        self._cancel_existing(dirs)
+
+        script = write_pack(self, dirs, cores_per_task, cores)
+        pack_id = self.scheduler.submit(script, script.parent)
+        (script.parent / "qsub.pid").write_text(pack_id)
+
+        records = []
+        for i, d in enumerate(dirs):
+            (d / "qsub.pid").unlink(missing_ok=True)
+            write_status(d, pack_id=pack_id, index=i, pack_dir=str(script.parent), state="submitted")
+            manifest = write_manifest(d, pack_id)
+            records.append((d.name, d, pack_id, manifest["input_hash"]))
+        self.jobdb.record_submissions(records)
+
+        print(f"Submitted packed job {pack_id} with {len(dirs)} tasks from {script.parent}.")
+        return pack_id
+
+    def _structure(self, poscar) -> "Structure":
+        """Parsed structure of a path (through the shared cache), or a Structure as is."""
+        from pymatgen.core.structure import Structure
+
+        return poscar if isinstance(poscar, Structure) else structure_cache.get(poscar)
+
+    @timed("write_poscar")
     def _write_poscar(self, poscar, cwd: Path):
         """
         Write POSCAR file from a file path or a structure.
         """
+        from pymatgen.core.structure import Structure
 
         target = cwd / "POSCAR"
 
         # Case 1: existing POSCAR-like file path
         if isinstance(poscar, (Path,str)):
-            poscar=Path(poscar)
-            poscar=Structure.from_file(poscar)
-            poscar.to_file(target)
+            poscar=structure_cache.get(poscar)
+            write_text_if_changed(target, poscar.to(fmt="poscar"))
+            return
+
+        # Case 2: structure object
+        if isinstance(poscar, Structure):
+            write_text_if_changed(target, poscar.to(fmt="poscar"))
             return
 
         raise TypeError(
-            "poscar must be a path-like object that can be parsed by pymatgen"
+            "poscar must be a path-like object that can be parsed by pymatgen or a Structure"
         )
 
+    @timed("write_incar")
     def _write_incar(self, incar, cwd: Path):
         """Write INCAR file from a file path or a dict.
 
         - If ``incar`` is a Path or string, copy its contents to ``cwd/INCAR``.
         - If ``incar`` is a dict, write key-value pairs into ``cwd/INCAR``.
         """
+        from pymatgen.io.vasp.inputs import Incar
 
         target = cwd / "INCAR"
 
         # Case 1: existing INCAR-like file path
         if isinstance(incar, (Path,str)):
             incar=Incar.from_file(incar)
-            incar.write_file(target)
+            write_text_if_changed(target, str(incar))
             return
 
         # Case 2: INCAR content as dict
         if isinstance(incar, dict):
             incar=Incar.from_dict(incar)
-            incar.write_file(target)
+            write_text_if_changed(target, str(incar))
             return
 
         raise TypeError("incar must be a path-like object or a dict of INCAR settings")
 
 
+    @timed("write_potcar")
     def _write_potcar(self, potcar, cwd: Path):
         """
         Write POTCAR file from a file path or a potcar object.
+
+        The file is staged through the content-addressed store, so identical
+        POTCARs are linked instead of duplicated in every task directory.
         """
 
         target = cwd / "POTCAR"
 
         # Case 1: existing POTCAR-like file path
         if isinstance(potcar, (Path, str)):
-            potcar=Path(potcar)
-            potcar=potcar.read_text()
-            target.write_text(potcar)
+            self.store.materialize(Path(potcar), target)
             return
 
         raise TypeError(
             "potcar must be a path-like object or a string"
         )
 
+    @timed("write_kpoints")
     def _write_kpoints(self, kpoints, cwd: Path,poscar=None):
         """
         Write KPOINTS file from a file path or a kpoints object.
         """
+        from pymatgen.io.vasp.inputs import Kpoints
 
         target = cwd / "KPOINTS"
 
-        # Case 1: KPOINTS line mode
-        if kpoints == "line":
-            from pymatgen.symmetry.kpath import KPathSeek
+        # Case 1: KPOINTS line mode, either "line" or
+        # {mode: line, line_density: 30, symprec: 1e-5}
+        if kpoints == "line" or (isinstance(kpoints, dict) and kpoints.get("mode") == "line"):
+            from .kpath import DEFAULT_LINE_DENSITY, DEFAULT_SYMPREC, kpath_cache
             if poscar is None:
                 raise ValueError("poscar is required to generate line-mode KPOINTS")
 
-            structure = Structure.from_file(poscar)
-            kpath = KPathSeek(structure,symprec=1e-5)
+            options = kpoints if isinstance(kpoints, dict) else {}
+            structure = self._structure(poscar)
 
             # line_density 控制每段路径的点数密度
-            kpts, labels = kpath.get_kpoints(line_density=30, coords_are_cartesian=True)
+            kpts, labels = kpath_cache.get(
+                structure,
+                line_density=float(options.get("line_density", DEFAULT_LINE_DENSITY)),
+                symprec=float(options.get("symprec", DEFAULT_SYMPREC)),
+            )
 
             kp = Kpoints(comment="High-symmetry line path from Seek-path")
             kp.kpts = kpts
             kp.kpts_labels = labels
             kp.style = Kpoints.supported_modes.Line_mode
 
-            kp.write_file(target)
+            write_text_if_changed(target, str(kp))
             return
 
 
         # Case 2: Gamma-centered automatic mesh based on reciprocal-space size.
         # ``kpoints`` is treated as the KPR value (float/int) used in
-        # N_i = max(1, ceil(|b_i| / kpr)), similar to VASPKIT's definition.
+        # N_i = max(1, floor(|b_i| / (2 pi kpr))) (kmesh.kpr_mesh), as VASPKIT does.
         if isinstance(kpoints, (float, int)):
             if poscar is None:
                 raise ValueError("poscar is required to generate gamma-mode KPOINTS")
-            structure = Structure.from_file(poscar)
+            structure = self._structure(poscar)
 
             # Use norms of the reciprocal lattice vectors |b_i|
             bnorm = structure.lattice.reciprocal_lattice.abc
             grid = self._calculate_grid_dimensions(bnorm, float(kpoints))
             kp = Kpoints.gamma_automatic(grid)
-            kp.write_file(target)
+            write_text_if_changed(target, str(kp))
+            return
+
+        # Case 3: {kpr: 0.03, mode: irreducible} picks the mesh with the
+        # fewest irreducible k-points at or above the KPR density
+        if isinstance(kpoints, dict):
+            if poscar is None:
+                raise ValueError("poscar is required to generate gamma-mode KPOINTS")
+            structure = self._structure(poscar)
+            kpr = float(kpoints["kpr"])
+            mode = kpoints.get("mode", "irreducible")
+
+            if mode == "kpr":
+                bnorm = structure.lattice.reciprocal_lattice.abc
+                kp = Kpoints.gamma_automatic(self._calculate_grid_dimensions(bnorm, kpr))
+                write_text_if_changed(target, str(kp))
+                return
+            if mode != "irreducible":
+                raise ValueError(f"Unknown kpoints mode '{mode}', expected 'irreducible', 'kpr' or 'line'")
+
+            from .kmesh import DEFAULT_SEARCH, DEFAULT_SYMPREC, irreducible_mesh
+
+            choice = irreducible_mesh(
+                structure,
+                kpr,
+                search=int(kpoints.get("search", DEFAULT_SEARCH)),
+                symprec=float(kpoints.get("symprec", DEFAULT_SYMPREC)),
+            )
+            kp = Kpoints.gamma_automatic(choice.mesh)
+            kp.comment = choice.comment()
+            write_text_if_changed(target, str(kp))
+            write_text_if_changed(cwd / "kmesh.json", json.dumps(choice.to_dict(), indent=2))
             return
 
-        # Case 3: existing KPOINTS-like file path
+        # Case 4: existing KPOINTS-like file path
         if isinstance(kpoints, (Path, str)):
             kpoints=Path(kpoints)
             kpoints=Kpoints.from_file(kpoints)
-            kpoints.write_file(target)
+            write_text_if_changed(target, str(kpoints))
             return
 
 
 
         
     
+    @timed("write_jobscript")
     def _write_jobscript(self, jobscript, cwd: Path):
         """
         Write jobscript file from a file path or a string.
@@ -238,12 +457,12 @@ class Job:
         if isinstance(jobscript, Path):
             jobscript=Path(jobscript)
             jobscript=jobscript.read_text()
-            target.write_text(jobscript)
+            write_text_if_changed(target, jobscript)
             return
 
         # Case 2: jobscript content as string
         if isinstance(jobscript, str):
-            target.write_text(jobscript)
+            write_text_if_changed(target, jobscript)
             return
 
         raise TypeError(
@@ -273,49 +492,75 @@ class Job:
             )
         return cfg_val
 
+    @timed("handle_cp")
     def _handle_cp(self, job_type: str, cwd: Path):
         """Handle file/directory copying defined in config['cp'].
         
         Format in yaml:
           cp:
             source_path: target_path
+            source_path: {to: target_path, mode: copy|symlink|hardlink, checksum: false, delete: true}
             
         source_path is resolved relative to self.work_dir (if not absolute).
         target_path is resolved relative to cwd (if not absolute).
+        Directories are delta-synced (see sync.py): only changed files are copied.
         """
+        from .sync import SYNC_MODES, sync_file, sync_tree, up_to_date
+
         section_cfg = self.config.get(job_type) or {}
         cp_cfg = section_cfg.get("cp")
         
         if not cp_cfg or not isinstance(cp_cfg, dict):
             return
 
+        sync_cfg = self.config.get("global", {}).get("sync") or {}
+        workers = int(sync_cfg.get("workers", 8))
+
         for src, dst in cp_cfg.items():
+            options = dst if isinstance(dst, dict) else {"to": dst}
+            mode = options.get("mode", "copy")
+            if mode not in SYNC_MODES:
+                raise ValueError(f"Unknown cp mode '{mode}' for '{src}', expected one of {SYNC_MODES}")
+            checksum = bool(options.get("checksum", sync_cfg.get("checksum", False)))
+
             # Resolve source path
             src_path = Path(src)
             if not src_path.is_absolute():
                 src_path = self.work_dir / src_path
                 
             # Resolve destination path
-            dst_path = cwd / dst
+            dst_path = cwd / options["to"]
             
             if not src_path.exists():
                 print(f"Warning: Source path '{src_path}' does not exist. Skipping copy.")
                 continue
                 
             if src_path.is_dir():
-                # Copy directory
-                if dst_path.exists():
-                     # Remove existing destination directory to avoid FileExistsError
-                     # or merge strategies (here we overwrite/replace)
-                     shutil.rmtree(dst_path)
-                shutil.copytree(src_path, dst_path)
-                print(f"Copied directory {src_path} -> {dst_path}")
+                # Mirror the directory, transferring only what changed
+                stats = sync_tree(
+                    src_path,
+                    dst_path,
+                    mode=mode,
+                    checksum=checksum,
+                    delete=bool(options.get("delete", True)),
+                    workers=workers,
+                )
+                print(f"Synced directory {src_path} -> {dst_path}: {stats.summary()}")
+                for error in stats.errors:
+                    print(f"Warning: could not sync {error}")
+            elif up_to_date(src_path.resolve(), dst_path, mode, checksum):
+                continue
+            elif mode == "copy" and (dst_path.name in STAGED_FILES or dst_path.name in self.store.modes):
+                # Large input: link from the staging store (links to it count as unchanged)
+                mode = self.store.materialize(src_path, dst_path)
+                if mode != "unchanged":
+                    print(f"Staged file {src_path} -> {dst_path} ({mode})")
             else:
                 # Copy file
                 # Ensure parent directory exists
                 dst_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(src_path, dst_path)
-                print(f"Copied file {src_path} -> {dst_path}")
+                sync_file(src_path.resolve(), dst_path, mode)
+                print(f"{'Copied' if mode == 'copy' else 'Linked'} file {src_path} -> {dst_path}")
 
     def relax(
         self,
@@ -350,6 +595,12 @@ class Job:
             "-y",
             help="Submit without interactive confirmation",
         ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
     ) -> None:
         """Relaxation job helper using Job.relax with config fallbacks."""
 
@@ -373,11 +624,8 @@ class Job:
         # Handle file copies
         self._handle_cp("relax", cwd)
 
-        if yes:
-            self.submit(cwd)
-        else:
-            typer.confirm("Submit job?", abort=True)
-            self.submit(cwd)
+        self._submit_if_needed(cwd, yes, force)
+        self.scheduler.wait()
 
 
     def static(
@@ -413,6 +661,12 @@ class Job:
             "-y",
             help="Submit without interactive confirmation",
         ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
     ) -> None:
         """Static calculation job helper using Job.static with config fallbacks."""
 
@@ -436,11 +690,8 @@ class Job:
         # Handle file copies
         self._handle_cp("static", cwd)
 
-        if yes:
-            self.submit(cwd)
-        else:
-            typer.confirm("Submit job?", abort=True)
-            self.submit(cwd)
+        self._submit_if_needed(cwd, yes, force)
+        self.scheduler.wait()
     def dos(
         self,
         poscar: Optional[Path] = typer.Option(
@@ -474,6 +725,12 @@ class Job:
             "-y",
             help="Submit without interactive confirmation",
         ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
     ) -> None:
         """DOS calculation job helper using Job.dos with config fallbacks."""
 
@@ -495,11 +752,8 @@ class Job:
         # Handle file copies
         self._handle_cp("dos", cwd)
 
-        if yes:
-            self.submit(cwd)
-        else:
-            typer.confirm("Submit job?", abort=True)
-            self.submit(cwd)
+        self._submit_if_needed(cwd, yes, force)
+        self.scheduler.wait()
             
     def band(self,
         poscar: Optional[Path] = typer.Option(
@@ -533,6 +787,12 @@ class Job:
             "-y",
             help="Submit without interactive confirmation",
         ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
     ) -> None:
         """Band structure calculation job helper using Job.band with config fallbacks."""
 
@@ -554,11 +814,542 @@ class Job:
         # Handle file copies
         self._handle_cp("band", cwd)
 
-        if yes:
-            self.submit(cwd)
-        else:
-            typer.confirm("Submit job?", abort=True)
-            self.submit(cwd)
+        self._submit_if_needed(cwd, yes, force)
+        self.scheduler.wait()
+
+
+    def array(
+        self,
+        dirs: List[Path] = typer.Argument(
+            ...,
+            help="Prepared task directories (relative to work_dir) containing jobscript.sh",
+        ),
+        scheduler: Optional[str] = typer.Option(
+            None,
+            "--scheduler",
+            "-s",
+            help="Override global.scheduler: pbs, torque, slurm or local",
+        ),
+        yes: bool = typer.Option(
+            False,
+            "--yes",
+            "-y",
+            help="Submit without interactive confirmation",
+        ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
+    ) -> None:
+        """Submit many task directories as a single job array."""
+
+        if scheduler is not None:
+            self.scheduler = scheduler_from_config(self.config.get("global"), scheduler)
+
+        task_dirs = [d if d.is_absolute() else self.work_dir / d for d in dirs]
+        if not force:
+            task_dirs = [d for d in task_dirs if self._needs_submission(d) is not None]
+            skipped = len(dirs) - len(task_dirs)
+            if skipped:
+                print(f"Skipping {skipped} directories with unchanged inputs (use --force to resubmit).")
+            if not task_dirs:
+                return
+
+        if not yes:
+            typer.confirm(f"Submit {len(task_dirs)} tasks as one job array?", abort=True)
+        self.submit_array(task_dirs)
+        self.scheduler.wait()
+
+
+    def batch(
+        self,
+        source: str = typer.Argument(
+            ...,
+            help="Directory, glob pattern or extxyz file with the structures",
+        ),
+        stage: str = typer.Option(
+            "relax",
+            "--stage",
+            help="vasp_config.yaml section used as template (incar, potcar, kpoints, jobscript)",
+        ),
+        name: Optional[str] = typer.Option(
+            None,
+            "--name",
+            "-n",
+            help="Batch directory below work_dir (default: <stage>-batch)",
+        ),
+        workers: int = typer.Option(
+            os.cpu_count() or 1,
+            "--workers",
+            "-j",
+            help="Number of worker processes writing task directories",
+        ),
+        chunk_size: int = typer.Option(
+            500,
+            "--chunk-size",
+            help="Task directories per job array submission",
+        ),
+        submit: bool = typer.Option(
+            True,
+            "--submit/--no-submit",
+            help="Submit the prepared tasks as job arrays",
+        ),
+        yes: bool = typer.Option(
+            False,
+            "--yes",
+            "-y",
+            help="Submit without interactive confirmation",
+        ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
+    ) -> None:
+        """Set up one stage for many structures and submit them in chunks."""
+        from .batch import run_batch
+
+        try:
+            task_dirs, errors = run_batch(self, source, stage, name or f"{stage}-batch", workers)
+        except ValueError as e:
+            print(e)
+            raise typer.Exit(1)
+        print(f"Prepared {len(task_dirs)} task directories ({len(errors)} failed).")
+        if not submit:
+            return
+
+        if not force:
+            task_dirs = [d for d in task_dirs if self._needs_submission(d) is not None]
+        if not task_dirs:
+            print("Nothing to submit.")
+            return
+
+        chunks = [task_dirs[i : i + chunk_size] for i in range(0, len(task_dirs), chunk_size)]
+        if not yes:
+            typer.confirm(
+                f"Submit {len(task_dirs)} tasks as {len(chunks)} job arrays?", abort=True
+            )
+        for chunk in chunks:
+            self.submit_array(chunk)
+        self.scheduler.wait()
+
+    def chain(
+        self,
+        stages: str = typer.Option(
+            "relax,static,dos,band",
+            "--stages",
+            help="Comma-separated vasp_config.yaml sections, submitted in this order",
+        ),
+        yes: bool = typer.Option(
+            False,
+            "--yes",
+            "-y",
+            help="Submit without interactive confirmation",
+        ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit every stage even if its inputs are unchanged",
+        ),
+    ) -> None:
+        """Submit all stages at once; each starts after the stages it reads from (afterok)."""
+        from .chain import run_chain
+
+        stage_list = [s.strip() for s in stages.split(",") if s.strip()]
+        try:
+            job_ids = run_chain(self, stage_list, yes, force)
+        except (ValueError, SchedulerQueryError) as e:
+            print(e)
+            raise typer.Exit(1)
+        print(f"Submitted {len(job_ids)} of {len(stage_list)} stages.")
+        self.scheduler.wait()
+
+    def sweep(
+        self,
+        stage: str = typer.Argument(
+            ...,
+            help="vasp_config.yaml section with a sweep block",
+        ),
+        workers: int = typer.Option(
+            os.cpu_count() or 1,
+            "--workers",
+            "-j",
+            help="Number of threads writing task directories",
+        ),
+        submit: bool = typer.Option(
+            True,
+            "--submit/--no-submit",
+            help="Submit the grid points as one job array",
+        ),
+        yes: bool = typer.Option(
+            False,
+            "--yes",
+            "-y",
+            help="Submit without interactive confirmation",
+        ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
+    ) -> None:
+        """Expand the stage's sweep block into one task per grid point and submit them."""
+        from .sweep import run_sweep
+
+        try:
+            task_dirs, errors = run_sweep(self, stage, workers)
+        except ValueError as e:
+            print(e)
+            raise typer.Exit(1)
+        print(f"Prepared {len(task_dirs)} sweep points ({len(errors)} failed).")
+        if not submit:
+            return
+
+        if not force:
+            task_dirs = [d for d in task_dirs if self._needs_submission(d) is not None]
+        if not task_dirs:
+            print("Nothing to submit.")
+            return
+
+        if not yes:
+            typer.confirm(f"Submit {len(task_dirs)} sweep points as one job array?", abort=True)
+        self.submit_array(task_dirs)
+        self.scheduler.wait()
+
+    def restart(
+        self,
+        dirs: Optional[List[Path]] = typer.Argument(
+            None,
+            help="Relaxation directories (relative to work_dir); default: <work_dir>/<stage>",
+        ),
+        stage: str = typer.Option(
+            "relax",
+            "--stage",
+            help="vasp_config.yaml section whose restart settings apply",
+        ),
+        max_attempts: Optional[int] = typer.Option(
+            None,
+            "--max-attempts",
+            help="Override <stage>.restart.max_attempts (default 3)",
+        ),
+        dry_run: bool = typer.Option(
+            False,
+            "--dry-run",
+            help="Only report which directories would be restarted",
+        ),
+        yes: bool = typer.Option(
+            False,
+            "--yes",
+            "-y",
+            help="Restart without interactive confirmation",
+        ),
+    ) -> None:
+        """Restart relaxations that hit NSW or were killed, continuing from CONTCAR/WAVECAR."""
+        from .restart import relaxation_status, restart
+
+        task_dirs = [d if d.is_absolute() else self.work_dir / d for d in dirs or [Path(stage)]]
+        pending = []
+        try:
+            # One bulk query up front; a failure must not make running jobs look terminated
+            self.scheduler.refresh()
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Failed to query scheduler: {e}; not restarting anything.")
+            raise typer.Exit(1)
+        for cwd in task_dirs:
+            status = relaxation_status(cwd, self)
+            print(f"{cwd}: {status}")
+            if status in ("nsw limit", "terminated"):
+                pending.append((cwd, status))
+
+        if not pending or dry_run:
+            return
+        if not yes:
+            typer.confirm(f"Restart {len(pending)} relaxations?", abort=True)
+        for cwd, status in pending:
+            restart(self, cwd, stage, status, max_attempts)
+        self.scheduler.wait()
+
+    def watch(
+        self,
+        interval: float = typer.Option(
+            30.0,
+            "--interval",
+            "-n",
+            help="Seconds between refreshes; 0 prints the table once",
+        ),
+        active: bool = typer.Option(
+            False,
+            "--active",
+            help="Only show tasks that have not finished",
+        ),
+    ) -> None:
+        """Show ionic steps, energies and forces of all tasks, reading only new output."""
+        from .watch import Watcher, format_table, task_dirs
+
+        work_dir = self.work_dir.resolve()
+        watcher = Watcher(work_dir)
+        try:
+            while True:
+                try:
+                    snapshot = self.scheduler.query()
+                except (OSError, subprocess.CalledProcessError):
+                    snapshot = None
+                progress = watcher.refresh(task_dirs(work_dir, self.jobdb.jobs()))
+                watcher.save()
+                if active:
+                    progress = {d: p for d, p in progress.items() if not p.finished}
+
+                if interval > 0:
+                    typer.clear()
+                    print(time.strftime("%Y-%m-%d %H:%M:%S"), f"({len(progress)} tasks, every {interval:g} s)")
+                print(format_table(work_dir, progress, snapshot))
+                if interval <= 0:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    def status(
+        self,
+        scheduler: Optional[str] = typer.Option(
+            None,
+            "--scheduler",
+            "-s",
+            help="Override global.scheduler: pbs, torque, slurm or local",
+        ),
+        state: Optional[str] = typer.Option(
+            None,
+            "--state",
+            help="List the jobs in this state (e.g. running, failed)",
+        ),
+        list_all: bool = typer.Option(
+            False,
+            "--all",
+            "-a",
+            help="List every tracked job",
+        ),
+    ) -> None:
+        """Refresh tracked jobs with one bulk scheduler query and print a summary."""
+
+        if scheduler is not None:
+            self.scheduler = scheduler_from_config(self.config.get("global"), scheduler)
+
+        try:
+            snapshot = self.scheduler.query()
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Failed to query scheduler: {e}")
+            raise typer.Exit(1)
+
+        changed = self.jobdb.refresh(snapshot)
+        print(f"Job database: {self.jobdb.path} ({changed} state changes)")
+        for name, count in sorted(self.jobdb.counts().items()):
+            print(f"  {name:<10} {count:>8d}")
+
+        if state is not None or list_all:
+            for task, directory, job_id, job_state, submitted_at in self.jobdb.jobs(state):
+                submitted = time.strftime("%Y-%m-%d %H:%M", time.localtime(submitted_at))
+                print(f"{job_state:<10} {job_id:<24} {submitted}  {task:<12} {directory}")
+
+    def pack(
+        self,
+        dirs: List[Path] = typer.Argument(
+            ...,
+            help="Prepared task directories (each with a jobscript.sh)",
+        ),
+        cores_per_task: Optional[int] = typer.Option(
+            None,
+            "--cores-per-task",
+            "-c",
+            help="Cores given to each task (default: global.pack.cores_per_task or 1)",
+        ),
+        size: Optional[int] = typer.Option(
+            None,
+            "--size",
+            "-k",
+            help="Tasks per packed job (default: global.pack.size, else all in one job)",
+        ),
+        cores: Optional[int] = typer.Option(
+            None,
+            "--cores",
+            help="Cores of one allocation (default: global.pack.cores, else cores per task times tasks per job)",
+        ),
+        yes: bool = typer.Option(
+            False,
+            "--yes",
+            "-y",
+            help="Submit without interactive confirmation",
+        ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
+    ) -> None:
+        """Run many small prepared tasks inside shared scheduler allocations."""
+        pack_cfg = self.config.get("global", {}).get("pack") or {}
+        cores_per_task = int(cores_per_task or pack_cfg.get("cores_per_task", 1))
+        cores = cores or pack_cfg.get("cores")
+        task_dirs = [d if d.is_absolute() else self.work_dir / d for d in dirs]
+        task_dirs = [d.resolve() for d in task_dirs if (d / "jobscript.sh").is_file()]
+        skipped = len(dirs) - len(task_dirs)
+        if skipped:
+            print(f"Skipping {skipped} directories without jobscript.sh.")
+
+        if not force:
+            task_dirs = [d for d in task_dirs if self._needs_submission(d) is not None]
+        if not task_dirs:
+            print("Nothing to submit.")
+            return
+
+        size = int(size or pack_cfg.get("size") or len(task_dirs))
+        chunks = [task_dirs[i : i + size] for i in range(0, len(task_dirs), size)]
+        if not yes:
+            typer.confirm(
+                f"Submit {len(task_dirs)} tasks as {len(chunks)} packed jobs "
+                f"({cores_per_task} cores per task)?",
+                abort=True,
+            )
+        for chunk in chunks:
+            self.submit_pack(chunk, cores_per_task, cores)
+        self.scheduler.wait()
+
+    def submitd(
+        self,
+        dirs: Optional[List[Path]] = typer.Argument(
+            None,
+            help="Prepared task directories to add to the queue",
+        ),
+        limit: Optional[int] = typer.Option(
+            None,
+            "--limit",
+            "-l",
+            help="Jobs of this queue allowed in the scheduler at once (default: global.submitd.limit or 100)",
+        ),
+        min_interval: Optional[float] = typer.Option(
+            None,
+            "--min-interval",
+            help="Shortest time between scheduler polls in seconds (default 30)",
+        ),
+        max_interval: Optional[float] = typer.Option(
+            None,
+            "--max-interval",
+            help="Longest time between scheduler polls in seconds (default 600)",
+        ),
+        enqueue_only: bool = typer.Option(
+            False,
+            "--enqueue-only",
+            help="Only add DIRS to the queue (e.g. for a daemon that is already running)",
+        ),
+        follow: bool = typer.Option(
+            False,
+            "--follow",
+            help="Keep running when the queue is drained and wait for new directories",
+        ),
+        requeue: bool = typer.Option(
+            False,
+            "--requeue",
+            help="Queue DIRS again even if this queue already handled them",
+        ),
+        force: bool = typer.Option(
+            False,
+            "--force",
+            "-f",
+            help="Resubmit even if inputs are unchanged since the last submission",
+        ),
+    ) -> None:
+        """Submit queued task directories as scheduler slots free up."""
+        from .submitd import (
+            DB_NAME,
+            DEFAULT_LIMIT,
+            DEFAULT_MAX_ATTEMPTS,
+            DEFAULT_MAX_INTERVAL,
+            DEFAULT_MIN_INTERVAL,
+            SubmitQueue,
+            run_daemon,
+        )
+
+        submitd_cfg = self.config.get("global", {}).get("submitd") or {}
+        queue = SubmitQueue(Path(submitd_cfg.get("db") or self.work_dir.resolve() / DB_NAME))
+        if dirs:
+            added = queue.add([d if d.is_absolute() else self.work_dir / d for d in dirs], requeue=requeue)
+            print(f"Queued {added} of {len(dirs)} directories in {queue.path}.")
+        if enqueue_only:
+            return
+
+        if not queue.lock():
+            print(f"Another submitd is already running on {queue.path}; use --enqueue-only to add directories.")
+            raise typer.Exit(1)
+
+        try:
+            run_daemon(
+                self,
+                queue,
+                limit=int(limit if limit is not None else submitd_cfg.get("limit", DEFAULT_LIMIT)),
+                min_interval=float(
+                    min_interval
+                    if min_interval is not None
+                    else submitd_cfg.get("min_interval", DEFAULT_MIN_INTERVAL)
+                ),
+                max_interval=float(
+                    max_interval
+                    if max_interval is not None
+                    else submitd_cfg.get("max_interval", DEFAULT_MAX_INTERVAL)
+                ),
+                follow=follow,
+                force=force,
+                max_attempts=int(submitd_cfg.get("max_attempts", DEFAULT_MAX_ATTEMPTS)),
+            )
+        except KeyboardInterrupt:
+            print("Stopped; the queue is kept and a new submitd resumes it.")
+        self.scheduler.wait()
+
+    def potcar(
+        self,
+        elements: Optional[List[str]] = typer.Argument(
+            None,
+            help="Elements or variants to show (default: the whole library)",
+        ),
+        library: Optional[Path] = typer.Option(
+            None,
+            "--library",
+            "-L",
+            help="POTCAR library directory (default: global.potcar_dir or INK_POTCAR_DIR)",
+        ),
+        rebuild: bool = typer.Option(
+            False,
+            "--rebuild",
+            help="Rescan the library even if the index is up to date",
+        ),
+    ) -> None:
+        """Index a POTCAR library and print TITEL, ZVAL and ENMAX per variant."""
+        from .potcar import potcar_dir, shared_library, variant_for
+
+        root = library or potcar_dir(self.config.get("global"))
+        if root is None:
+            print("No POTCAR library: pass --library or set global.potcar_dir / INK_POTCAR_DIR.")
+            raise typer.Exit(1)
+
+        lib = shared_library(root)
+        index = lib.rebuild() if rebuild else lib.index
+        entries = index["entries"]
+        print(f"{lib.root}: {len(entries)} variants, index {lib.index_path}")
+
+        overrides = self.config.get("global", {}).get("potcar_variants") or {}
+        names = [e if e in entries else variant_for(e, overrides) for e in elements] if elements else sorted(entries)
+        for name in names:
+            entry = entries.get(name)
+            if entry is None:
+                print(f"{name:<10} (not in library)")
+                continue
+            # scan_datasets stores None for values it could not parse
+            zval, enmax = ("-" if entry[k] is None else f"{entry[k]:.3f}" for k in ("zval", "enmax"))
+            print(f"{name:<10} {zval:>7} {enmax:>9}  {entry['titel']}")
 
 
 # --- 实例化并提供外部接口
@@ -573,9 +1364,14 @@ def create_lazy_command(cls, method_name):
     @wraps(method)
     def wrapper(*args, **kwargs):
         # Instantiate the class only when the command is called
-        instance = cls()
-        # Call the bound method on the instance
-        return getattr(instance, method_name)(*args, **kwargs)
+        with timer.span("job_init"):
+            instance = cls()
+        # Call the bound method on the instance, then export the phase
+        # timings requested in global.timing
+        try:
+            return getattr(instance, method_name)(*args, **kwargs)
+        finally:
+            timer.export(instance.config.get("global"), method_name, instance.work_dir)
     
     # Update the wrapper signature to remove 'self' so Typer parses arguments correctly
     sig = inspect.signature(method)
@@ -589,4 +1385,14 @@ app = typer.Typer(help="vasp jobs command-line interface")
 app.command(name="relax")(create_lazy_command(Job, "relax"))
 app.command(name="static")(create_lazy_command(Job, "static"))
 app.command(name="dos")(create_lazy_command(Job, "dos"))
-
+app.command(name="array")(create_lazy_command(Job, "array"))
+app.command(name="status")(create_lazy_command(Job, "status"))
+app.command(name="batch")(create_lazy_command(Job, "batch"))
+
+app.command(name="chain")(create_lazy_command(Job, "chain"))
+app.command(name="sweep")(create_lazy_command(Job, "sweep"))
+app.command(name="watch")(create_lazy_command(Job, "watch"))
+app.command(name="restart")(create_lazy_command(Job, "restart"))
+app.command(name="pack")(create_lazy_command(Job, "pack"))
+app.command(name="submitd")(create_lazy_command(Job, "submitd"))
+app.command(name="potcar")(create_lazy_command(Job, "potcar"))
@@ -0,0 +1,128 @@
+"""Choose Gamma-centred k-meshes with as few irreducible k-points as possible.
+
+The KPR formula gives a base mesh ``N_i = max(1, floor(|b_i| / (2 pi kpr)))``.
+Meshes with ``N_i`` in ``base_i .. base_i + search`` are all at least as
+dense; VASP's cost scales with the number of irreducible k-points, which
+can differ by 2-3x between neighbouring meshes. ``irreducible_mesh``
+counts them with spglib for every candidate that keeps the lattice
+symmetry and returns the cheapest one.
+
+In vasp_config.yaml::
+
+    kpoints:
+      kpr: 0.03
+      mode: irreducible   # or "kpr" for the plain base mesh
+      search: 2           # optional, extra divisions tried per direction
+      symprec: 1.0e-5     # optional
+"""
+
+import itertools
+import math
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import spglib
+
+Mesh = Tuple[int, int, int]
+
+DEFAULT_SEARCH = 2
+DEFAULT_SYMPREC = 1e-5
+
+
+@dataclass
+class MeshChoice:
+    kpr: float
+    mesh: Mesh
+    irreducible: int
+    base_mesh: Mesh
+    base_irreducible: int
+
+    @property
+    def total(self) -> int:
+        return self.mesh[0] * self.mesh[1] * self.mesh[2]
+
+    def comment(self) -> str:
+        mesh = "x".join(map(str, self.mesh))
+        return f"Gamma {mesh} kpr={self.kpr} irreducible={self.irreducible}"
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["total"] = self.total
+        return data
+
+
+def kpr_mesh(bnorm, kpr: float) -> Mesh:
+    """Base mesh from the norms of the reciprocal lattice vectors (with 2 pi).
+
+    The one implementation of ``Job._calculate_grid_dimensions``.
+    """
+    return tuple(max(1, math.floor(b / kpr / 2 / math.pi)) for b in bnorm)
+
+
+def _cell(structure):
+    return (
+        structure.lattice.matrix,
+        structure.frac_coords,
+        [site.specie.Z for site in structure],
+    )
+
+
+def _keeps_symmetry(mesh: Mesh, rotations) -> bool:
+    """Whether every rotation maps the Gamma-centred grid onto itself.
+
+    A reciprocal-space rotation A (the transpose of the real-space one in
+    fractional coordinates) maps n_j / N_j to grid points iff
+    A_ij * N_i / N_j is an integer for all i, j.
+    """
+    for rot in rotations:
+        a = rot.T
+        for i in range(3):
+            for j in range(3):
+                if a[i, j] and (a[i, j] * mesh[i]) % mesh[j]:
+                    return False
+    return True
+
+
+def count_irreducible(cell, mesh: Mesh, symprec: float = DEFAULT_SYMPREC, is_shift=(0, 0, 0)) -> int:
+    mapping, _ = spglib.get_ir_reciprocal_mesh(mesh, cell, is_shift=list(is_shift), symprec=symprec)
+    return len(np.unique(mapping))
+
+
+def candidate_meshes(base: Mesh, search: int = DEFAULT_SEARCH) -> List[Mesh]:
+    ranges = [range(n, n + search + 1) for n in base]
+    return [tuple(m) for m in itertools.product(*ranges)]
+
+
+def irreducible_mesh(
+    structure,
+    kpr: float,
+    search: int = DEFAULT_SEARCH,
+    symprec: float = DEFAULT_SYMPREC,
+) -> MeshChoice:
+    """Densest-or-equal mesh with the fewest irreducible k-points.
+
+    Ties go to the mesh with more points in total (higher density for the
+    same cost), then to the smaller mesh tuple.
+    """
+    cell = _cell(structure)
+    base = kpr_mesh(structure.lattice.reciprocal_lattice.abc, kpr)
+
+    symmetry = spglib.get_symmetry(cell, symprec=symprec)
+    rotations = symmetry["rotations"] if symmetry else [np.eye(3, dtype=int)]
+
+    candidates = [m for m in candidate_meshes(base, search) if _keeps_symmetry(m, rotations)]
+    if base not in candidates:
+        candidates.insert(0, base)
+
+    counts = {mesh: count_irreducible(cell, mesh, symprec) for mesh in candidates}
+    best: Optional[Mesh] = min(
+        counts, key=lambda m: (counts[m], -(m[0] * m[1] * m[2]), m)
+    )
+    return MeshChoice(
+        kpr=float(kpr),
+        mesh=best,
+        irreducible=counts[best],
+        base_mesh=base,
+        base_irreducible=counts[base],
+    )
@@ -0,0 +1,120 @@
+"""Persistent cache of high-symmetry k-paths for line-mode KPOINTS.
+
+SeeK-path returns the path of the standardized primitive cell in its
+standard orientation, so it only depends on the space group and the
+standardized lattice. Entries are keyed by that fingerprint (lattice
+rounded to ``LATTICE_DECIMALS``) plus ``line_density`` and ``symprec``;
+changing either of those two yields a new key, so stale paths are never
+reused. Each entry is a small JSON file in the cache directory.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import spglib
+from pymatgen.core.lattice import Lattice
+
+from .timing import timer
+
+DEFAULT_CACHE_DIR = Path("~/.cache/ink/kpaths")
+DEFAULT_LINE_DENSITY = 30
+DEFAULT_SYMPREC = 1e-5
+
+# Lattices that agree to this many decimals (in Angstrom/degrees) share a path
+LATTICE_DECIMALS = 4
+
+
+def fingerprint(structure, line_density: float, symprec: float) -> str:
+    """Cache key: space group + standardized lattice + path parameters."""
+    cell = (
+        structure.lattice.matrix,
+        structure.frac_coords,
+        [site.specie.Z for site in structure],
+    )
+    dataset = spglib.get_symmetry_dataset(cell, symprec=symprec)
+    if dataset is None:
+        raise ValueError(f"spglib could not determine the symmetry (symprec={symprec})")
+
+    std = Lattice(dataset.std_lattice)
+    key = {
+        "spacegroup": int(dataset.number),
+        "lattice": [round(float(x), LATTICE_DECIMALS) for x in (*std.abc, *std.angles)],
+        "line_density": float(line_density),
+        "symprec": float(symprec),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class KPathCache:
+    """k-points and labels of SeeK-path line paths, in memory and on disk."""
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        self._paths: Dict[str, Tuple[List[List[float]], List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        structure,
+        line_density: float = DEFAULT_LINE_DENSITY,
+        symprec: float = DEFAULT_SYMPREC,
+    ) -> Tuple[List[List[float]], List[str]]:
+        """Cartesian k-points and labels of the path, computing it at most once."""
+        key = fingerprint(structure, line_density, symprec)
+
+        with self._lock:
+            cached = self._paths.get(key)
+        if cached is None:
+            cached = self._load(key)
+        if cached is None:
+            from pymatgen.symmetry.kpath import KPathSeek
+
+            with timer.span("kpath_seek"):
+                kpath = KPathSeek(structure, symprec=symprec)
+                kpts, labels = kpath.get_kpoints(line_density=line_density, coords_are_cartesian=True)
+            cached = ([[float(x) for x in k] for k in kpts], list(labels))
+            self._dump(key, cached)
+
+        with self._lock:
+            cached = self._paths.setdefault(key, cached)
+        return cached
+
+    def clear(self) -> None:
+        with self._lock:
+            self._paths.clear()
+
+    def _json_path(self, key: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{key}.json"
+
+    def _load(self, key: str) -> Optional[Tuple[List[List[float]], List[str]]]:
+        path = self._json_path(key)
+        if path is None or not path.is_file():
+            return None
+        try:
+            data = json.loads(path.read_text())
+            return data["kpts"], data["labels"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _dump(self, key: str, entry: Tuple[List[List[float]], List[str]]) -> None:
+        path = self._json_path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(json.dumps({"kpts": entry[0], "labels": entry[1]}))
+            os.replace(tmp_path, path)
+        except OSError:
+            # Read-only or full cache directory: keep the in-memory entry.
+            pass
+
+
+# Shared by all Job writers in one process; global.kpath_cache overrides it.
+kpath_cache = KPathCache(os.environ.get("INK_KPATH_CACHE") or DEFAULT_CACHE_DIR)
@@ -1,13 +1,21 @@
 import os
 import stat
 import shutil
-import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import typer
 import yaml
 
+from .helpers import DEFAULT_LIMIT, helper_pool
+from .jobdb import JobDB
+from .manifest import write_manifest
+from .native import kpoints_options, potcar_options, write_kpoints, write_potcar
+from .scheduler import PBSScheduler, Scheduler, scheduler_from_config
+from .staging import Store, shared_store
+from .timing import timed, timer
+
 
 app = typer.Typer()
 
@@ -35,6 +43,20 @@ def _check_vaspkit(global_cfg: dict) -> str:
     return vaspkit_cmd
 
 
+def _needs_vaspkit(config: dict, global_cfg: dict) -> bool:
+    """Whether any potcar/kpoints entry has to run vaspkit instead of the native generator."""
+    for name, task_cfg in config.items():
+        if name in {"global", "ending"} or not isinstance(task_cfg, dict):
+            continue
+        potcar_spec = task_cfg.get("potcar")
+        if potcar_spec and potcar_options(potcar_spec, global_cfg) is None and "vaspkit" in str(potcar_spec):
+            return True
+        kpoints_spec = task_cfg.get("kpoints")
+        if kpoints_spec and kpoints_options(kpoints_spec, global_cfg) is None and "vaspkit" in str(kpoints_spec):
+            return True
+    return False
+
+
 def _prepare_poscar(task_name: str, work_dir: Path, poscar_spec: str) -> None:
     task_dir = work_dir / task_name
     task_dir.mkdir(parents=True, exist_ok=True)
@@ -49,7 +71,9 @@ def _prepare_poscar(task_name: str, work_dir: Path, poscar_spec: str) -> None:
     shutil.copyfile(src, dst)
 
 
-def _prepare_chgcar(task_name: str, work_dir: Path, chgcar_spec: str) -> None:
+def _prepare_chgcar(
+    task_name: str, work_dir: Path, chgcar_spec: str, store: Optional[Store] = None
+) -> None:
     task_dir = work_dir / task_name
     task_dir.mkdir(parents=True, exist_ok=True)
 
@@ -60,7 +84,12 @@ def _prepare_chgcar(task_name: str, work_dir: Path, chgcar_spec: str) -> None:
         )
 
     dst = task_dir / "CHGCAR"
-    shutil.copyfile(src, dst)
+    if store is None:
+        shutil.copyfile(src, dst)
+        return
+
+    mode = store.materialize(src, dst)
+    typer.echo(f"[task {task_name}] staged CHGCAR ({mode})")
 
 
 def _run_command_in_task(task_name: str, work_dir: Path, raw_cmd: str, vaspkit_cmd: str) -> None:
@@ -75,7 +104,7 @@ def _run_command_in_task(task_name: str, work_dir: Path, raw_cmd: str, vaspkit_c
     task_dir.mkdir(parents=True, exist_ok=True)
 
     typer.echo(f"[task {task_name}] running: {cmd}")
-    subprocess.run(cmd, shell=True, cwd=str(task_dir), check=True)
+    helper_pool.run(task_name, task_dir, cmd)
 
 
 def _write_incar(task_name: str, work_dir: Path, incar_cfg: dict) -> None:
@@ -110,7 +139,15 @@ def _write_jobscript(task_name: str, work_dir: Path, script_content: str) -> Pat
     return script_path
 
 
-def _submit_job(task_name: str, script_path: Path, auto_yes: bool) -> None:
+def _submit_job(
+    task_name: str,
+    script_path: Path,
+    auto_yes: bool,
+    scheduler: Optional[Scheduler] = None,
+    jobdb: Optional[JobDB] = None,
+) -> None:
+    scheduler = scheduler or PBSScheduler()
+
     if not script_path.is_file():
         msg = (
             typer.style("[task ", fg=typer.colors.RED)
@@ -128,7 +165,7 @@ def _submit_job(task_name: str, script_path: Path, auto_yes: bool) -> None:
             typer.style("[task ", fg=typer.colors.RED)
             + typer.style(task_name, fg=typer.colors.GREEN)
             + typer.style(
-                f"] Submit job with qsub {script_path.name}?", fg=typer.colors.RED
+                f"] Submit job {script_path.name} ({scheduler.name})?", fg=typer.colors.RED
             )
         )
         do_submit = typer.confirm(prompt)
@@ -138,48 +175,268 @@ def _submit_job(task_name: str, script_path: Path, auto_yes: bool) -> None:
 
     typer.secho("[task ", nl=False, fg=typer.colors.RED)
     typer.secho(task_name, nl=False, fg=typer.colors.GREEN)
-    typer.secho(f"] submitting job: qsub {script_path.name}", fg=typer.colors.RED)
-    subprocess.run("qsub " + script_path.name, shell=True, cwd=str(script_path.parent), check=True)
-
-
-def _process_task(
+    typer.secho(f"] submitting job ({scheduler.name}): {script_path.name}", fg=typer.colors.RED)
+    with timer.span("submit"):
+        job_id = scheduler.submit(script_path, script_path.parent)
+    if job_id:
+        # Same bookkeeping as Job.submit, so `ink vaspjobs` skips/status see these jobs
+        task_dir = script_path.parent
+        (task_dir / "qsub.pid").write_text(job_id)
+        manifest = write_manifest(task_dir, job_id)
+        if jobdb is not None:
+            jobdb.record_submission(task_name, task_dir, job_id, manifest["input_hash"])
+
+
+@timed("prepare_task")
+def _prepare_task(
     task_name: str,
     config: dict,
     work_dir: Path,
     vaspkit_cmd: str,
-    auto_yes: bool,
-) -> None:
+) -> Optional[Path]:
+    """Write all inputs of a task and return its jobscript path (None if skipped)."""
     task_cfg = config.get(task_name)
     if not isinstance(task_cfg, dict):
         typer.echo(f"[task {task_name}] config not found or invalid, skip.")
-        return
+        return None
 
     typer.echo(f"\nProcessing task: {task_name}")
 
     poscar_spec = task_cfg.get("poscar")
     if poscar_spec:
-        _prepare_poscar(task_name, work_dir, str(poscar_spec))
+        with timer.span("write_poscar"):
+            _prepare_poscar(task_name, work_dir, str(poscar_spec))
 
     chgcar_spec = task_cfg.get("chgcar")
     if chgcar_spec:
-        _prepare_chgcar(task_name, work_dir, str(chgcar_spec))
+        store = shared_store(config.get("global") or {}, work_dir)
+        with timer.span("stage_chgcar"):
+            _prepare_chgcar(task_name, work_dir, str(chgcar_spec), store)
 
-    potcar_cmd = task_cfg.get("potcar")
-    if potcar_cmd:
-        _run_command_in_task(task_name, work_dir, str(potcar_cmd), vaspkit_cmd)
+    global_cfg = config.get("global") or {}
+    task_dir = work_dir / task_name
 
-    kpoints_cmd = task_cfg.get("kpoints")
-    if kpoints_cmd:
-        _run_command_in_task(task_name, work_dir, str(kpoints_cmd), vaspkit_cmd)
+    potcar_spec = task_cfg.get("potcar")
+    if potcar_spec:
+        with timer.span("write_potcar"):
+            options = potcar_options(potcar_spec, global_cfg)
+            if options is None:
+                _run_command_in_task(task_name, work_dir, str(potcar_spec), vaspkit_cmd)
+            else:
+                species = write_potcar(task_dir, global_cfg, options)
+                typer.echo(f"[task {task_name}] wrote POTCAR ({' '.join(species)})")
+
+    kpoints_spec = task_cfg.get("kpoints")
+    if kpoints_spec:
+        with timer.span("write_kpoints"):
+            options = kpoints_options(kpoints_spec, global_cfg)
+            if options is None:
+                _run_command_in_task(task_name, work_dir, str(kpoints_spec), vaspkit_cmd)
+            else:
+                mesh = write_kpoints(task_dir, *options)
+                typer.echo(f"[task {task_name}] wrote KPOINTS ({options[1]} {'x'.join(map(str, mesh))})")
 
     incar_cfg = task_cfg.get("incar")
     if isinstance(incar_cfg, dict):
-        _write_incar(task_name, work_dir, incar_cfg)
+        with timer.span("write_incar"):
+            _write_incar(task_name, work_dir, incar_cfg)
 
     jobscript_content = task_cfg.get("jobscript")
-    script_path = _write_jobscript(task_name, work_dir, jobscript_content or "")
-
-    _submit_job(task_name, script_path, auto_yes)
+    with timer.span("write_jobscript"):
+        return _write_jobscript(task_name, work_dir, jobscript_content or "")
+
+
+def _task_dependencies(task_order: List[str], config: dict) -> Dict[str, List[str]]:
+    """Collect ``depends_on`` entries of the selected tasks.
+
+    ``depends_on`` may be a single task name or a list of names. Dependencies
+    on tasks that are not part of this run are treated as already satisfied.
+    """
+    selected = set(task_order)
+    deps: Dict[str, List[str]] = {}
+    for task_name in task_order:
+        task_cfg = config.get(task_name)
+        raw = task_cfg.get("depends_on") if isinstance(task_cfg, dict) else None
+        if raw is None:
+            names: List[str] = []
+        elif isinstance(raw, str):
+            names = [raw]
+        else:
+            names = [str(x) for x in raw]
+
+        for dep in names:
+            if dep not in config:
+                raise ValueError(f"Task '{task_name}' depends on unknown task '{dep}'.")
+        deps[task_name] = [dep for dep in names if dep in selected and dep != task_name]
+    return deps
+
+
+def _topological_order(
+    task_order: List[str],
+    deps: Dict[str, List[str]],
+    key: Optional[Callable[[str], Any]] = None,
+) -> List[str]:
+    """Order tasks so every task follows its dependencies.
+
+    Among the ready tasks the one with the smallest ``key`` goes first. The
+    default key is the position in ``task_order`` so the result is
+    deterministic and equals ``task_order`` when no dependencies are given.
+    """
+    position = {name: i for i, name in enumerate(task_order)}
+    if key is None:
+        key = position.__getitem__
+    remaining = {name: set(deps.get(name, [])) for name in task_order}
+    ordered: List[str] = []
+
+    while remaining:
+        ready = [name for name, pending in remaining.items() if not pending]
+        if not ready:
+            cycle = ", ".join(sorted(remaining, key=position.__getitem__))
+            raise ValueError(f"Cyclic depends_on between tasks: {cycle}")
+        name = min(ready, key=key)
+        ordered.append(name)
+        del remaining[name]
+        for pending in remaining.values():
+            pending.discard(name)
+
+    return ordered
+
+
+class _DependencyFailed(Exception):
+    """A task was not prepared because one of its dependencies failed."""
+
+
+def _prepare_tasks(
+    ordered: List[str],
+    deps: Dict[str, List[str]],
+    config: dict,
+    work_dir: Path,
+    vaspkit_cmd: str,
+    workers: int,
+    failed: List[str],
+) -> Iterator[Tuple[str, Optional[Path]]]:
+    """Prepare tasks, ``workers`` at a time, and yield (name, jobscript) in ``ordered`` order.
+
+    A task whose preparation fails is reported, appended to ``failed`` and
+    left out, and so are the tasks depending on it. With one worker
+    everything runs in the calling thread; otherwise later tasks are
+    prepared while earlier ones are used. ``failed`` is only touched by the
+    calling thread.
+    """
+    futures: Dict[str, Future] = {}
+
+    def prepare(task_name: str) -> Optional[Path]:
+        # Tasks are queued in topological order and the pool runs them FIFO,
+        # so every dependency waited on here has already been picked up.
+        for dep in deps[task_name]:
+            try:
+                futures[dep].result()
+            except Exception:
+                raise _DependencyFailed(dep) from None
+        return _prepare_task(task_name, config, work_dir, vaspkit_cmd)
+
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is not None:
+            for task_name in ordered:
+                futures[task_name] = executor.submit(prepare, task_name)
+
+        for task_name in ordered:
+            try:
+                if executor is not None:
+                    script_path = futures[task_name].result()
+                else:
+                    for dep in deps[task_name]:
+                        if dep in failed:
+                            raise _DependencyFailed(dep)
+                    script_path = _prepare_task(task_name, config, work_dir, vaspkit_cmd)
+            except _DependencyFailed as exc:
+                failed.append(task_name)
+                typer.secho(f"[task {task_name}] skipped: depends on failed task {exc}", fg=typer.colors.RED)
+                continue
+            except Exception as exc:
+                failed.append(task_name)
+                typer.secho(f"[task {task_name}] preparation failed: {exc}", fg=typer.colors.RED)
+                continue
+            yield task_name, script_path
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    if failed:
+        typer.secho(f"Failed tasks: {', '.join(failed)}", fg=typer.colors.RED)
+
+
+def _run_planned(
+    ordered: List[str],
+    deps: Dict[str, List[str]],
+    config: dict,
+    work_dir: Path,
+    vaspkit_cmd: str,
+    auto_yes: bool,
+    workers: int,
+    scheduler: Optional[Scheduler],
+    policy: str,
+    failed: List[str],
+    jobdb: Optional[JobDB] = None,
+) -> None:
+    """Prepare all tasks, estimate their cost and submit them in ``policy`` order."""
+    from .plan import estimate_cost, format_plan, sort_key, write_plan
+
+    # Every task is prepared before the first submission
+    scripts = dict(_prepare_tasks(ordered, deps, config, work_dir, vaspkit_cmd, workers, failed))
+    planned = [name for name in ordered if scripts.get(name) is not None]
+    planned_deps = {name: [d for d in deps[name] if d in scripts] for name in planned}
+
+    estimates: Dict[str, dict] = {}
+    with timer.span("plan"):
+        for task_name in planned:
+            try:
+                estimates[task_name] = estimate_cost(work_dir / task_name, config.get("global"))
+            except Exception as exc:
+                typer.secho(f"[task {task_name}] no cost estimate: {exc}", fg=typer.colors.YELLOW)
+        costs = {name: e["cost"] for name, e in estimates.items()}
+        order = _topological_order(planned, planned_deps, sort_key(policy, planned, planned_deps, costs))
+
+    plan_path = work_dir / "plan.json"
+    write_plan(plan_path, policy, order, planned_deps, estimates)
+    typer.echo(f"\nSubmission plan ({policy} first), written to {plan_path}:")
+    typer.echo(format_plan(order, estimates))
+
+    for task_name in order:
+        _submit_job(task_name, scripts[task_name], auto_yes, scheduler, jobdb)
+
+
+def _run_tasks(
+    task_order: List[str],
+    config: dict,
+    work_dir: Path,
+    vaspkit_cmd: str,
+    auto_yes: bool,
+    workers: int = 1,
+    scheduler: Optional[Scheduler] = None,
+    plan: Optional[str] = None,
+    jobdb: Optional[JobDB] = None,
+) -> List[str]:
+    """Prepare and submit tasks, optionally preparing independent tasks in parallel.
+
+    Submission always happens from the calling thread in dependency-respecting
+    order, so prompts and ``qsub`` calls are identical to a serial run. With
+    ``plan`` all tasks are prepared first and submitted by predicted cost.
+    Returns the tasks that could not be prepared.
+    """
+    deps = _task_dependencies(task_order, config)
+    ordered = _topological_order(task_order, deps)
+    failed: List[str] = []
+
+    if plan:
+        _run_planned(ordered, deps, config, work_dir, vaspkit_cmd, auto_yes, workers, scheduler, plan, failed, jobdb)
+        return failed
+
+    for task_name, script_path in _prepare_tasks(ordered, deps, config, work_dir, vaspkit_cmd, workers, failed):
+        if script_path is not None:
+            _submit_job(task_name, script_path, auto_yes, scheduler, jobdb)
+    return failed
 
 
 @app.command()
@@ -210,6 +467,24 @@ def main(
             "instead of only running 'static'."
         ),
     ),
+    workers: int = typer.Option(
+        1,
+        "-j",
+        "--workers",
+        help=(
+            "Number of tasks to prepare in parallel (default 1). "
+            "Tasks wait for the tasks listed in their 'depends_on' key; submission "
+            "keeps dependency order."
+        ),
+    ),
+    plan: Optional[str] = typer.Option(
+        None,
+        "--plan",
+        help=(
+            "Prepare all tasks, estimate their VASP cost and submit them 'longest' "
+            "or 'shortest' first (dependencies still go first). Writes plan.json."
+        ),
+    ),
 ) -> None:
     config = _load_config(config_path)
 
@@ -221,8 +496,20 @@ def main(
     typer.echo(f"Changing working directory to: {work_dir}")
     os.chdir(work_dir)
 
-    vaspkit_cmd = _check_vaspkit(global_cfg)
-    typer.echo(f"Using vaspkit executable: {vaspkit_cmd}")
+    if _needs_vaspkit(config, global_cfg):
+        vaspkit_cmd = _check_vaspkit(global_cfg)
+        typer.echo(f"Using vaspkit executable: {vaspkit_cmd}")
+    else:
+        vaspkit_cmd = str(global_cfg.get("vaspkit", "vaspkit"))
+
+    # Bounds concurrent vaspkit/helper processes; -j decides how many tasks are prepared at once
+    helper_pool.set_limit(int(global_cfg.get("vaspkit_jobs", DEFAULT_LIMIT)))
+
+    if plan is not None and plan not in ("longest", "shortest"):
+        raise typer.BadParameter("expected 'longest' or 'shortest'", param_hint="--plan")
+
+    scheduler = scheduler_from_config(global_cfg)
+    jobdb = JobDB.from_config(global_cfg)
 
     yaml_order = [k for k in config.keys() if k not in {"global", "ending"}]
 
@@ -239,12 +526,25 @@ def main(
     else:
         task_order = yaml_order
 
+    # Unknown or cyclic depends_on is a config error: report it before any work
     try:
-        for task_name in task_order:
-            _process_task(task_name, config, work_dir, vaspkit_cmd, yes)
+        _topological_order(task_order, _task_dependencies(task_order, config))
+    except ValueError as exc:
+        typer.secho(str(exc), fg=typer.colors.RED)
+        raise typer.Exit(1)
+
+    failed: List[str] = []
+    try:
+        failed = _run_tasks(task_order, config, work_dir, vaspkit_cmd, yes, workers, scheduler, plan, jobdb)
     except AbortTasks:
         typer.echo("Aborted remaining tasks by user request.")
 
+    scheduler.wait()
+    timer.export(global_cfg, "main", work_dir)
+
+    if failed:
+        # Tasks that did prepare were submitted; still fail for scripts and CI
+        raise typer.Exit(1)
     typer.echo("\nAll requested tasks processed.")
 
 
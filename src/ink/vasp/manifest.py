@@ -0,0 +1,176 @@
+"""Input manifests that decide whether a task directory needs a new job.
+
+Every submission writes ``.ink_manifest.json`` next to the inputs with the
+job id, the submission time and the sha256 of each tracked input (POSCAR,
+INCAR, KPOINTS, POTCAR, jobscript.sh). ``needs_submission`` then skips a
+directory only when all of these hold:
+
+- the manifest names the job recorded for the directory (qsub.pid, or the
+  pack id in ``.ink_pack.json`` for packed tasks),
+- no tracked input changed since that submission,
+- the job did not fail: OUTCAR ends with VASP's timing block, or the
+  scheduler still lists the job as queued or running.
+
+A chain stage whose stagein.sh replaces POSCAR (and KPOINTS generated from
+it) at job start lists those inputs in ``.ink_stagein.json``; they are
+hashed by the upstream spec they come from, not by the placeholder files
+on disk, so a rerun after the upstream stage finished does not count them
+as changed.
+
+Otherwise it returns the reason to resubmit. A scheduler that cannot be
+queried raises ``SchedulerQueryError`` instead of guessing.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .pack import pack_job_id
+from .scheduler import Scheduler
+
+MANIFEST_NAME = ".ink_manifest.json"
+
+# Resolved inputs that decide whether a task needs to run again
+TRACKED_INPUTS = ("POSCAR", "INCAR", "KPOINTS", "POTCAR", "jobscript.sh")
+
+# Tracked inputs replaced at job start -> spec they are pulled from (chain.py)
+STAGED_INPUTS_NAME = ".ink_stagein.json"
+
+# Written by VASP at the very end of a run
+NORMAL_TERMINATION = b"General timing and accounting informations for this job"
+
+
+def write_text_if_changed(target: Path, text: str) -> bool:
+    """Write ``text`` to ``target`` unless it already has that content.
+
+    Unchanged files keep their mtime, so later tools (and the manifest) see
+    that nothing happened. Returns True if the file was written.
+    """
+    data = text.encode("utf-8")
+    try:
+        if target.stat().st_size == len(data) and target.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    if target.is_symlink():
+        target.unlink()
+    target.write_bytes(data)
+    return True
+
+
+def staged_inputs(cwd: Path) -> Dict[str, str]:
+    """Tracked inputs of ``cwd`` that stagein.sh replaces, with their upstream spec."""
+    path = cwd / STAGED_INPUTS_NAME
+    if not path.is_file():
+        return {}
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def input_hashes(cwd: Path) -> Dict[str, Optional[str]]:
+    """sha256 of every tracked input in ``cwd`` (None for missing files)."""
+    staged = staged_inputs(cwd)
+    hashes: Dict[str, Optional[str]] = {}
+    for name in TRACKED_INPUTS:
+        path = cwd / name
+        if name in staged:
+            hashes[name] = hashlib.sha256(f"stagein:{staged[name]}".encode()).hexdigest()
+        elif path.is_file():
+            with path.open("rb") as f:
+                hashes[name] = hashlib.file_digest(f, "sha256").hexdigest()
+        else:
+            hashes[name] = None
+    return hashes
+
+
+def combined_hash(hashes: Dict[str, Optional[str]]) -> str:
+    """One digest over all tracked inputs, e.g. for job bookkeeping."""
+    h = hashlib.sha256()
+    for name in sorted(hashes):
+        h.update(f"{name}={hashes[name]}\n".encode())
+    return h.hexdigest()
+
+
+def load_manifest(cwd: Path) -> Optional[dict]:
+    path = cwd / MANIFEST_NAME
+    if not path.is_file():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(
+    cwd: Path, job_id: str, hashes: Optional[Dict[str, Optional[str]]] = None
+) -> dict:
+    """Record the inputs a job was submitted with next to its qsub.pid."""
+    hashes = hashes if hashes is not None else input_hashes(cwd)
+    manifest = {
+        "job_id": job_id,
+        "submitted_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "input_hash": combined_hash(hashes),
+        "inputs": hashes,
+    }
+    path = cwd / MANIFEST_NAME
+    tmp = path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path)
+    return manifest
+
+
+def recorded_job_id(cwd: Path) -> str:
+    """Id of the job last submitted for ``cwd``: its own (qsub.pid) or its pack's.
+
+    The manifest tells which of the two came last; without one qsub.pid wins.
+    """
+    pid_file = cwd / "qsub.pid"
+    own = pid_file.read_text().strip() if pid_file.is_file() else ""
+    packed = pack_job_id(cwd) or ""
+    manifest = load_manifest(cwd) or {}
+    if packed and manifest.get("job_id") == packed:
+        return packed
+    return own or packed
+
+
+def previous_run_failed(cwd: Path, job_id: str, scheduler: Scheduler) -> bool:
+    """True if the job recorded in ``cwd`` ended without finishing VASP.
+
+    A missing OUTCAR, or one without VASP's final timing block, is a failure
+    once the scheduler no longer knows the job as active; without OUTCAR the
+    job died before VASP started (bad jobscript, node failure).
+    """
+    outcar = cwd / "OUTCAR"
+    if outcar.is_file():
+        with outcar.open("rb") as f:
+            f.seek(max(0, outcar.stat().st_size - 64 * 1024))
+            if NORMAL_TERMINATION in f.read():
+                return False
+
+    return not scheduler.is_active(job_id)
+
+
+def needs_submission(cwd: Path, scheduler: Scheduler) -> Optional[str]:
+    """Return why ``cwd`` must be (re)submitted, or None if it is up to date."""
+    manifest = load_manifest(cwd)
+    job_id = recorded_job_id(cwd)
+    if manifest is None or not job_id:
+        return "no previous submission recorded"
+
+    if manifest.get("job_id") != job_id:
+        return "qsub.pid does not match the manifest"
+
+    old = manifest.get("inputs") or {}
+    changed = [name for name, digest in input_hashes(cwd).items() if old.get(name) != digest]
+    if changed:
+        return f"inputs changed: {', '.join(changed)}"
+
+    if previous_run_failed(cwd, job_id, scheduler):
+        return f"previous job {job_id} failed"
+
+    return None
@@ -0,0 +1,138 @@
+"""In-process replacements for the vaspkit task codes used by ``main.py``.
+
+``potcar``/``kpoints`` entries of a task are handled natively when they are
+one of
+
+- ``vaspkit -task 103``: POTCAR from the library (see potcar.py) with the
+  recommended variant of every POSCAR species,
+- ``vaspkit -task 102 -kpr 0.03``: Gamma-centred KPOINTS from the KPR value,
+- a mapping, ``potcar: {Li: Li}`` (variant overrides) or
+  ``kpoints: {kpr: 0.03, style: Monkhorst}``.
+
+POSCARs are read through ``structure_cache`` and the mesh comes from
+``kmesh.kpr_mesh``, the formula of ``Job._calculate_grid_dimensions``. Other commands, and
+``vaspkit -task 103`` without a configured library, still run through
+vaspkit. To run the vaspkit commands through vaspkit as before (the
+mappings have no vaspkit form and stay native)::
+
+    global:
+      native_inputs: false
+"""
+
+import itertools
+import os
+import shlex
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .potcar import dataset_species, potcar_dir, shared_library
+
+KPOINT_STYLES = {"gamma": "Gamma", "g": "Gamma", "monkhorst": "Monkhorst", "m": "Monkhorst"}
+
+
+def native_enabled(global_cfg: Optional[dict]) -> bool:
+    """False when ``global.native_inputs`` sends vaspkit commands to vaspkit."""
+    return bool((global_cfg or {}).get("native_inputs", True))
+
+
+def _vaspkit_args(spec) -> Optional[dict]:
+    """``{"-task": ..., "-kpr": ...}`` of a plain vaspkit command, None otherwise."""
+    if not isinstance(spec, str):
+        return None
+    tokens = shlex.split(spec)
+    if not tokens or os.path.basename(tokens[0]) != "vaspkit" or len(tokens) % 2 == 0:
+        return None
+    args = dict(zip(tokens[1::2], tokens[2::2]))
+    if not set(args) <= {"-task", "-kpr"}:
+        return None
+    return args
+
+
+def potcar_options(spec, global_cfg: dict) -> Optional[dict]:
+    """Variant overrides for a native POTCAR, or None to run ``spec`` as a command."""
+    if isinstance(spec, dict):
+        overrides = dict(spec)
+    else:
+        args = _vaspkit_args(spec) if native_enabled(global_cfg) else None
+        if args is None or args.get("-task") != "103" or potcar_dir(global_cfg) is None:
+            return None
+        overrides = {}
+    return {**(global_cfg.get("potcar_variants") or {}), **overrides}
+
+
+def kpoints_options(spec, global_cfg: Optional[dict] = None) -> Optional[Tuple[float, str]]:
+    """(kpr, style) for a native KPOINTS, or None to run ``spec`` as a command."""
+    if isinstance(spec, dict):
+        style = str(spec.get("style", "Gamma"))
+        if style.lower() not in KPOINT_STYLES:
+            raise ValueError(f"Unknown KPOINTS style '{style}', expected Gamma or Monkhorst")
+        return float(spec["kpr"]), KPOINT_STYLES[style.lower()]
+    args = _vaspkit_args(spec) if native_enabled(global_cfg) else None
+    if args is None or args.get("-task") != "102" or "-kpr" not in args:
+        return None
+    return float(args["-kpr"]), "Gamma"
+
+
+def species(structure) -> List[str]:
+    """Element symbols in POSCAR order, one per species block.
+
+    A species that appears in two separate blocks (``O Fe O``) is listed
+    twice, matching the POTCAR VASP expects for that POSCAR.
+    """
+    return [symbol for symbol, _ in itertools.groupby(site.specie.symbol for site in structure)]
+
+
+def kpoints_text(mesh: Tuple[int, int, int], kpr: float, style: str = "Gamma") -> str:
+    return (
+        f"K-Spacing Value to Generate K-Mesh: {kpr:.3f}\n"
+        "0\n"
+        f"{style}\n"
+        f"{mesh[0]:>4d}{mesh[1]:>4d}{mesh[2]:>4d}\n"
+        "0.0  0.0  0.0\n"
+    )
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_potcar(task_dir: Path, global_cfg: dict, overrides: dict) -> List[str]:
+    """Write ``task_dir/POTCAR`` for the species of its POSCAR; returns the species."""
+    from .cache import structure_cache
+
+    root = potcar_dir(global_cfg)
+    if root is None:
+        raise ValueError("No POTCAR library: set global.potcar_dir or INK_POTCAR_DIR")
+    elements = species(structure_cache.get(task_dir / "POSCAR"))
+    _write_bytes(task_dir / "POTCAR", shared_library(root).assemble(elements, overrides))
+    return elements
+
+
+def check_potcar(task_dir: Path, found: Optional[List[str]] = None) -> None:
+    """Raise ValueError unless the POTCAR datasets follow the POSCAR species blocks.
+
+    ``found`` are the POTCAR's dataset species when already known, which
+    saves scanning the file.
+    """
+    from .cache import structure_cache
+
+    expected = species(structure_cache.get(task_dir / "POSCAR"))
+    if found is None:
+        found = dataset_species(task_dir / "POTCAR")
+    if found != expected:
+        raise ValueError(
+            f"POTCAR species {' '.join(found) or '(none)'} do not match POSCAR species {' '.join(expected)}"
+        )
+
+
+def write_kpoints(task_dir: Path, kpr: float, style: str = "Gamma") -> Tuple[int, int, int]:
+    """Write ``task_dir/KPOINTS`` from the POSCAR lattice; returns the mesh."""
+    from .cache import structure_cache
+    from .kmesh import kpr_mesh
+
+    structure = structure_cache.get(task_dir / "POSCAR")
+    mesh = kpr_mesh(structure.lattice.reciprocal_lattice.abc, kpr)
+    _write_bytes(task_dir / "KPOINTS", kpoints_text(mesh, kpr, style).encode())
+    return mesh
@@ -0,0 +1,271 @@
+"""Run many small task directories inside one scheduler allocation.
+
+``Job.submit_pack`` writes ``<work_dir>/packs/pack-<time>-xxxx/`` with the
+task list and a ``pack.sh`` that runs the dispatcher of this module on the
+first node of the allocation::
+
+    python -m ink.vasp.pack <pack dir> --cores-per-task 4
+
+The dispatcher splits the CPUs it may use into disjoint sets of
+``cores_per_task``, starts ``bash jobscript.sh`` in one task directory per
+set, pinned to it with ``sched_setaffinity``, and starts the next task as
+soon as one ends. Tasks see the same environment as a single job
+(``PBS_O_WORKDIR``/``SLURM_SUBMIT_DIR`` = task directory) plus
+``INK_NCORES`` and ``INK_CPUS`` (e.g. ``8-11``), so jobscripts should run
+``mpirun -np $INK_NCORES``. Every task directory gets
+
+- the manifest/job database entry of the pack job,
+- ``pack.log`` with the output of its jobscript,
+- ``.ink_pack.json`` with the pack job id and its index in the pack, its
+  state (submitted, queued, running, completed, failed, killed), exit
+  code, CPUs and start/end time.
+
+Task directories get no ``qsub.pid``: the pack job is shared, so
+resubmitting one task never cancels the others. A task resubmitted on its
+own or in another pack is skipped when this pack starts.
+
+The header of pack.sh is the ``#PBS``/``#SBATCH`` header of the first
+task's jobscript.sh with its node/CPU request (sized for one task)
+replaced by one node with ``cores`` CPUs, or ``cores_per_task`` times the
+number of tasks without ``cores``. ``header`` replaces the whole header
+instead. Defaults come from vasp_config.yaml::
+
+    global:
+      pack:
+        cores_per_task: 4
+        size: 16          # tasks per pack job
+        cores: 64         # CPUs per allocation (default: size * cores_per_task)
+        header:           # optional, used verbatim
+          - "#PBS -q fat"
+          - "#PBS -l select=1:ncpus=64:mpiprocs=64"
+          - "#PBS -l walltime=24:00:00"
+"""
+
+import argparse
+import json
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+STATUS_NAME = ".ink_pack.json"
+LOG_NAME = "pack.log"
+
+# Environment variables giving the CPU count of an allocation, in order of trust
+CORE_HINTS = ("INK_PACK_CORES", "SLURM_CPUS_ON_NODE", "NCPUS", "PBS_NP", "INK_NCORES")
+
+
+def cpu_ranges(cpus: Sequence[int]) -> str:
+    """Compact list such as ``0-3,8``."""
+    parts: List[str] = []
+    cpus = sorted(cpus)
+    start = prev = None
+    for cpu in cpus + [None]:
+        if start is not None and cpu != prev + 1:
+            parts.append(str(start) if start == prev else f"{start}-{prev}")
+            start = None
+        if start is None:
+            start = cpu
+        prev = cpu
+    return ",".join(parts)
+
+
+def available_cpus(cores: Optional[int] = None) -> List[int]:
+    """CPUs this process may run on, limited to ``cores`` or the allocation size."""
+    cpus = sorted(os.sched_getaffinity(0))
+    if cores is None:
+        for name in CORE_HINTS:
+            value = os.environ.get(name, "")
+            if value.isdigit() and int(value) > 0:
+                cores = int(value)
+                break
+    return cpus[:cores] if cores else cpus
+
+
+def core_sets(cpus: Sequence[int], cores_per_task: int) -> List[List[int]]:
+    """Disjoint CPU sets of ``cores_per_task`` (one set of all CPUs if too few)."""
+    cores_per_task = max(1, cores_per_task)
+    sets = [list(cpus[i : i + cores_per_task]) for i in range(0, len(cpus) - cores_per_task + 1, cores_per_task)]
+    return sets or [list(cpus)]
+
+
+def read_status(task_dir: Path) -> dict:
+    try:
+        return json.loads((task_dir / STATUS_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_status(task_dir: Path, **fields) -> None:
+    path = task_dir / STATUS_NAME
+    status = read_status(task_dir)
+    status.update(fields)
+    tmp = path.with_name(f"{STATUS_NAME}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(status, indent=2))
+    os.replace(tmp, path)
+
+
+def pack_job_id(task_dir: Path) -> Optional[str]:
+    """Id of the packed job ``task_dir`` was last submitted with, if any."""
+    return read_status(task_dir).get("pack_id") or None
+
+
+def _replaced_by(task_dir: Path, pack_dir: Path) -> Optional[str]:
+    """Job that superseded this pack for ``task_dir``, or None if the task is still ours."""
+    from .manifest import load_manifest
+
+    status = read_status(task_dir)
+    if status.get("pack_dir", str(pack_dir)) != str(pack_dir):
+        return status.get("pack_id") or "another pack"
+    job_id = (load_manifest(task_dir) or {}).get("job_id")
+    if job_id and status.get("pack_id") and job_id != status["pack_id"]:
+        return job_id
+    return None
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def dispatch(pack_dir: Path, cores_per_task: int, cores: Optional[int] = None) -> int:
+    """Run every task of ``pack_dir`` on disjoint core sets; returns the number of failures."""
+    pack_dir = Path(pack_dir)
+    dirs = []
+    for line in (pack_dir / "dirs.txt").read_text().splitlines():
+        if not line:
+            continue
+        replaced_by = _replaced_by(Path(line), pack_dir)
+        if replaced_by:
+            print(f"[pack] skip {line}: resubmitted as {replaced_by}", flush=True)
+        else:
+            dirs.append(Path(line))
+    sets = core_sets(available_cpus(cores), cores_per_task)
+    pack_id = os.environ.get("PBS_JOBID") or os.environ.get("SLURM_JOB_ID") or f"pack-{os.getpid()}"
+    host = socket.gethostname()
+    print(f"[pack] {len(dirs)} tasks on {len(sets)} slots of {len(sets[0])} cores ({host})", flush=True)
+
+    for d in dirs:
+        # Keep the id recorded at submission; the environment may spell it differently
+        write_status(d, pack_id=pack_job_id(d) or pack_id, pack_dir=str(pack_dir), state="queued", exit_code=None, cpus=None,
+                     started_at=None, finished_at=None, host=host)
+
+    pending = deque(dirs)
+    free = list(range(len(sets)))
+    running: Dict[int, tuple] = {}  # pid -> (slot, task dir, Popen)
+    results: Dict[str, int] = {}
+    stopping = False
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for _, _, proc in running.values():
+            try:
+                os.killpg(proc.pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while running or (pending and not stopping):
+        while pending and free and not stopping:
+            slot, d = free.pop(0), pending.popleft()
+            cpus = sets[slot]
+            env = dict(os.environ)
+            env.update(
+                PBS_O_WORKDIR=str(d),
+                SLURM_SUBMIT_DIR=str(d),
+                INK_NCORES=str(len(cpus)),
+                INK_CPUS=cpu_ranges(cpus),
+                OMP_NUM_THREADS="1",
+                I_MPI_PIN_PROCESSOR_LIST=",".join(map(str, cpus)),
+            )
+            with (d / LOG_NAME).open("wb") as log:
+                proc = subprocess.Popen(
+                    ["bash", "jobscript.sh"],
+                    cwd=d,
+                    env=env,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                    preexec_fn=lambda cpus=cpus: os.sched_setaffinity(0, cpus),
+                )
+            running[proc.pid] = (slot, d, proc)
+            write_status(d, state="running", cpus=cpu_ranges(cpus), started_at=_now())
+            print(f"[pack] start {d} on cpus {cpu_ranges(cpus)}", flush=True)
+
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            break
+        if pid not in running:
+            continue
+        slot, d, proc = running.pop(pid)
+        proc.returncode = code = os.waitstatus_to_exitcode(status)
+        free.append(slot)
+        state = "killed" if stopping else ("completed" if code == 0 else "failed")
+        write_status(d, state=state, exit_code=code, finished_at=_now())
+        results[str(d)] = code
+        print(f"[pack] {state} {d} (exit {code})", flush=True)
+
+    for d in pending:
+        write_status(d, state="killed", finished_at=_now())
+    summary = {"pack_id": pack_id, "host": host, "slots": len(sets), "results": results}
+    (pack_dir / "summary.json").write_text(json.dumps(summary, indent=2))
+    return sum(1 for code in results.values() if code != 0) + len(pending)
+
+
+def pack_header(job, dirs: List[Path], cores_per_task: int, cores: Optional[int] = None) -> List[str]:
+    """Scheduler directives of pack.sh, requesting the CPUs of the whole pack."""
+    pack_cfg = (job.config.get("global") or {}).get("pack") or {}
+    configured = pack_cfg.get("header")
+    if configured:
+        return configured.splitlines() if isinstance(configured, str) else [str(line) for line in configured]
+
+    scheduler = job.scheduler
+    directive = scheduler.directive
+    header = []
+    for line in (dirs[0] / "jobscript.sh").read_text().splitlines():
+        if directive and line.startswith(directive):
+            line = scheduler.strip_cpu_request(line)
+            if line is not None:
+                header.append(line)
+    return header + scheduler.cpu_request(cores or cores_per_task * len(dirs))
+
+
+def write_pack(job, dirs: List[Path], cores_per_task: int, cores: Optional[int] = None) -> Path:
+    """Stage a pack directory for ``dirs`` and return the path of its pack.sh."""
+    packs_dir = job.work_dir.resolve() / "packs"
+    packs_dir.mkdir(parents=True, exist_ok=True)
+    pack_dir = Path(tempfile.mkdtemp(prefix=time.strftime("pack-%Y%m%d-%H%M%S-"), dir=packs_dir))
+    (pack_dir / "dirs.txt").write_text("".join(f"{d}\n" for d in dirs))
+
+    command = [sys.executable, "-m", "ink.vasp.pack", str(pack_dir), "--cores-per-task", str(cores_per_task)]
+    if cores:
+        command += ["--cores", str(cores)]
+    script = "\n".join(["#!/bin/bash", *pack_header(job, dirs, cores_per_task, cores), shlex.join(command), ""])
+    (pack_dir / "pack.sh").write_text(script)
+    return pack_dir / "pack.sh"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="In-allocation dispatcher of a packed job.")
+    parser.add_argument("pack_dir", type=Path)
+    parser.add_argument("--cores-per-task", type=int, default=1)
+    parser.add_argument("--cores", type=int, default=None)
+    args = parser.parse_args(argv)
+    failed = dispatch(args.pack_dir, args.cores_per_task, args.cores)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Estimate the cost of prepared VASP tasks and order their submission.
+
+The estimate is in arbitrary units and only meant to rank tasks:
+
+    cost = ionic_steps * ispin * nkpts_irr * (nbands * npw * log2(npw) + nbands^2 * npw)
+
+with
+
+- ``nkpts_irr``: irreducible k-points of the KPOINTS mesh (spglib), or the
+  number of listed/line points,
+- ``npw``: plane waves per k-point, ``V * (ENCUT / 3.81 eV A^2)^(3/2) / (6 pi^2)``;
+  ENCUT defaults to the largest POTCAR ENMAX,
+- ``nbands``: INCAR NBANDS or VASP's default from the electron count
+  (POTCAR ZVAL times POSCAR species counts) and the number of ions,
+- ``ionic_steps``: ``min(NSW, MAX_IONIC_STEPS)`` for relaxations/MD, else 1.
+
+Policies order the tasks while keeping ``depends_on`` constraints:
+``longest`` submits the task with the longest remaining dependency chain
+(by cost) first, ``shortest`` the cheapest ready task first.
+"""
+
+import itertools
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pymatgen.io.vasp.inputs import Incar, Kpoints
+
+from .cache import structure_cache
+from .kmesh import count_irreducible
+from .potcar import matches_entries, potcar_dir, scan_datasets, shared_library, variant_for
+
+POLICIES = ("longest", "shortest")
+
+# hbar^2 / 2m_e in eV * A^2
+HBAR2_2M = 3.80998
+
+# Relaxations rarely need more ionic steps than this to converge
+MAX_IONIC_STEPS = 30
+
+
+def potcar_values(potcar: Path, species: Optional[List[str]] = None, global_cfg: Optional[dict] = None):
+    """(ZVAL per element, largest ENMAX) in POTCAR order.
+
+    A POTCAR matching the configured library's assembly for ``species`` in
+    size and per-dataset TITEL is looked up in the library index (see
+    potcar.py); any other POTCAR, e.g. one with different variants, is
+    scanned with the index's own parser.
+    """
+    root = potcar_dir(global_cfg)
+    if root is not None and species:
+        library = shared_library(root)
+        overrides = (global_cfg or {}).get("potcar_variants")
+        try:
+            entries = [library.entry(variant_for(el, overrides)) for el in species]
+        except FileNotFoundError:
+            entries = []
+        if entries and matches_entries(potcar, entries):
+            missing = [e["titel"] or el for el, e in zip(species, entries) if e["zval"] is None]
+            if missing:
+                raise ValueError(f"{potcar}: no ZVAL in the POTCAR library for {', '.join(missing)}")
+            enmax = max((e["enmax"] for e in entries if e["enmax"] is not None), default=0.0)
+            return [e["zval"] for e in entries], enmax
+
+    datasets = scan_datasets(potcar)
+    zvals = [d["zval"] for d in datasets if d["zval"] is not None]
+    enmax = max((d["enmax"] for d in datasets if d["enmax"] is not None), default=0.0)
+    return zvals, enmax
+
+
+def default_nbands(nelect: float, nions: int) -> int:
+    """VASP's default NBANDS for a collinear (non-spin-orbit) calculation."""
+    return max(math.ceil((nelect + 2) / 2) + max(nions // 2, 3), int(0.6 * nelect))
+
+
+def _kpoint_count(kpoints: Kpoints, structure) -> int:
+    style = kpoints.style.name.lower()
+    if style in ("gamma", "monkhorst"):
+        mesh = tuple(int(n) for n in kpoints.kpts[0])
+        shift = [0, 0, 0]
+        if style == "monkhorst":
+            shift = [1 if n % 2 == 0 else 0 for n in mesh]
+        cell = (
+            structure.lattice.matrix,
+            structure.frac_coords,
+            [site.specie.Z for site in structure],
+        )
+        return count_irreducible(cell, mesh, is_shift=shift)
+    if style == "line_mode":
+        return int(kpoints.num_kpts) * max(1, len(kpoints.kpts) // 2)
+    return max(1, len(kpoints.kpts))
+
+
+def estimate_cost(task_dir: Path, global_cfg: Optional[dict] = None) -> Dict[str, Optional[float]]:
+    """Cost estimate and its ingredients for a prepared task directory."""
+    structure = structure_cache.get(task_dir / "POSCAR")
+    incar = Incar.from_file(task_dir / "INCAR") if (task_dir / "INCAR").is_file() else Incar()
+    # One (element, count) per POSCAR species block, as in the POTCAR
+    symbols = (site.specie.symbol for site in structure)
+    blocks = [(el, sum(1 for _ in sites)) for el, sites in itertools.groupby(symbols)]
+    species = [el for el, _ in blocks]
+    zvals, enmax = potcar_values(task_dir / "POTCAR", species, global_cfg)
+
+    counts = [n for _, n in blocks]
+    if len(zvals) != len(counts):
+        raise ValueError(
+            f"{task_dir}: POTCAR has {len(zvals)} elements but POSCAR has {len(counts)} species"
+        )
+    nions = len(structure)
+    nelect = float(incar.get("NELECT", sum(z * n for z, n in zip(zvals, counts))))
+    nbands = int(incar.get("NBANDS", default_nbands(nelect, nions)))
+    ispin = int(incar.get("ISPIN", 1))
+
+    encut = float(incar.get("ENCUT", enmax))
+    kcut = math.sqrt(encut / HBAR2_2M)
+    npw = max(1.0, structure.volume * kcut ** 3 / (6 * math.pi ** 2))
+
+    nkpts = _kpoint_count(Kpoints.from_file(task_dir / "KPOINTS"), structure)
+
+    nsw = int(incar.get("NSW", 0))
+    ionic_steps = min(nsw, MAX_IONIC_STEPS) if nsw > 0 and int(incar.get("IBRION", -1)) >= 0 else 1
+
+    per_k = nbands * npw * math.log2(npw) + nbands ** 2 * npw
+    cost = ionic_steps * ispin * nkpts * per_k
+    return {
+        "cost": cost,
+        "natoms": nions,
+        "nelect": nelect,
+        "nbands": nbands,
+        "ispin": ispin,
+        "encut": encut,
+        "npw": round(npw),
+        "nkpts": nkpts,
+        "ionic_steps": ionic_steps,
+    }
+
+
+def chain_cost(tasks: List[str], deps: Dict[str, List[str]], costs: Dict[str, float]) -> Dict[str, float]:
+    """Cost of each task plus the most expensive chain of tasks depending on it."""
+    dependents: Dict[str, List[str]] = {name: [] for name in tasks}
+    for name in tasks:
+        for dep in deps.get(name, []):
+            dependents[dep].append(name)
+
+    rank: Dict[str, float] = {}
+
+    def visit(name: str) -> float:
+        if name not in rank:
+            rank[name] = costs.get(name, 0.0) + max((visit(d) for d in dependents[name]), default=0.0)
+        return rank[name]
+
+    for name in tasks:
+        visit(name)
+    return rank
+
+
+def sort_key(policy: str, tasks: List[str], deps: Dict[str, List[str]], costs: Dict[str, float]):
+    """Key for picking the next ready task under ``policy`` (ties keep YAML order)."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown plan policy '{policy}', expected one of {POLICIES}")
+    position = {name: i for i, name in enumerate(tasks)}
+    if policy == "longest":
+        rank = chain_cost(tasks, deps, costs)
+        return lambda name: (-rank[name], position[name])
+    return lambda name: (costs.get(name, 0.0), position[name])
+
+
+def write_plan(
+    path: Path,
+    policy: str,
+    order: List[str],
+    deps: Dict[str, List[str]],
+    estimates: Dict[str, dict],
+) -> None:
+    total = sum(e["cost"] for e in estimates.values()) or 1.0
+    entries = []
+    for i, name in enumerate(order, start=1):
+        estimate = estimates.get(name)
+        entry = {"order": i, "task": name, "depends_on": deps.get(name, [])}
+        if estimate is not None:
+            entry.update(estimate)
+            entry["share"] = estimate["cost"] / total
+        entries.append(entry)
+    path.write_text(json.dumps({"policy": policy, "tasks": entries}, indent=2))
+
+
+def format_plan(order: List[str], estimates: Dict[str, dict]) -> str:
+    total = sum(e["cost"] for e in estimates.values()) or 1.0
+    lines = [f"{'#':>3} {'task':<16} {'atoms':>5} {'nelect':>7} {'nbands':>6} {'npw':>8} {'nk':>5} {'share':>7}"]
+    for i, name in enumerate(order, start=1):
+        e = estimates.get(name)
+        if e is None:
+            lines.append(f"{i:>3} {name:<16} {'(no estimate)':>40}")
+            continue
+        lines.append(
+            f"{i:>3} {name:<16} {e['natoms']:>5d} {e['nelect']:>7.0f} {e['nbands']:>6d} "
+            f"{e['npw']:>8d} {e['nkpts']:>5d} {e['cost'] / total:>7.1%}"
+        )
+    return "\n".join(lines)
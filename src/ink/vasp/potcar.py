@@ -0,0 +1,266 @@
+"""Assemble POTCARs from an indexed VASP pseudopotential library without vaspkit.
+
+The library is the directory shipped with VASP (e.g. ``potpaw_PBE``) with
+one ``<variant>/POTCAR`` per element variant (``Li_sv/POTCAR``,
+``Sb/POTCAR``, ...); files holding several datasets, like ``data/POTCAR``,
+are indexed too. Its location comes from ``global.potcar_dir`` or the
+``INK_POTCAR_DIR`` environment variable. Elements use the variant
+recommended by VASP (the set vaspkit's task 103 picks) unless overridden::
+
+    global:
+      potcar_dir: ~/vasp/potpaw_PBE
+      potcar_variants: {W: W_pv}
+
+The first use scans the library once and stores, per variant, the file,
+byte offset and length of its dataset together with TITEL, ZVAL and ENMAX
+in a small JSON index under ``~/.cache/ink/potcar`` (``INK_POTCAR_INDEX``
+overrides the directory). Assembling a POTCAR is then a seek and a read
+per element, and ZVAL/ENMAX lookups need no parsing. The index is rebuilt
+when a library file changes size or mtime, or files are added or removed.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# VASP-recommended PAW variants (elements not listed use the bare symbol)
+RECOMMENDED: Dict[str, str] = {
+    "Li": "Li_sv", "Na": "Na_pv", "K": "K_sv", "Ca": "Ca_sv", "Sc": "Sc_sv",
+    "Ti": "Ti_sv", "V": "V_sv", "Cr": "Cr_pv", "Mn": "Mn_pv", "Ga": "Ga_d",
+    "Ge": "Ge_d", "Rb": "Rb_sv", "Sr": "Sr_sv", "Y": "Y_sv", "Zr": "Zr_sv",
+    "Nb": "Nb_sv", "Mo": "Mo_sv", "Tc": "Tc_pv", "Ru": "Ru_pv", "Rh": "Rh_pv",
+    "In": "In_d", "Sn": "Sn_d", "Cs": "Cs_sv", "Ba": "Ba_sv", "Pr": "Pr_3",
+    "Nd": "Nd_3", "Pm": "Pm_3", "Sm": "Sm_3", "Eu": "Eu_2", "Gd": "Gd_3",
+    "Tb": "Tb_3", "Dy": "Dy_3", "Ho": "Ho_3", "Er": "Er_3", "Tm": "Tm_3",
+    "Yb": "Yb_2", "Lu": "Lu_3", "Hf": "Hf_pv", "Ta": "Ta_pv", "W": "W_sv",
+    "Tl": "Tl_d", "Pb": "Pb_d", "Bi": "Bi_d", "Po": "Po_d", "Fr": "Fr_sv",
+    "Ra": "Ra_sv",
+}
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_DIR = Path("~/.cache/ink/potcar")
+
+END_OF_DATASET = b"End of Dataset"
+TITEL_RE = re.compile(rb"TITEL\s*=\s*(.+?)\s*$")
+ZVAL_RE = re.compile(rb"ZVAL\s*=\s*([-+\d.]+)")
+ENMAX_RE = re.compile(rb"ENMAX\s*=\s*([-+\d.]+)")
+VRHFIN_RE = re.compile(rb"VRHFIN\s*=\s*([A-Za-z]+)")
+
+# TITEL sits within the first few lines of a dataset
+HEADER_BYTES = 4096
+
+
+def potcar_dir(global_cfg: Optional[dict]) -> Optional[Path]:
+    """Configured library directory, or None when there is none."""
+    value = (global_cfg or {}).get("potcar_dir") or os.environ.get("INK_POTCAR_DIR")
+    return Path(value).expanduser() if value else None
+
+
+def variant_for(element: str, overrides: Optional[Dict[str, str]] = None) -> str:
+    overrides = overrides or {}
+    return str(overrides.get(element) or RECOMMENDED.get(element, element))
+
+
+def scan_datasets(path: Path) -> List[dict]:
+    """Offset, length and header values of every dataset in one POTCAR file."""
+    datasets: List[dict] = []
+    current: Optional[dict] = None
+    offset = 0
+    with path.open("rb") as f:
+        for line in f:
+            if current is None:
+                current = {"offset": offset, "titel": "", "zval": None, "enmax": None, "element": ""}
+            if b"TITEL" in line and not current["titel"]:
+                match = TITEL_RE.search(line)
+                if match:
+                    current["titel"] = match.group(1).decode("ascii", "replace")
+            elif b"ZVAL" in line and current["zval"] is None:
+                match = ZVAL_RE.search(line)
+                if match:
+                    current["zval"] = float(match.group(1))
+            elif b"ENMAX" in line and current["enmax"] is None:
+                match = ENMAX_RE.search(line)
+                if match:
+                    current["enmax"] = float(match.group(1))
+            elif b"VRHFIN" in line and not current["element"]:
+                match = VRHFIN_RE.search(line)
+                if match:
+                    current["element"] = match.group(1).decode("ascii")
+            offset += len(line)
+            if END_OF_DATASET in line:
+                current["length"] = offset - current["offset"]
+                datasets.append(current)
+                current = None
+    return datasets
+
+
+def matches_entries(path: Path, entries: List[dict]) -> bool:
+    """Whether ``path`` looks like the concatenation of the indexed ``entries``.
+
+    Only the total size and the TITEL at each dataset's expected offset are
+    compared, so a check reads a few kB instead of the whole POTCAR.
+    """
+    if sum(e["length"] for e in entries) != path.stat().st_size:
+        return False
+    offset = 0
+    with path.open("rb") as f:
+        for entry in entries:
+            f.seek(offset)
+            titel = ""
+            for line in f.read(min(entry["length"], HEADER_BYTES)).splitlines():
+                match = TITEL_RE.search(line) if b"TITEL" in line else None
+                if match:
+                    titel = match.group(1).decode("ascii", "replace")
+                    break
+            if titel != entry["titel"]:
+                return False
+            offset += entry["length"]
+    return True
+
+
+def dataset_species(path: Path) -> List[str]:
+    """Element of every dataset in one POTCAR file, in file order."""
+    elements = []
+    for dataset in scan_datasets(path):
+        titel = dataset["titel"].split()
+        elements.append(dataset["element"] or (titel[1].split("_")[0] if len(titel) >= 2 else ""))
+    return elements
+
+
+def _library_files(root: Path) -> Dict[str, Tuple[int, int]]:
+    """Relative path -> (size, mtime_ns) of every POTCAR file in the library."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name == "POTCAR" or name.startswith("POTCAR."):
+                if name.endswith((".Z", ".gz", ".bz2", ".xz")):
+                    continue
+                path = os.path.join(dirpath, name)
+                st = os.stat(path)
+                files[os.path.relpath(path, root)] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def build_index(root: Path, files: Optional[Dict[str, Tuple[int, int]]] = None) -> dict:
+    """Index of all datasets below ``root`` keyed by variant name."""
+    root = Path(root)
+    files = _library_files(root) if files is None else files
+    entries: Dict[str, dict] = {}
+    # Shallow <variant>/POTCAR files win over variants found in combined files
+    for rel in sorted(files, key=lambda r: (r.count(os.sep), r)):
+        datasets = scan_datasets(root / rel)
+        for dataset in datasets:
+            titel_parts = dataset["titel"].split()
+            if len(datasets) == 1 and os.sep in rel:
+                variant = Path(rel).parent.name
+            elif len(titel_parts) >= 2:
+                variant = titel_parts[1]
+            else:
+                continue
+            dataset["file"] = rel
+            dataset["element"] = dataset["element"] or variant.split("_")[0]
+            entries.setdefault(variant, dataset)
+    return {
+        "version": INDEX_VERSION,
+        "root": str(root.resolve()),
+        "files": {rel: list(sig) for rel, sig in files.items()},
+        "entries": entries,
+    }
+
+
+class PotcarLibrary:
+    """Variant lookup and POTCAR assembly through the library index."""
+
+    def __init__(self, root: Path, index_dir: Optional[Path] = None):
+        self.root = Path(root).resolve()
+        index_dir = index_dir or os.environ.get("INK_POTCAR_INDEX") or DEFAULT_INDEX_DIR
+        key = hashlib.sha1(str(self.root).encode()).hexdigest()[:16]
+        self.index_path = Path(index_dir).expanduser() / f"{key}.json"
+        self._lock = threading.Lock()
+        self._index: Optional[dict] = None
+        self._data: Dict[str, bytes] = {}
+
+    @property
+    def index(self) -> dict:
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_or_build()
+            return self._index
+
+    def _load_or_build(self) -> dict:
+        files = _library_files(self.root)
+        try:
+            index = json.loads(self.index_path.read_text())
+            if (
+                index.get("version") == INDEX_VERSION
+                and index.get("root") == str(self.root)
+                and index.get("files") == {rel: list(sig) for rel, sig in files.items()}
+            ):
+                return index
+        except (OSError, ValueError):
+            pass
+        index = build_index(self.root, files)
+        self._save(index)
+        return index
+
+    def _save(self, index: dict) -> None:
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_name(f".{self.index_path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(index, indent=1, sort_keys=True))
+            os.replace(tmp, self.index_path)
+        except OSError:
+            # Read-only cache directory: the in-memory index still works
+            pass
+
+    def rebuild(self) -> dict:
+        with self._lock:
+            self._index = build_index(self.root)
+            self._data.clear()
+            self._save(self._index)
+            return self._index
+
+    def entry(self, variant: str) -> dict:
+        entry = self.index["entries"].get(variant)
+        if entry is None:
+            raise FileNotFoundError(f"No POTCAR for variant '{variant}' in {self.root}")
+        return entry
+
+    def zval(self, variant: str) -> float:
+        return self.entry(variant)["zval"]
+
+    def enmax(self, variant: str) -> float:
+        return self.entry(variant)["enmax"]
+
+    def get(self, variant: str) -> bytes:
+        with self._lock:
+            data = self._data.get(variant)
+        if data is None:
+            entry = self.entry(variant)
+            with (self.root / entry["file"]).open("rb") as f:
+                f.seek(entry["offset"])
+                data = f.read(entry["length"])
+            with self._lock:
+                self._data[variant] = data
+        return data
+
+    def assemble(self, elements: Iterable[str], overrides: Optional[Dict[str, str]] = None) -> bytes:
+        """Concatenated POTCAR for ``elements`` in the given (POSCAR) order."""
+        return b"".join(self.get(variant_for(el, overrides)) for el in elements)
+
+
+_libraries: Dict[Path, PotcarLibrary] = {}
+_libraries_lock = threading.Lock()
+
+
+def shared_library(root: Path) -> PotcarLibrary:
+    """One ``PotcarLibrary`` per directory, shared by all tasks of a run."""
+    root = Path(root).resolve()
+    with _libraries_lock:
+        if root not in _libraries:
+            _libraries[root] = PotcarLibrary(root)
+        return _libraries[root]
@@ -0,0 +1,142 @@
+"""Restart relaxations that stopped before converging.
+
+A relaxation is unconverged when VASP finished without ``reached required
+accuracy`` (NSW exhausted) or when OUTCAR lacks the final timing block and
+the scheduler no longer knows the job (walltime, node failure). A restart
+happens in place:
+
+- OUTCAR, OSZICAR, vasprun.xml and the old POSCAR are kept as ``<name>.<n>``,
+- CONTCAR is promoted to POSCAR through ``Job._write_poscar``,
+- WAVECAR/CHGCAR stay where VASP wrote them and are read back (ISTART=1 /
+  ICHARG=1), so nothing large is copied,
+- INCAR changes (plus ``restart.incar`` from the stage config) are written
+  with ``Job._write_incar``,
+- the job is resubmitted with ``Job.submit``.
+
+``.ink_restart.json`` counts the attempts; after ``restart.max_attempts``
+(default 3) the directory is left alone::
+
+    relax:
+      restart:
+        max_attempts: 5
+        incar: {IBRION: 1, POTIM: 0.2}
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from pymatgen.io.vasp.inputs import Incar
+
+from .jobs import Job
+from .manifest import NORMAL_TERMINATION, recorded_job_id
+
+RESTART_NAME = ".ink_restart.json"
+DEFAULT_MAX_ATTEMPTS = 3
+
+CONVERGED_TEXT = b"reached required accuracy"
+
+# Outputs of a finished attempt, archived as <name>.<attempt>
+ARCHIVED = ("OUTCAR", "OSZICAR", "vasprun.xml", "POSCAR")
+
+# Bytes at the end of OUTCAR searched for the convergence/termination markers
+TAIL_BYTES = 256 * 1024
+
+
+def _tail(path: Path, size: int = TAIL_BYTES) -> bytes:
+    with path.open("rb") as f:
+        f.seek(max(0, path.stat().st_size - size))
+        return f.read()
+
+
+def _nonempty(path: Path) -> bool:
+    return path.is_file() and path.stat().st_size > 0
+
+
+def relaxation_status(cwd: Path, job: Job) -> str:
+    """One of 'not started', 'running', 'converged', 'nsw limit' or 'terminated'.
+
+    Raises ``SchedulerQueryError`` when the scheduler cannot be asked
+    whether the recorded job still runs.
+    """
+    outcar = cwd / "OUTCAR"
+    job_id = recorded_job_id(cwd)
+
+    if job_id and job.scheduler.is_active(job_id):
+        return "running"
+    if not outcar.is_file():
+        return "not started"
+
+    tail = _tail(outcar)
+    if CONVERGED_TEXT in tail:
+        return "converged"
+    if NORMAL_TERMINATION in tail:
+        return "nsw limit"
+    return "terminated"
+
+
+def load_attempts(cwd: Path) -> dict:
+    try:
+        return json.loads((cwd / RESTART_NAME).read_text())
+    except (OSError, ValueError):
+        return {"attempts": 0, "history": []}
+
+
+def _save_attempts(cwd: Path, record: dict) -> None:
+    path = cwd / RESTART_NAME
+    tmp = path.with_name(f"{RESTART_NAME}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(record, indent=2))
+    os.replace(tmp, path)
+
+
+def restart(job: Job, cwd: Path, stage: str, reason: str, max_attempts: Optional[int] = None) -> Optional[str]:
+    """Restart the relaxation in ``cwd`` in place. Returns the new job id, or None if out of attempts."""
+    restart_cfg = (job.config.get(stage) or {}).get("restart") or {}
+    if max_attempts is None:
+        max_attempts = int(restart_cfg.get("max_attempts", DEFAULT_MAX_ATTEMPTS))
+
+    record = load_attempts(cwd)
+    if record["attempts"] >= max_attempts:
+        print(f"{cwd}: {reason}, but already restarted {record['attempts']} times (max {max_attempts}).")
+        return None
+    attempt = record["attempts"] + 1
+
+    contcar = cwd / "CONTCAR"
+    contcar_ok = _nonempty(contcar)
+    if contcar_ok:
+        # Parse before POSCAR is archived; a CONTCAR cut off mid-write fails here
+        try:
+            structure = job._structure(contcar).copy()
+        except Exception as e:
+            print(f"{cwd}: CONTCAR unreadable ({e}), restarting from POSCAR.")
+            contcar_ok = False
+
+    for name in ARCHIVED:
+        src = cwd / name
+        if src.is_file() and (name != "POSCAR" or contcar_ok):
+            os.replace(src, cwd / f"{name}.{attempt}")
+    if contcar_ok:
+        job._write_poscar(structure, cwd)
+
+    # Warm start from the files VASP left in place
+    incar = Incar.from_file(cwd / "INCAR").as_dict()
+    incar = {k: v for k, v in incar.items() if not k.startswith("@")}
+    if _nonempty(cwd / "WAVECAR"):
+        incar.update(ISTART=1)
+    elif _nonempty(cwd / "CHGCAR"):
+        incar.update(ISTART=0, ICHARG=1)
+    else:
+        incar.update(ISTART=0)
+        incar.pop("ICHARG", None)
+    incar.update(restart_cfg.get("incar") or {})
+    job._write_incar(incar, cwd)
+
+    job_id = job.submit(cwd)
+    record["attempts"] = attempt
+    record["history"].append(
+        {"attempt": attempt, "reason": reason, "job_id": job_id, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    )
+    _save_attempts(cwd, record)
+    return job_id
@@ -0,0 +1,414 @@
+"""Scheduler backends used to submit, cancel and poll VASP jobs.
+
+``global.scheduler`` in vasp_config.yaml selects the backend:
+
+- ``pbs``: PBS Pro (``qsub``/``qdel``/``qstat``, arrays via ``-J``)
+- ``torque``: Torque (like pbs, arrays via ``-t``)
+- ``slurm``: Slurm (``sbatch``/``scancel``/``squeue``)
+- ``local``: run jobscripts on this machine with a bounded process pool
+
+The local backend reads ``global.local``::
+
+    global:
+      scheduler: local
+      local:
+        cores_per_job: 4     # cores one jobscript uses (default 1)
+        max_workers: 8       # default: cpu count // cores_per_job
+"""
+
+import itertools
+import os
+import signal
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+PBS_STATES = {
+    "Q": "queued",
+    "W": "queued",
+    "T": "queued",
+    "H": "held",
+    "S": "held",
+    "R": "running",
+    "B": "running",
+    "E": "exiting",
+    "C": "completed",
+    "F": "completed",
+}
+
+SLURM_STATES = {
+    "PENDING": "queued",
+    "CONFIGURING": "queued",
+    "REQUEUED": "queued",
+    "SUSPENDED": "held",
+    "RUNNING": "running",
+    "COMPLETING": "exiting",
+    "COMPLETED": "completed",
+    "CANCELLED": "cancelled",
+    "FAILED": "failed",
+    "TIMEOUT": "failed",
+    "NODE_FAIL": "failed",
+    "OUT_OF_MEMORY": "failed",
+}
+
+# Job states that mean the job has not finished yet
+ACTIVE_STATES = {"submitted", "queued", "held", "running", "exiting"}
+
+
+class SchedulerQueryError(RuntimeError):
+    """The batch system could not be queried, so job states are unknown."""
+
+
+def job_key(job_id: str) -> str:
+    """Scheduler-independent key of a job id: '123[4].server' -> '123[4]'."""
+    return job_id.strip().split(".", 1)[0]
+
+
+class Scheduler(ABC):
+    """Interface of a batch system backend."""
+
+    name = ""
+    # Prefix of scheduler directives in jobscripts, e.g. "#PBS"
+    directive = ""
+
+    def __init__(self):
+        self._snapshot: Optional[Dict[str, str]] = None
+
+    @abstractmethod
+    def submit(
+        self,
+        script: Path,
+        cwd: Path,
+        array_size: Optional[int] = None,
+        depends_on: Sequence[str] = (),
+    ) -> str:
+        """Submit ``script`` from ``cwd`` and return the job id.
+
+        ``array_size`` submits a job array with indices 0..N-1 and
+        ``depends_on`` holds job ids that must finish successfully first.
+        """
+
+    @abstractmethod
+    def cancel(self, job_ids: Sequence[str]) -> None:
+        """Cancel all ``job_ids`` with a single call."""
+
+    @abstractmethod
+    def query(self) -> Dict[str, str]:
+        """Return {job_key: state} for every job the scheduler lists."""
+
+    @abstractmethod
+    def array_element(self, array_id: str, index: int) -> str:
+        """Job id of element ``index`` of the array ``array_id``."""
+
+    def cpu_request(self, cores: int) -> List[str]:
+        """Directive lines requesting ``cores`` CPUs on one node (none for local jobs)."""
+        return []
+
+    def strip_cpu_request(self, line: str) -> Optional[str]:
+        """``line`` without the node/CPU request it makes, None if nothing is left."""
+        return line
+
+    def refresh(self) -> Dict[str, str]:
+        """Take a new bulk snapshot for ``is_active`` and return it."""
+        self._snapshot = self.query()
+        return self._snapshot
+
+    def is_active(self, job_id: str) -> bool:
+        """Whether ``job_id`` is still queued or running.
+
+        The first call takes one bulk snapshot that later calls reuse. A
+        failed query raises ``SchedulerQueryError``: an unreachable
+        qstat/squeue says nothing about whether the job still runs.
+        """
+        if self._snapshot is None:
+            try:
+                self._snapshot = self.query()
+            except (OSError, subprocess.CalledProcessError) as e:
+                raise SchedulerQueryError(f"{self.name} query failed: {e}") from e
+        return self._snapshot.get(job_key(job_id)) in ACTIVE_STATES
+
+    def wait(self) -> None:
+        """Block until locally running jobs finish (no-op for batch systems)."""
+
+
+class PBSScheduler(Scheduler):
+    name = "pbs"
+    directive = "#PBS"
+    array_flag = "-J"
+
+    def submit(self, script, cwd, array_size=None, depends_on=()):
+        script, cwd = Path(script).resolve(), Path(cwd).resolve()
+        cmd = ["qsub"]
+        # PBS Pro rejects the single-index range "-J0-0"; one element runs as a
+        # plain job (no PBS_ARRAY_INDEX, which array scripts treat as index 0)
+        if array_size is not None and array_size > 1:
+            cmd.append(f"{self.array_flag}0-{array_size - 1}")
+        if depends_on:
+            cmd += ["-W", "depend=afterok:" + ":".join(depends_on)]
+        cmd.append(str(script))
+        result = subprocess.run(cmd, check=True, cwd=cwd, stdout=subprocess.PIPE, text=True)
+        # Output format varies by scheduler (Torque, PBS), but it is usually
+        # "12345.server" or just "12345".
+        return result.stdout.strip()
+
+    def cancel(self, job_ids):
+        if job_ids:
+            subprocess.run(["qdel", *job_ids], check=False)
+
+    def query(self):
+        result = subprocess.run(["qstat", "-t"], stdout=subprocess.PIPE, text=True, check=True)
+        return self.parse_query(result.stdout)
+
+    @staticmethod
+    def parse_query(output: str) -> Dict[str, str]:
+        """Parse default ``qstat`` output in a single pass."""
+        states: Dict[str, str] = {}
+        # header, a '----' ruler, then "id name user time S queue"
+        in_body = False
+        for line in output.splitlines():
+            if not in_body:
+                in_body = line.startswith("---")
+                continue
+            parts = line.split()
+            if len(parts) >= 5:
+                states[job_key(parts[0])] = PBS_STATES.get(parts[-2], parts[-2])
+        return states
+
+    def array_element(self, array_id, index):
+        return array_id.replace("[]", f"[{index}]", 1)
+
+    # "-l" resources that size the allocation
+    cpu_resources = ("select", "nodes", "ncpus", "mpiprocs", "ppn")
+
+    def cpu_request(self, cores):
+        return [f"#PBS -l select=1:ncpus={cores}:mpiprocs={cores}"]
+
+    def strip_cpu_request(self, line):
+        tokens = line.split()
+        if len(tokens) < 3 or tokens[1] != "-l":
+            return line
+        kept = [r for r in tokens[2].split(",") if r.split("=", 1)[0] not in self.cpu_resources]
+        if not kept:
+            return None
+        return " ".join([tokens[0], "-l", ",".join(kept), *tokens[3:]])
+
+
+class TorqueScheduler(PBSScheduler):
+    name = "torque"
+    array_flag = "-t"
+
+    def cpu_request(self, cores):
+        return [f"#PBS -l nodes=1:ppn={cores}"]
+
+
+class SlurmScheduler(Scheduler):
+    name = "slurm"
+    directive = "#SBATCH"
+
+    def submit(self, script, cwd, array_size=None, depends_on=()):
+        script, cwd = Path(script).resolve(), Path(cwd).resolve()
+        cmd = ["sbatch", "--parsable"]
+        if array_size is not None:
+            cmd.append(f"--array=0-{array_size - 1}")
+        if depends_on:
+            cmd.append("--dependency=afterok:" + ":".join(depends_on))
+        cmd.append(str(script))
+        result = subprocess.run(cmd, check=True, cwd=cwd, stdout=subprocess.PIPE, text=True)
+        # --parsable prints "jobid" or "jobid;cluster"
+        return result.stdout.strip().split(";", 1)[0]
+
+    def cancel(self, job_ids):
+        if job_ids:
+            subprocess.run(["scancel", *job_ids], check=False)
+
+    def query(self):
+        result = subprocess.run(
+            ["squeue", "-h", "-r", "-o", "%i %T"], stdout=subprocess.PIPE, text=True, check=True
+        )
+        return self.parse_query(result.stdout)
+
+    @staticmethod
+    def parse_query(output: str) -> Dict[str, str]:
+        """Parse ``squeue -h -o '%i %T'`` output in a single pass."""
+        states: Dict[str, str] = {}
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) >= 2:
+                states[job_key(parts[0])] = SLURM_STATES.get(parts[1], parts[1].lower())
+        return states
+
+    def array_element(self, array_id, index):
+        return f"{array_id}_{index}"
+
+    # Options that size the allocation
+    cpu_options = ("-N", "--nodes", "-n", "--ntasks", "--ntasks-per-node", "-c", "--cpus-per-task")
+
+    def cpu_request(self, cores):
+        return ["#SBATCH --nodes=1", f"#SBATCH --ntasks={cores}"]
+
+    def strip_cpu_request(self, line):
+        tokens = line.split()
+        if len(tokens) >= 2 and tokens[1].split("=", 1)[0] in self.cpu_options:
+            return None
+        return line
+
+
+class LocalScheduler(Scheduler):
+    """Run jobscripts on this machine, at most ``max_workers`` at a time.
+
+    Each job runs ``bash <script>`` in its directory with its output in
+    ``ink-local.<id>.log``. PBS_O_WORKDIR/SLURM_SUBMIT_DIR point at the
+    directory, array elements get PBS_ARRAY_INDEX/SLURM_ARRAY_TASK_ID, and
+    INK_NCORES/OMP_NUM_THREADS are set to ``cores_per_job``. Jobs only exist
+    while the submitting ``ink`` process runs; commands call ``wait()``
+    before exiting.
+    """
+
+    name = "local"
+
+    def __init__(self, cores_per_job: int = 1, max_workers: Optional[int] = None):
+        super().__init__()
+        self.cores_per_job = max(1, int(cores_per_job))
+        if max_workers is None:
+            max_workers = max(1, (os.cpu_count() or 1) // self.cores_per_job)
+        self.max_workers = int(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._futures: Dict[str, Future] = {}
+        self._states: Dict[str, str] = {}
+        self._procs: Dict[str, subprocess.Popen] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._prefix = f"local{os.getpid()}"
+
+    def submit(self, script, cwd, array_size=None, depends_on=()):
+        script, cwd = Path(script).resolve(), Path(cwd).resolve()
+        job_id = f"{self._prefix}-{next(self._ids)}"
+        if array_size is None:
+            self._start(job_id, script, cwd, None, list(depends_on))
+        else:
+            for index in range(array_size):
+                element = self.array_element(job_id, index)
+                self._start(element, script, cwd, index, list(depends_on))
+        return job_id
+
+    def _start(
+        self, job_id: str, script: Path, cwd: Path, index: Optional[int], depends_on: List[str]
+    ) -> None:
+        with self._lock:
+            self._states[job_id] = "queued"
+            self._futures[job_id] = self._executor.submit(
+                self._run, job_id, script, cwd, index, depends_on
+            )
+
+    def _run(
+        self, job_id: str, script: Path, cwd: Path, index: Optional[int], depends_on: List[str]
+    ) -> int:
+        # Jobs are queued after their dependencies and the pool is FIFO, so
+        # the dependencies are already running or done here.
+        for dep in depends_on:
+            with self._lock:
+                dep_futures = [
+                    f for key, f in self._futures.items() if key == dep or key.startswith(f"{dep}_")
+                ]
+            if any(f.result() != 0 for f in dep_futures):
+                with self._lock:
+                    self._states[job_id] = "cancelled"
+                return -1
+
+        with self._lock:
+            if self._states.get(job_id) == "cancelled":
+                return -1
+            self._states[job_id] = "running"
+
+        env = dict(os.environ)
+        env.update(
+            PBS_O_WORKDIR=str(cwd),
+            SLURM_SUBMIT_DIR=str(cwd),
+            PBS_JOBID=job_id,
+            SLURM_JOB_ID=job_id,
+            INK_NCORES=str(self.cores_per_job),
+            OMP_NUM_THREADS=str(self.cores_per_job),
+        )
+        if index is not None:
+            env.update(PBS_ARRAY_INDEX=str(index), SLURM_ARRAY_TASK_ID=str(index))
+
+        with (cwd / f"ink-local.{job_id}.log").open("wb") as log:
+            # Own process group, so cancel() also stops mpirun and its ranks
+            proc = subprocess.Popen(
+                ["bash", str(script)],
+                cwd=cwd,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+            with self._lock:
+                self._procs[job_id] = proc
+                if self._states.get(job_id) == "cancelled":
+                    # cancel() ran between the state check and Popen
+                    os.killpg(proc.pid, signal.SIGTERM)
+            code = proc.wait()
+
+        with self._lock:
+            self._procs.pop(job_id, None)
+            if self._states.get(job_id) != "cancelled":
+                self._states[job_id] = "completed" if code == 0 else "failed"
+        return code
+
+    def cancel(self, job_ids):
+        with self._lock:
+            for job_id in job_ids:
+                for key in list(self._states):
+                    if key == job_id or key.startswith(f"{job_id}_"):
+                        if self._states[key] in ACTIVE_STATES:
+                            self._states[key] = "cancelled"
+                        proc = self._procs.get(key)
+                        if proc is not None:
+                            try:
+                                os.killpg(proc.pid, signal.SIGTERM)
+                            except ProcessLookupError:
+                                pass
+
+    def query(self):
+        with self._lock:
+            return {job_key(k): v for k, v in self._states.items()}
+
+    def is_active(self, job_id):
+        # Local state is always current; no snapshot needed.
+        return self.query().get(job_key(job_id)) in ACTIVE_STATES
+
+    def array_element(self, array_id, index):
+        return f"{array_id}_{index}"
+
+    def wait(self):
+        with self._lock:
+            pending = sum(1 for state in self._states.values() if state in ACTIVE_STATES)
+        if pending:
+            print(f"Waiting for {pending} local jobs ({self.max_workers} at a time)...")
+        self._executor.shutdown(wait=True)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+
+SCHEDULERS = {
+    "pbs": PBSScheduler,
+    "torque": TorqueScheduler,
+    "slurm": SlurmScheduler,
+    "local": LocalScheduler,
+}
+
+
+def get_scheduler(name: str = "pbs", **options) -> Scheduler:
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler '{name}', expected one of {sorted(SCHEDULERS)}")
+    return SCHEDULERS[name](**options)
+
+
+def scheduler_from_config(global_cfg: dict, name: Optional[str] = None) -> Scheduler:
+    """Build the scheduler named by ``name`` or ``global.scheduler`` (default pbs)."""
+    global_cfg = global_cfg or {}
+    name = name or global_cfg.get("scheduler") or "pbs"
+    options = dict(global_cfg.get("local") or {}) if name == "local" else {}
+    return get_scheduler(name, **options)
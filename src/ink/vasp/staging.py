@@ -0,0 +1,236 @@
+"""Content-addressed staging of large VASP inputs (CHGCAR, WAVECAR, POTCAR).
+
+Each distinct input is stored once under ``<store>/objects/<sha256>`` and then
+materialized in task directories as a reflink, hardlink or symlink. Copying
+is only the fallback when linking is impossible.
+
+Store objects are read-only. Hardlinks and symlinks share data with the
+store, so only use them for files the job reads and never rewrites. Files a
+run may overwrite (CHGCAR with ``LCHARG = .TRUE.``, WAVECAR with ``LWAVE``)
+are therefore reflinked or copied straight from the source in mode "auto",
+without entering the store; they are only hardlinked or symlinked when
+configured explicitly. Copies keep the source mtime, so a destination with
+the source's size and mtime is not copied again. Modes are configured per
+destination name in vasp_config.yaml::
+
+    global:
+      staging:
+        store: .ink_store
+        modes:
+          CHGCAR: symlink     # read-only ICHARG = 11 runs
+          POTCAR: hardlink
+          WAVECAR: copy
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import stat
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .sync import up_to_date
+
+LINK_MODES = ("auto", "reflink", "hardlink", "symlink", "copy")
+
+# Order tried by mode "auto"; "copy" always works.
+AUTO_ORDER = ("reflink", "hardlink", "symlink", "copy")
+
+# Files VASP may rewrite in place never share data with the store in "auto"
+REWRITTEN_FILES = {"CHGCAR", "WAVECAR"}
+REWRITTEN_ORDER = ("reflink", "copy")
+
+# Errors that make "auto" try the next mode
+FALLBACK_ERRNOS = (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.EMLINK)
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+DEFAULT_STORE = ".ink_store"
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    """Clone ``src`` into ``dst`` sharing extents (btrfs, XFS, ...)."""
+    with src.open("rb") as fsrc, dst.open("wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            dst.unlink()
+            raise
+
+
+def _is_copy_of(src: Path, dst: Path) -> bool:
+    """Whether ``dst`` is a private copy of ``src`` by size and mtime (as rsync)."""
+    try:
+        st = os.lstat(dst)
+    except FileNotFoundError:
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_nlink == 1 and up_to_date(src, dst)
+
+
+def _copy_times(src: Path, dst: Path) -> None:
+    st = os.stat(src)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+class Store:
+    """A directory of read-only input files addressed by their sha256."""
+
+    def __init__(self, root: Path, modes: Optional[Dict[str, str]] = None):
+        self.root = Path(root).expanduser().resolve()
+        self.modes = {str(k): str(v) for k, v in (modes or {}).items()}
+        for key, mode in self.modes.items():
+            if mode not in LINK_MODES:
+                raise ValueError(
+                    f"Unknown staging mode '{mode}' for '{key}', expected one of {LINK_MODES}"
+                )
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        # (store device, destination device, order) -> first mode that worked in "auto"
+        self._auto_modes: Dict[Tuple[int, int, Tuple[str, ...]], str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, global_cfg: dict, work_dir: Path) -> "Store":
+        staging_cfg = (global_cfg or {}).get("staging") or {}
+        root = Path(staging_cfg.get("store") or DEFAULT_STORE).expanduser()
+        if not root.is_absolute():
+            root = work_dir / root
+        return cls(root, staging_cfg.get("modes"))
+
+    def digest(self, src: Path) -> str:
+        src = Path(src).resolve()
+        st = src.stat()
+        key = (str(src), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            with src.open("rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def put(self, src: Path) -> Path:
+        """Add ``src`` to the store if needed and return the stored object."""
+        src = Path(src)
+        digest = self.digest(src)
+        obj = self.root / "objects" / digest[:2] / digest[2:]
+        if obj.is_file():
+            return obj
+
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        tmp = obj.with_name(f"{obj.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            _reflink(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        tmp.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp, obj)
+        return obj
+
+    def materialize(self, src: Path, dst: Path, mode: Optional[str] = None) -> str:
+        """Place the content of ``src`` at ``dst`` and return the mode used.
+
+        ``mode`` defaults to the configured mode for ``dst.name`` or "auto".
+        A destination that already holds the content is left alone and
+        "unchanged" is returned: a link to the stored object, or a private
+        copy with the size and mtime of ``src`` (copies keep the mtime).
+        """
+        src = Path(src)
+        dst = Path(dst)
+        mode = mode or self.modes.get(dst.name, "auto")
+        if mode not in LINK_MODES:
+            raise ValueError(f"Unknown staging mode '{mode}', expected one of {LINK_MODES}")
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+
+        if mode in ("auto", "reflink", "copy") and _is_copy_of(src, dst):
+            return "unchanged"
+
+        if mode == "copy" or (mode == "auto" and dst.name in REWRITTEN_FILES):
+            # A private copy straight from the source: the store would only
+            # add a hash, a second copy and a permanent duplicate
+            self._replace(dst)
+            if mode == "copy":
+                shutil.copyfile(src, dst)
+                used = "copy"
+            else:
+                used = self._auto(src, dst, REWRITTEN_ORDER)
+            _copy_times(src, dst)
+            return used
+
+        obj = self.put(src)
+        if dst.exists() and os.path.samefile(obj, dst):
+            return "unchanged"
+        self._replace(dst)
+
+        if mode == "auto":
+            used = self._auto(obj, dst, AUTO_ORDER)
+        else:
+            self._link(obj, dst, mode)
+            used = mode
+        if used in ("reflink", "copy"):
+            _copy_times(src, dst)
+        return used
+
+    def _auto(self, source: Path, dst: Path, order: Tuple[str, ...]) -> str:
+        """Place ``source`` at ``dst`` with the first mode of ``order`` that works.
+
+        The working mode is remembered per pair of file systems and tried
+        first next time; if it fails (e.g. EMLINK, the link count cap of one
+        file) the rest of ``order`` is still tried.
+        """
+        key = (source.stat().st_dev, dst.parent.stat().st_dev, order)
+        with self._lock:
+            known = self._auto_modes.get(key)
+        candidates = (known, *(m for m in order if m != known)) if known else order
+        for candidate in candidates:
+            try:
+                self._link(source, dst, candidate)
+            except OSError as e:
+                if e.errno not in FALLBACK_ERRNOS:
+                    raise
+                continue
+            # A remembered mode failing here is a per-file limit: keep it
+            if known is None:
+                with self._lock:
+                    self._auto_modes[key] = candidate
+            return candidate
+
+        raise OSError(f"Could not materialize {source} at {dst}")
+
+    @staticmethod
+    def _replace(dst: Path) -> None:
+        if dst.is_symlink() or dst.is_file():
+            dst.unlink()
+
+    @staticmethod
+    def _link(obj: Path, dst: Path, mode: str) -> None:
+        if mode == "reflink":
+            _reflink(obj, dst)
+        elif mode == "hardlink":
+            os.link(obj, dst)
+        elif mode == "symlink":
+            dst.symlink_to(obj)
+        else:
+            shutil.copyfile(obj, dst)
+
+
+_stores: Dict[Tuple[Path, Tuple[Tuple[str, str], ...]], Store] = {}
+_stores_lock = threading.Lock()
+
+
+def shared_store(global_cfg: dict, work_dir: Path) -> Store:
+    """Return the process-wide Store for this configuration.
+
+    Sharing the instance keeps digests and per-filesystem link modes
+    memoized, so a multi-GB CHGCAR is hashed once per run.
+    """
+    store = Store.from_config(global_cfg, work_dir)
+    key = (store.root, tuple(sorted(store.modes.items())))
+    with _stores_lock:
+        return _stores.setdefault(key, store)
@@ -0,0 +1,293 @@
+"""Throttled submission of a queue of prepared task directories.
+
+``ink vaspjobs submitd DIRS`` adds the directories to a persistent queue
+and submits them through ``Job.submit`` while keeping at most ``limit`` of
+its jobs in the scheduler. Each poll is one bulk ``query()``. The poll
+interval starts at ``min_interval``, grows by half after every poll that
+frees no slot (up to ``max_interval``) and drops back as soon as a slot
+frees; a job counts as gone once ``MISSING_SNAPSHOTS`` consecutive polls
+miss it. A rejected ``qsub`` (e.g. a per-user queue cap) also backs off and
+moves the directory to the back of the queue. After ``max_attempts``
+rejections it is marked failed.
+
+The queue is an SQLite database (``<work_dir>/.ink_submitd.sqlite`` or
+``global.submitd.db``). A row is marked ``submitting`` before ``qsub`` and
+``submitted`` with its job id afterwards, so a restarted daemon picks up
+where it stopped: the mark stores the mtime and content of the qsub.pid
+present at that time, and a ``submitting`` row whose qsub.pid differs from
+them is adopted instead of being submitted again. Only one daemon may run
+per database; others can still add directories with ``--enqueue-only``::
+
+    global:
+      submitd:
+        limit: 200
+        min_interval: 30
+        max_interval: 600
+        max_attempts: 5
+"""
+
+import fcntl
+import sqlite3
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .jobdb import MISSING_SNAPSHOTS
+from .manifest import needs_submission
+from .scheduler import ACTIVE_STATES, job_key
+
+DB_NAME = ".ink_submitd.sqlite"
+DEFAULT_LIMIT = 100
+DEFAULT_MIN_INTERVAL = 30.0
+DEFAULT_MAX_INTERVAL = 600.0
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Jobs younger than this count as active even if the scheduler does not list them yet
+# (listed jobs in a final state are finished at once)
+LISTING_GRACE = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY,
+    directory TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL DEFAULT 'pending',
+    job_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    added_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    position INTEGER,
+    pid_before TEXT,
+    missed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS queue_state ON queue(state);
+CREATE INDEX IF NOT EXISTS queue_order ON queue(state, position);
+"""
+
+# Position after every queued row
+NEXT_POSITION = "(SELECT COALESCE(MAX(position), 0) + 1 FROM queue)"
+
+# pending -> submitting -> submitted -> finished; skipped/failed are final
+STATES = ("pending", "submitting", "submitted", "finished", "skipped", "failed")
+
+
+class SubmitQueue:
+    """Persistent queue of task directories waiting for a scheduler slot."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock_file = None
+
+    def lock(self) -> bool:
+        """Become the only daemon of this queue; False if another one runs."""
+        self._lock_file = open(f"{self.path}.lock", "a+")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+        return True
+
+    def add(self, dirs: Iterable[Path], requeue: bool = False) -> int:
+        """Queue ``dirs`` (in order); with ``requeue`` finished rows are queued again."""
+        now = time.time()
+        added = 0
+        with self.conn:
+            for d in dirs:
+                d = str(Path(d).resolve())
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO queue (directory, added_at, updated_at, position) "
+                    f"VALUES (?, ?, ?, {NEXT_POSITION})",
+                    (d, now, now),
+                )
+                if not cur.rowcount and requeue:
+                    cur = self.conn.execute(
+                        "UPDATE queue SET state = 'pending', attempts = 0, missed = 0, error = NULL, updated_at = ?, "
+                        f"position = {NEXT_POSITION} "
+                        "WHERE directory = ? AND state IN ('finished', 'skipped', 'failed')",
+                        (now, d),
+                    )
+                added += cur.rowcount
+        return added
+
+    def set_state(self, directory: str, state: str, **fields) -> None:
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        sql = f"UPDATE queue SET state = ?, updated_at = ?{', ' + columns if columns else ''} WHERE directory = ?"
+        with self.conn:
+            self.conn.execute(sql, (state, time.time(), *fields.values(), directory))
+
+    def rows(self, state: str, limit: int = -1) -> List[Tuple[str, Optional[str], float]]:
+        """(directory, job_id, updated_at) in queue order."""
+        return self.conn.execute(
+            "SELECT directory, job_id, updated_at FROM queue WHERE state = ? ORDER BY position LIMIT ?",
+            (state, limit),
+        ).fetchall()
+
+    def mark_submitting(self, directory: str) -> None:
+        """Mark ``directory`` as being submitted, remembering its current qsub.pid."""
+        self.set_state(directory, "submitting", pid_before=_pid_signature(Path(directory)))
+
+    def retry(self, directory: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+        """Move a rejected submission to the back of the queue.
+
+        After ``max_attempts`` rejections the row is marked failed instead;
+        returns True if it was queued again.
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE queue SET attempts = attempts + 1, error = ?, updated_at = ?, "
+                "state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, "
+                f"position = {NEXT_POSITION} WHERE directory = ?",
+                (error, time.time(), max(1, max_attempts), directory),
+            )
+        (state,) = self.conn.execute("SELECT state FROM queue WHERE directory = ?", (directory,)).fetchone()
+        return state == "pending"
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM queue GROUP BY state"))
+
+    def recover(self) -> Tuple[int, int]:
+        """Settle rows left in 'submitting' by a daemon that stopped mid-submission.
+
+        Returns (adopted, requeued).
+        """
+        adopted = requeued = 0
+        marked = self.conn.execute("SELECT directory, pid_before FROM queue WHERE state = 'submitting'").fetchall()
+        for directory, pid_before in marked:
+            signature = _pid_signature(Path(directory))
+            # Both signatures come from the file system, so clock skew between
+            # this host and a network file server does not matter
+            if signature and signature != pid_before:
+                self.set_state(directory, "submitted", job_id=signature.split(":", 1)[1])
+                adopted += 1
+            else:
+                self.set_state(directory, "pending")
+                requeued += 1
+        return adopted, requeued
+
+    def refresh(self, snapshot: Dict[str, str], taken_at: float) -> int:
+        """Mark submitted jobs that left the scheduler as finished; returns how many.
+
+        A job listed in a final state is finished at once; one missing from
+        the snapshot only after ``MISSING_SNAPSHOTS`` consecutive snapshots,
+        so a single truncated listing does not free its slot.
+        """
+        rows = self.conn.execute(
+            "SELECT directory, job_id, updated_at, missed FROM queue WHERE state = 'submitted' ORDER BY position"
+        ).fetchall()
+        finished: List[str] = []
+        missed_updates: List[Tuple[int, str]] = []
+        for directory, job_id, submitted_at, old_missed in rows:
+            state = snapshot.get(job_key(job_id or ""))
+            if state in ACTIVE_STATES:
+                if old_missed:
+                    missed_updates.append((0, directory))
+                continue
+            if state is None:
+                if taken_at - submitted_at < LISTING_GRACE:
+                    continue
+                if old_missed + 1 < MISSING_SNAPSHOTS:
+                    missed_updates.append((old_missed + 1, directory))
+                    continue
+            finished.append(directory)
+
+        with self.conn:
+            # updated_at stays the submission time the grace period is measured from
+            self.conn.executemany("UPDATE queue SET missed = ? WHERE directory = ?", missed_updates)
+        for directory in finished:
+            self.set_state(directory, "finished")
+        return len(finished)
+
+
+def _pid_signature(cwd: Path) -> str:
+    """``<mtime_ns>:<job id>`` of the qsub.pid in ``cwd``, "" if there is none."""
+    pid_file = cwd / "qsub.pid"
+    try:
+        return f"{pid_file.stat().st_mtime_ns}:{pid_file.read_text().strip()}"
+    except FileNotFoundError:
+        return ""
+
+
+def _print_status(queue: SubmitQueue, interval: float) -> None:
+    counts = queue.counts()
+    parts = [f"{name} {counts[name]}" for name in STATES if counts.get(name)]
+    stamp = time.strftime("%H:%M:%S")
+    print(f"[{stamp}] {', '.join(parts) or 'queue empty'}; next poll in {interval:.0f}s", flush=True)
+
+
+def run_daemon(
+    job,
+    queue: SubmitQueue,
+    limit: int,
+    min_interval: float = DEFAULT_MIN_INTERVAL,
+    max_interval: float = DEFAULT_MAX_INTERVAL,
+    follow: bool = False,
+    force: bool = False,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> None:
+    """Submit queued directories as slots free up until the queue is drained."""
+    scheduler = job.scheduler
+    adopted, requeued = queue.recover()
+    if adopted or requeued:
+        print(f"Recovered interrupted submissions: {adopted} adopted, {requeued} queued again.")
+
+    interval = min_interval
+    while True:
+        try:
+            snapshot = scheduler.refresh()
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Scheduler query failed: {e}")
+            interval = min(max_interval, interval * 1.5)
+            time.sleep(interval)
+            continue
+
+        freed = queue.refresh(snapshot, time.time())
+        active = len(queue.rows("submitted"))
+        submitted = skipped = 0
+        rejected = False
+
+        for directory, _, _ in queue.rows("pending", max(0, limit - active)):
+            cwd = Path(directory)
+            if not (cwd / "jobscript.sh").is_file():
+                queue.set_state(directory, "failed", error="jobscript.sh not found")
+                skipped += 1
+                continue
+            if not force:
+                reason = needs_submission(cwd, scheduler)
+                if reason is None:
+                    queue.set_state(directory, "skipped", error="inputs unchanged since last submission")
+                    skipped += 1
+                    continue
+
+            queue.mark_submitting(directory)
+            try:
+                job_id = job.submit(cwd)
+            except (OSError, subprocess.CalledProcessError) as e:
+                if queue.retry(directory, str(e), max_attempts):
+                    print(f"Submission of {directory} rejected ({e}); moved to the back, backing off.")
+                else:
+                    print(f"Submission of {directory} rejected ({e}) {max_attempts} times; marked failed.")
+                rejected = True
+                break
+            queue.set_state(directory, "submitted", job_id=job_id, error=None)
+            submitted += 1
+
+        if freed or submitted or skipped:
+            interval = min_interval
+        elif rejected or active >= limit:
+            interval = min(max_interval, interval * 1.5)
+
+        counts = queue.counts()
+        if not counts.get("pending") and not counts.get("submitting") and not follow:
+            _print_status(queue, 0)
+            print("All queued directories submitted.")
+            return
+
+        _print_status(queue, interval)
+        time.sleep(interval)
@@ -0,0 +1,172 @@
+"""Expand a ``sweep:`` block of a stage into one task directory per grid point.
+
+Example in vasp_config.yaml::
+
+    encut_conv:
+      poscar: data/POSCAR
+      potcar: data/POTCAR
+      kpoints: 0.03
+      incar: {ENCUT: 500, ISMEAR: 0}
+      jobscript: |
+        ...
+      sweep:
+        mode: product        # product (default) or zip
+        params:
+          ENCUT: [400, 500, 600]
+          kpoints: [0.04, 0.03]
+          strain: [-0.02, 0, 0.02]
+
+``kpoints`` replaces the stage's kpoints value (any form ``_write_kpoints``
+accepts), ``strain`` is applied to the structure with
+``Structure.apply_strain`` (a number for isotropic strain or three per-axis
+values), and every other key overrides that INCAR tag. Point ``i`` is
+written to ``<work_dir>/<stage>/<KEY>-<value>_...`` by a thread pool; the
+parsed and strained structures and the POTCAR are computed once and shared
+by all points.
+"""
+
+import itertools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from pymatgen.io.vasp.inputs import Incar
+
+from .jobs import Job
+
+SWEEP_MODES = ("product", "zip")
+
+# Sweep keys that are not INCAR tags
+STRUCTURE_KEYS = {"kpoints", "strain"}
+
+
+def expand_sweep(sweep_cfg: dict) -> List[Dict[str, Any]]:
+    """All grid points of a sweep block as {key: value} dicts, in order."""
+    mode = sweep_cfg.get("mode", "product")
+    params = sweep_cfg.get("params") or {}
+    if mode not in SWEEP_MODES:
+        raise ValueError(f"Unknown sweep mode '{mode}', expected one of {SWEEP_MODES}")
+    if not params:
+        raise ValueError("sweep.params is empty.")
+
+    keys = list(params)
+    values = [v if isinstance(v, list) else [v] for v in params.values()]
+
+    if mode == "zip":
+        lengths = {len(v) for v in values}
+        if len(lengths) != 1:
+            raise ValueError(f"sweep mode 'zip' needs equally long lists, got lengths {sorted(lengths)}")
+        rows = zip(*values)
+    else:
+        rows = itertools.product(*values)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, list):
+        return ",".join(_format_value(v) for v in value)
+    if isinstance(value, dict):
+        return ",".join(f"{k}={_format_value(v)}" for k, v in value.items())
+    return str(value)
+
+
+def point_name(point: Dict[str, Any]) -> str:
+    """Directory name of a grid point, e.g. 'ENCUT-500_strain-0.02'."""
+    return "_".join(f"{key}-{_format_value(value)}" for key, value in point.items()).replace("/", "_")
+
+
+class SweepInputs:
+    """Inputs shared by all points of one sweep, computed on first use."""
+
+    def __init__(self, job: Job, stage: str):
+        self.job = job
+        self.stage = stage
+        self._lock = threading.Lock()
+        self._structures: Dict[str, Any] = {}
+        self._incar = None
+
+    def base_incar(self) -> dict:
+        with self._lock:
+            if self._incar is None:
+                incar = self.job._resolve_path(None, self.stage, "incar")
+                if not isinstance(incar, dict):
+                    incar = Incar.from_file(incar).as_dict()
+                    incar = {k: v for k, v in incar.items() if not k.startswith("@")}
+                self._incar = dict(incar)
+            return dict(self._incar)
+
+    def structure(self, strain: Any = None):
+        """Parsed (and, if ``strain`` is set, strained) structure, shared by all points."""
+        key = json.dumps(strain)
+        with self._lock:
+            structure = self._structures.get(key)
+            if structure is None:
+                structure = self.job._structure(self.job._resolve_path(None, self.stage, "poscar"))
+                if strain is not None and strain != 0:
+                    structure = structure.copy()
+                    structure.apply_strain(strain)
+                self._structures[key] = structure
+            return structure
+
+
+def setup_point(inputs: SweepInputs, point: Dict[str, Any], cwd: Path) -> None:
+    job, stage = inputs.job, inputs.stage
+    cwd.mkdir(parents=True, exist_ok=True)
+
+    incar = inputs.base_incar()
+    incar.update({k: v for k, v in point.items() if k not in STRUCTURE_KEYS})
+    structure = inputs.structure(point.get("strain"))
+    kpoints = point["kpoints"] if "kpoints" in point else job._resolve_path(None, stage, "kpoints")
+
+    job._write_poscar(structure, cwd)
+    job._write_incar(incar, cwd)
+    job._write_potcar(job._resolve_path(None, stage, "potcar"), cwd)
+    job._write_kpoints(kpoints, cwd, poscar=structure)
+    job._write_jobscript(job._resolve_path(None, stage, "jobscript"), cwd)
+    job._handle_cp(stage, cwd)
+
+
+def run_sweep(job: Job, stage: str, workers: int) -> Tuple[List[Path], List[Tuple[str, str]]]:
+    """Write every grid point of ``stage``'s sweep block with a thread pool.
+
+    Returns the prepared directories (in grid order) and the failures.
+    ``<stage>/sweep.json`` lists each directory with its parameters.
+    """
+    section = job.config.get(stage)
+    if not isinstance(section, dict):
+        raise ValueError(f"Stage '{stage}' not found in vasp_config.yaml.")
+    if not isinstance(section.get("sweep"), dict):
+        raise ValueError(f"Stage '{stage}' has no sweep block.")
+
+    points = expand_sweep(section["sweep"])
+    names = [point_name(p) for p in points]
+    if len(set(names)) != len(names):
+        raise ValueError("sweep.params produce duplicate grid points.")
+
+    sweep_dir = job.work_dir.resolve() / stage
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Setting up {len(points)} '{stage}' sweep points in {sweep_dir} with {workers} threads...")
+
+    inputs = SweepInputs(job, stage)
+    errors: List[Tuple[str, str]] = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(setup_point, inputs, point, sweep_dir / name): name
+            for point, name in zip(points, names)
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                errors.append((name, str(e)))
+                print(f"{name} FAILED: {e}")
+
+    (sweep_dir / "sweep.json").write_text(
+        json.dumps([{"dir": name, "params": point} for point, name in zip(points, names)], indent=2)
+    )
+
+    failed = {name for name, _ in errors}
+    return [sweep_dir / name for name in names if name not in failed], errors
@@ -0,0 +1,162 @@
+"""Span timing for job setup and submission phases.
+
+Phases are wrapped with ``timer.span(name)`` or ``@timed(name)``; every
+span adds its wall time to a per-process aggregate (count, total, max),
+from any thread. At the end of a command ``timer.export`` writes what
+``global.timing`` asks for::
+
+    global:
+      timing:
+        report: timing.json      # JSON report, relative to work_dir
+        textfile: /var/lib/node_exporter/textfile   # .prom file or directory
+        print: true              # summary table on stdout
+
+A textfile directory gets one ``ink_<command>.prom`` per command so runs
+of different commands do not overwrite each other.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def _version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("ink")
+    except Exception:
+        return "unknown"
+
+
+class Timer:
+    """Aggregated wall time per phase name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans: Dict[str, List[float]] = {}
+            self._started = time.time()
+            self._started_perf = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._spans.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def report(self, command: str = "") -> dict:
+        with self._lock:
+            spans = {
+                name: {
+                    "count": count,
+                    "total_s": total,
+                    "mean_s": total / count,
+                    "max_s": longest,
+                }
+                for name, (count, total, longest) in sorted(self._spans.items())
+            }
+            wall = time.perf_counter() - self._started_perf
+        return {
+            "command": command,
+            "version": _version(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started)),
+            "wall_s": wall,
+            "spans": spans,
+        }
+
+    def export(self, global_cfg: Optional[dict], command: str, work_dir: Optional[Path] = None) -> None:
+        """Write the report/textfile/summary configured in ``global.timing``."""
+        timing_cfg = (global_cfg or {}).get("timing") or {}
+        if not timing_cfg:
+            return
+        report = self.report(command)
+        base = Path(work_dir) if work_dir is not None else Path.cwd()
+
+        if timing_cfg.get("report"):
+            path = base / Path(timing_cfg["report"]).expanduser()
+            _atomic_write(path, json.dumps(report, indent=2))
+        if timing_cfg.get("textfile"):
+            path = Path(timing_cfg["textfile"]).expanduser()
+            if path.is_dir():
+                path = path / f"ink_{command or 'run'}.prom"
+            _atomic_write(path, prometheus_text(report))
+        if timing_cfg.get("print"):
+            print(summary(report))
+
+
+def prometheus_text(report: dict) -> str:
+    """node_exporter textfile collector format of a report."""
+    command = report["command"]
+    lines = [
+        "# HELP ink_phase_seconds Wall time spent in an ink phase during the last run.",
+        "# TYPE ink_phase_seconds gauge",
+    ]
+    for name, span in report["spans"].items():
+        lines.append(f'ink_phase_seconds{{command="{command}",phase="{name}"}} {span["total_s"]:.6f}')
+    lines += [
+        "# HELP ink_phase_calls Number of times an ink phase ran during the last run.",
+        "# TYPE ink_phase_calls gauge",
+    ]
+    for name, span in report["spans"].items():
+        lines.append(f'ink_phase_calls{{command="{command}",phase="{name}"}} {span["count"]}')
+    lines += [
+        "# HELP ink_run_seconds Wall time of the last ink run.",
+        "# TYPE ink_run_seconds gauge",
+        f'ink_run_seconds{{command="{command}",version="{report["version"]}"}} {report["wall_s"]:.6f}',
+        "# HELP ink_run_timestamp_seconds Unix time the last ink run finished.",
+        "# TYPE ink_run_timestamp_seconds gauge",
+        f'ink_run_timestamp_seconds{{command="{command}"}} {time.time():.0f}',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def summary(report: dict) -> str:
+    lines = [f"{'phase':<20} {'calls':>6} {'total s':>9} {'max s':>8}"]
+    for name, span in report["spans"].items():
+        lines.append(f"{name:<20} {span['count']:>6d} {span['total_s']:>9.3f} {span['max_s']:>8.3f}")
+    lines.append(f"{'wall':<20} {'':>6} {report['wall_s']:>9.3f}")
+    return "\n".join(lines)
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    # node_exporter may read the textfile at any moment
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def timed(name: str):
+    """Decorator form of ``timer.span(name)``."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Shared by all phases of one process.
+timer = Timer()
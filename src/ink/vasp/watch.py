@@ -0,0 +1,231 @@
+"""Incremental convergence monitor behind ``ink vaspjobs watch``.
+
+For every task directory the byte offset already parsed in OSZICAR and
+OUTCAR is remembered (in ``<work_dir>/.ink_watch.json``), so each refresh
+reads only what VASP appended since the last one. OSZICAR gives ionic
+steps, energies and SCF iterations per step; OUTCAR gives the largest
+force of the last TOTAL-FORCE block and normal termination. On first sight
+only the last ``OUTCAR_WINDOW`` bytes of an OUTCAR are read. A file that
+shrinks or is replaced (new inode) is parsed again from the start.
+"""
+
+import json
+import math
+import os
+import re
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .manifest import NORMAL_TERMINATION, recorded_job_id
+from .scheduler import job_key
+
+STATE_NAME = ".ink_watch.json"
+
+# Bytes of an already large OUTCAR read on first sight (the last force block
+# is all we need from the part written before watching started)
+OUTCAR_WINDOW = 8 * 1024 * 1024
+
+IONIC_RE = re.compile(r"^\s*(\d+)\s+F=\s*(\S+)\s+E0=\s*(\S+)\s+d E\s*=\s*(\S+)")
+SCF_RE = re.compile(r"^\s*[A-Z]{2,3}\s*:\s+\d+\s")
+
+FINISHED_TEXT = NORMAL_TERMINATION.decode()
+
+
+@dataclass
+class Progress:
+    """Parsed progress of one task plus the parser state needed to resume."""
+
+    oszicar_offset: int = 0
+    oszicar_inode: int = 0
+    outcar_offset: int = 0
+    outcar_inode: int = 0
+
+    ionic_steps: int = 0
+    energy: Optional[float] = None
+    delta_e: Optional[float] = None
+    scf_steps: int = 0
+    scf_current: int = 0
+    max_force: Optional[float] = None
+    finished: bool = False
+
+    # Inside a TOTAL-FORCE block: number of '----' rulers seen, running max
+    force_rulers: int = -1
+    force_current: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Progress":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+def _to_float(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def read_new_lines(path: Path, progress: Progress, prefix: str, window: Optional[int] = None) -> List[str]:
+    """Complete lines appended to ``path`` since the offset stored in ``progress``.
+
+    ``prefix`` selects the ``<prefix>_offset``/``<prefix>_inode`` fields.
+    The offset only advances past the last newline, so a line VASP is
+    still writing is read again next time.
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return []
+
+    offset = getattr(progress, f"{prefix}_offset")
+    skip_partial = False
+    if st.st_ino != getattr(progress, f"{prefix}_inode") or st.st_size < offset:
+        setattr(progress, f"{prefix}_inode", st.st_ino)
+        offset = max(0, st.st_size - window) if window else 0
+        skip_partial = offset > 0
+        # New or rewritten file (e.g. a restarted job): forget what it said
+        if prefix == "outcar":
+            progress.max_force, progress.finished, progress.force_rulers = None, False, -1
+        else:
+            progress.ionic_steps, progress.scf_steps, progress.scf_current = 0, 0, 0
+            progress.energy = progress.delta_e = None
+
+    if st.st_size <= offset:
+        setattr(progress, f"{prefix}_offset", offset)
+        return []
+
+    with path.open("rb") as f:
+        f.seek(offset)
+        data = f.read(st.st_size - offset)
+
+    start = 0
+    if skip_partial:
+        # We started mid-line: drop everything up to the first newline
+        start = data.find(b"\n") + 1
+        if start == 0:
+            return []
+    end = data.rfind(b"\n")
+    if end < start:
+        setattr(progress, f"{prefix}_offset", offset + start)
+        return []
+
+    setattr(progress, f"{prefix}_offset", offset + end + 1)
+    return data[start:end].decode("utf-8", errors="replace").splitlines()
+
+
+def parse_oszicar(lines: Iterable[str], progress: Progress) -> None:
+    for line in lines:
+        match = IONIC_RE.match(line)
+        if match:
+            progress.ionic_steps = int(match.group(1))
+            progress.energy = _to_float(match.group(2))
+            progress.delta_e = _to_float(match.group(4))
+            progress.scf_steps = progress.scf_current
+            progress.scf_current = 0
+        elif SCF_RE.match(line):
+            progress.scf_current += 1
+
+
+def parse_outcar(lines: Iterable[str], progress: Progress) -> None:
+    for line in lines:
+        if progress.force_rulers >= 0:
+            if line.startswith(" ---"):
+                progress.force_rulers += 1
+                if progress.force_rulers == 2:
+                    progress.max_force = progress.force_current
+                    progress.force_rulers = -1
+                continue
+            if progress.force_rulers == 1:
+                parts = line.split()
+                if len(parts) >= 6:
+                    fx, fy, fz = (_to_float(p) for p in parts[3:6])
+                    if None not in (fx, fy, fz):
+                        norm = math.sqrt(fx * fx + fy * fy + fz * fz)
+                        progress.force_current = max(progress.force_current, norm)
+            continue
+
+        if "TOTAL-FORCE" in line:
+            progress.force_rulers = 0
+            progress.force_current = 0.0
+        elif FINISHED_TEXT in line:
+            progress.finished = True
+
+
+def update(cwd: Path, progress: Progress) -> Progress:
+    """Parse what was appended to ``cwd``'s OSZICAR and OUTCAR since last time."""
+    parse_oszicar(read_new_lines(cwd / "OSZICAR", progress, "oszicar"), progress)
+    parse_outcar(read_new_lines(cwd / "OUTCAR", progress, "outcar", OUTCAR_WINDOW), progress)
+    return progress
+
+
+class Watcher:
+    """Progress of many task directories, persisted between refreshes."""
+
+    def __init__(self, work_dir: Path):
+        self.state_path = Path(work_dir) / STATE_NAME
+        self.progress: Dict[str, Progress] = {}
+        try:
+            data = json.loads(self.state_path.read_text())
+            self.progress = {d: Progress.from_dict(p) for d, p in data.items()}
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def refresh(self, dirs: Iterable[Path]) -> Dict[str, Progress]:
+        result = {}
+        for cwd in dirs:
+            key = str(cwd)
+            progress = self.progress.setdefault(key, Progress())
+            result[key] = update(cwd, progress)
+        return result
+
+    def save(self) -> None:
+        data = {d: asdict(p) for d, p in self.progress.items()}
+        tmp = self.state_path.with_name(f"{STATE_NAME}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.state_path)
+
+
+def task_dirs(work_dir: Path, jobdb_rows: Iterable[tuple]) -> List[Path]:
+    """Directories below ``work_dir`` with a qsub.pid or a tracked submission."""
+    work_dir = Path(work_dir).resolve()
+    dirs = {
+        p.parent
+        for pattern in ("*/qsub.pid", "*/*/qsub.pid")
+        for p in work_dir.glob(pattern)
+        # array staging directories have a qsub.pid but no jobscript.sh
+        if (p.parent / "jobscript.sh").is_file()
+    }
+    for row in jobdb_rows:
+        directory = Path(row[1])
+        if directory.is_relative_to(work_dir) and directory.is_dir():
+            dirs.add(directory)
+    return sorted(dirs)
+
+
+def job_state(cwd: Path, snapshot: Optional[Dict[str, str]]) -> str:
+    job_id = recorded_job_id(cwd)
+    if snapshot is None or not job_id:
+        return "?"
+    return snapshot.get(job_key(job_id), "-")
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def format_table(work_dir: Path, progress: Dict[str, Progress], snapshot: Optional[Dict[str, str]]) -> str:
+    names = {
+        key: str(Path(key).relative_to(work_dir)) if Path(key).is_relative_to(work_dir) else key
+        for key in progress
+    }
+    width = max([len("directory"), *map(len, names.values())])
+    header = f"{'directory':<{width}} {'state':<10} {'ionic':>5} {'scf':>4} {'F (eV)':>14} {'dE':>10} {'max |F|':>8}"
+    lines = [header, "-" * len(header)]
+    for key, p in progress.items():
+        state = "done" if p.finished else job_state(Path(key), snapshot)
+        lines.append(
+            f"{names[key]:<{width}} {state:<10} {p.ionic_steps:>5d} {p.scf_steps:>4d} "
+            f"{_fmt(p.energy, '.6f'):>14} {_fmt(p.delta_e, '.2e'):>10} {_fmt(p.max_force, '.4f'):>8}"
+        )
+    return "\n".join(lines)
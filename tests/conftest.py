@@ -0,0 +1,55 @@
+import itertools
+from typing import Dict
+
+import pytest
+
+from ink.vasp.cache import structure_cache
+from ink.vasp.kpath import kpath_cache
+from ink.vasp.scheduler import Scheduler
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path_factory, monkeypatch):
+    """Keep every ink cache and the job database out of the user's home."""
+    root = tmp_path_factory.mktemp("ink-cache")
+    monkeypatch.setenv("INK_KPATH_CACHE", str(root / "kpaths"))
+    monkeypatch.setenv("INK_CONFIG_CACHE", str(root / "config"))
+    monkeypatch.setenv("INK_POTCAR_INDEX", str(root / "potcar"))
+    monkeypatch.setenv("INK_JOBDB", str(root / "jobs.sqlite"))
+    monkeypatch.delenv("INK_STRUCTURE_CACHE", raising=False)
+    # Built at import time, and Job() may repoint them from the config
+    monkeypatch.setattr(kpath_cache, "cache_dir", root / "kpaths")
+    monkeypatch.setattr(structure_cache, "cache_dir", None)
+    return root
+
+
+class FakeScheduler(Scheduler):
+    """Scheduler answering queries from a fixed {job_key: state} table."""
+
+    name = "fake"
+    directive = "#PBS"
+
+    def __init__(self, states: Dict[str, str] = None):
+        super().__init__()
+        self.states = dict(states or {})
+        self.cancelled = []
+        self.submitted = []
+        self._ids = itertools.count(1)
+
+    def submit(self, script, cwd, array_size=None, depends_on=()):
+        self.submitted.append((cwd.name, array_size, list(depends_on)))
+        return f"{next(self._ids)}.server"
+
+    def cancel(self, job_ids):
+        self.cancelled += list(job_ids)
+
+    def query(self):
+        return dict(self.states)
+
+    def array_element(self, array_id, index):
+        return f"{array_id}_{index}"
+
+
+@pytest.fixture
+def scheduler():
+    return FakeScheduler()
@@ -0,0 +1,186 @@
+from pathlib import Path
+
+import pytest
+import typer
+
+import ink.vasp.batch as batch
+from ink.vasp.batch import collect_structures, run_batch
+from ink.vasp.jobs import Job
+from ink.vasp.manifest import NORMAL_TERMINATION, write_manifest
+
+from conftest import FakeScheduler
+from test_potcar import dataset
+
+DATA = Path(__file__).resolve().parents[1] / "data"
+POSCAR = (DATA / "POSCAR").read_text()
+
+
+def _job(tmp_path, monkeypatch, potcar="vaspkit -task 103"):
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    monkeypatch.setenv("INK_POTCAR_INDEX", str(tmp_path / "index"))
+    library = tmp_path / "potpaw_PBE"
+    for variant, zval, enmax in [("Li_sv", 3, 499.0), ("Sb", 5, 172.0), ("Te", 6, 175.0), ("O", 6, 400.0)]:
+        (library / variant).mkdir(parents=True)
+        (library / variant / "POTCAR").write_bytes(dataset(variant, zval, enmax))
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    job = Job(
+        {
+            "global": {
+                "work_dir": str(work_dir),
+                "jobdb": str(tmp_path / "jobs.db"),
+                "staging": {"store": str(tmp_path / "store")},
+                "potcar_dir": str(library),
+            },
+            "relax": {
+                "incar": {"ENCUT": 500},
+                "potcar": potcar,
+                "kpoints": 0.03,
+                "jobscript": "#!/bin/bash\n#PBS -N relax\nmpirun vasp_std\n",
+            },
+        }
+    )
+    job.scheduler = FakeScheduler()
+    return job
+
+
+def test_collect_from_directory(tmp_path):
+    (tmp_path / "POSCAR").write_text(POSCAR)
+    (tmp_path / "LiSbTe2.vasp").write_text(POSCAR)
+    (tmp_path / "mp-1").mkdir()
+    (tmp_path / "mp-1" / "POSCAR").write_text(POSCAR)
+    (tmp_path / "notes.txt").write_text("not a structure")
+    ids = [sid for sid, _ in collect_structures(str(tmp_path))]
+    assert ids == ["LiSbTe2", "POSCAR", "mp-1"]
+
+
+def test_collect_from_glob_and_file(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "POSCAR").write_text(POSCAR)
+    assert [sid for sid, _ in collect_structures(str(tmp_path / "*" / "POSCAR"))] == ["a", "b"]
+    assert list(collect_structures(str(tmp_path / "a" / "POSCAR"))) == [
+        ("POSCAR", (tmp_path / "a" / "POSCAR").resolve())
+    ]
+
+
+def test_clashing_ids_keep_the_file_name(tmp_path):
+    (tmp_path / "X.vasp").write_text(POSCAR)
+    (tmp_path / "X.cif").write_text("data_X\n")
+    (tmp_path / "a.vasp").write_text(POSCAR)
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "POSCAR").write_text(POSCAR)
+    (tmp_path / "Y.vasp").write_text(POSCAR)
+    ids = [sid for sid, _ in collect_structures(str(tmp_path))]
+    assert sorted(ids) == ["X.cif", "X.vasp", "Y", "a.vasp", "a_POSCAR"]
+
+
+def test_ids_that_still_clash_are_refused(tmp_path):
+    for path in ("x/a_b.vasp", "x/a_b.cif", "x_a_b.vasp/POSCAR"):
+        (tmp_path / path).parent.mkdir(exist_ok=True)
+        (tmp_path / path).write_text(POSCAR)
+    with pytest.raises(ValueError, match="same task directory: x_a_b.vasp"):
+        list(collect_structures(str(tmp_path / "*" / "*")))
+
+
+def test_run_batch_reports_failed_structures(tmp_path, monkeypatch, capsys):
+    job = _job(tmp_path, monkeypatch)
+    source = tmp_path / "structures"
+    source.mkdir()
+    (source / "good.vasp").write_text(POSCAR)
+    (source / "bad.vasp").write_text("not a structure\n")
+
+    task_dirs, errors = run_batch(job, str(source), "relax", "relax-batch", workers=2)
+
+    batch_dir = job.work_dir.resolve() / "relax-batch"
+    assert task_dirs == [batch_dir / "good"]
+    assert [sid for sid, _ in errors] == ["bad"]
+    assert (batch_dir / "good" / "KPOINTS").is_file()
+    assert "== bad\n" in (batch_dir / "errors.txt").read_text()
+    assert "bad FAILED" in capsys.readouterr().out
+
+
+def test_run_batch_writes_a_potcar_per_composition(tmp_path, monkeypatch):
+    job = _job(tmp_path, monkeypatch)
+    source = tmp_path / "structures"
+    source.mkdir()
+    (source / "LiSbTe2.vasp").write_text(POSCAR)
+    (source / "Li2O.vasp").write_text(
+        "Li2O\n1.0\n4.6 0 0\n0 4.6 0\n0 0 4.6\nLi O\n2 1\ndirect\n"
+        "0.25 0.25 0.25\n0.75 0.75 0.75\n0 0 0\n"
+    )
+
+    task_dirs, errors = run_batch(job, str(source), "relax", "relax-batch", workers=2)
+    assert errors == []
+    titels = {
+        d.name: [line.split()[3] for line in (d / "POTCAR").read_text().splitlines() if "TITEL" in line]
+        for d in task_dirs
+    }
+    assert titels == {"LiSbTe2": ["Li_sv", "Sb", "Te"], "Li2O": ["Li_sv", "O"]}
+
+
+def test_fixed_potcar_must_match_the_structure(tmp_path, monkeypatch):
+    potcar = tmp_path / "POTCAR.LiSbTe"
+    potcar.write_bytes(dataset("Li_sv", 3, 499.0) + dataset("Sb", 5, 172.0) + dataset("Te", 6, 175.0))
+    job = _job(tmp_path, monkeypatch, potcar=str(potcar))
+    source = tmp_path / "structures"
+    source.mkdir()
+    (source / "good.vasp").write_text(POSCAR)
+    (source / "other.vasp").write_text(POSCAR.replace("Li Sb Te", "Na Sb Te"))
+
+    task_dirs, errors = run_batch(job, str(source), "relax", "relax-batch", workers=1)
+    assert [d.name for d in task_dirs] == ["good"]
+    assert [sid for sid, _ in errors] == ["other"]
+    assert "POTCAR species Li Sb Te do not match POSCAR species Na Sb Te" in errors[0][1]
+
+
+def test_run_batch_rejects_unknown_stage(tmp_path, monkeypatch):
+    job = _job(tmp_path, monkeypatch)
+    with pytest.raises(ValueError, match="Stage 'md' not found"):
+        run_batch(job, str(tmp_path), "md", "md-batch", workers=1)
+
+
+def _batch(job, force=False, chunk_size=2):
+    job.batch(
+        "structures",
+        stage="relax",
+        name=None,
+        workers=1,
+        chunk_size=chunk_size,
+        submit=True,
+        yes=True,
+        force=force,
+    )
+
+
+def test_batch_submits_changed_tasks_in_chunks(tmp_path, monkeypatch):
+    job = _job(tmp_path, monkeypatch)
+    task_dirs = []
+    for i in range(5):
+        d = job.work_dir / f"task-{i}"
+        d.mkdir()
+        (d / "jobscript.sh").write_text("mpirun vasp_std\n")
+        task_dirs.append(d)
+    monkeypatch.setattr(batch, "run_batch", lambda *args: (list(task_dirs), []))
+    chunks = []
+    monkeypatch.setattr(job, "submit_array", chunks.append)
+
+    # task-1 already finished with these inputs
+    (task_dirs[1] / "qsub.pid").write_text("7.server")
+    write_manifest(task_dirs[1], "7.server")
+    (task_dirs[1] / "OUTCAR").write_bytes(NORMAL_TERMINATION)
+
+    _batch(job)
+    assert chunks == [task_dirs[0:3:2], task_dirs[3:5]]
+
+    chunks.clear()
+    _batch(job, force=True)
+    assert chunks == [task_dirs[0:2], task_dirs[2:4], task_dirs[4:5]]
+
+
+def test_batch_exits_on_bad_source(tmp_path, monkeypatch, capsys):
+    job = _job(tmp_path, monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(typer.Exit):
+        _batch(job)
+    assert "No structures found in 'structures'" in capsys.readouterr().out
@@ -0,0 +1,93 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from pymatgen.core.structure import Structure
+
+from ink.vasp.cache import StructureCache
+
+POSCAR = Path(__file__).resolve().parents[1] / "data" / "POSCAR"
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Paths passed to ``Structure.from_file``."""
+    calls = []
+    from_file = Structure.from_file
+
+    def counting(path, *args, **kwargs):
+        calls.append(Path(path))
+        return from_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(Structure, "from_file", counting)
+    return calls
+
+
+def test_unchanged_file_is_parsed_once(tmp_path, parses):
+    poscar = shutil.copy(POSCAR, tmp_path / "POSCAR")
+    cache = StructureCache()
+    first = cache.get(poscar)
+    assert cache.get(poscar) is first
+    assert len(parses) == 1
+
+
+def test_identical_copies_share_one_parse(tmp_path, parses):
+    cache = StructureCache()
+    a = shutil.copy(POSCAR, tmp_path / "a.vasp")
+    b = shutil.copy(POSCAR, tmp_path / "b.vasp")
+    assert cache.get(a) is cache.get(b)
+    assert len(parses) == 1
+
+
+def test_file_rewritten_in_place_is_read_again(tmp_path, parses):
+    poscar = tmp_path / "POSCAR"
+    shutil.copy(POSCAR, poscar)
+    cache = StructureCache()
+    before = cache.get(poscar)
+    inode = poscar.stat().st_ino
+
+    scaled = before.copy()
+    scaled.scale_lattice(before.volume * 1.1)
+    with poscar.open("w") as f:
+        f.write(scaled.to(fmt="poscar"))
+    st = poscar.stat()
+    os.utime(poscar, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert poscar.stat().st_ino == inode
+
+    after = cache.get(poscar)
+    assert len(parses) == 2
+    assert after.volume == pytest.approx(before.volume * 1.1)
+
+
+def test_pickles_are_reused_and_corrupt_ones_ignored(tmp_path, parses):
+    poscar = shutil.copy(POSCAR, tmp_path / "POSCAR")
+    StructureCache(tmp_path / "cache").get(poscar)
+    assert StructureCache(tmp_path / "cache").get(poscar) is not None
+    assert len(parses) == 1
+
+    for pickled in (tmp_path / "cache").glob("*.pickle"):
+        pickled.write_bytes(b"not a pickle")
+    assert len(StructureCache(tmp_path / "cache").get(poscar)) > 0
+    assert len(parses) == 2
+
+
+def test_unwritable_cache_dir_does_not_fail_the_parse(tmp_path, parses):
+    poscar = shutil.copy(POSCAR, tmp_path / "POSCAR")
+    not_a_dir = tmp_path / "cache"
+    not_a_dir.write_text("a file where the cache directory should be")
+    assert len(StructureCache(not_a_dir).get(poscar)) == 4
+    assert len(parses) == 1
+
+
+def test_full_cache_dir_leaves_no_tmp_file(tmp_path, parses, monkeypatch):
+    poscar = shutil.copy(POSCAR, tmp_path / "POSCAR")
+
+    def disk_full(obj, f, protocol=None):
+        f.write(b"partial")
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("ink.vasp.cache.pickle.dump", disk_full)
+    cache = StructureCache(tmp_path / "cache")
+    assert len(cache.get(poscar)) == 4
+    assert list((tmp_path / "cache").iterdir()) == []
@@ -0,0 +1,152 @@
+import itertools
+import json
+from pathlib import Path
+
+from ink.vasp.chain import CHAIN_NAME, STAGE_IN_CALL, insert_stage_in, run_chain, upstream_pulls
+from ink.vasp.manifest import NORMAL_TERMINATION, write_manifest
+
+from conftest import FakeScheduler
+
+JOBSCRIPT = "#!/bin/bash\n#PBS -N vasp\n\ncd $PBS_O_WORKDIR\nmpirun vasp_std\n"
+
+
+class ChainJob:
+    """The parts of ``Job`` that ``run_chain`` uses, writing placeholder inputs."""
+
+    def __init__(self, work_dir: Path, config: dict):
+        self.work_dir = work_dir
+        self.config = {"global": {}, **config}
+        self.scheduler = FakeScheduler()
+        self.submitted = []
+        self._ids = itertools.count(1)
+
+    def _resolve_path(self, value, stage, key):
+        return self.config[stage].get(key)
+
+    def _handle_cp(self, stage, cwd):
+        raise AssertionError("chain stages in these tests copy nothing locally")
+
+    def _write_poscar(self, poscar, cwd):
+        (cwd / "POSCAR").write_text(Path(poscar).read_text() if Path(poscar).is_file() else "placeholder")
+
+    def _write_incar(self, incar, cwd):
+        (cwd / "INCAR").write_text(f"{incar}\n")
+
+    def _write_potcar(self, potcar, cwd):
+        (cwd / "POTCAR").write_text("POTCAR\n")
+
+    def _write_kpoints(self, kpoints, cwd, poscar=None):
+        (cwd / "KPOINTS").write_text(f"{kpoints}\n")
+
+    def _write_jobscript(self, text, cwd):
+        (cwd / "jobscript.sh").write_text(text)
+
+    def submit(self, cwd, depends_on=()):
+        job_id = f"{next(self._ids)}.server"
+        self.submitted.append((cwd.name, list(depends_on)))
+        (cwd / "qsub.pid").write_text(job_id)
+        write_manifest(cwd, job_id)
+        return job_id
+
+
+def _job(tmp_path):
+    (tmp_path / "POSCAR.in").write_text("input structure")
+    config = {
+        "relax": {"poscar": str(tmp_path / "POSCAR.in"), "kpoints": 0.03, "jobscript": JOBSCRIPT},
+        "static": {"poscar": "relax/CONTCAR", "kpoints": 0.03, "jobscript": JOBSCRIPT},
+        "dos": {"poscar": "relax/CONTCAR", "kpoints": "KPOINTS.dos", "jobscript": "#!/bin/bash\nmpirun vasp_std\n"},
+    }
+    return ChainJob(tmp_path, config)
+
+
+def test_insert_stage_in_after_cd():
+    lines = insert_stage_in(JOBSCRIPT).splitlines(keepends=True)
+    assert lines[lines.index("cd $PBS_O_WORKDIR\n") + 1] == STAGE_IN_CALL
+    slurm = insert_stage_in("#!/bin/bash\n#SBATCH -n 4\n  cd ${SLURM_SUBMIT_DIR}\nsrun vasp\n")
+    assert slurm.splitlines()[3] == STAGE_IN_CALL.strip()
+
+
+def test_insert_stage_in_without_cd_goes_before_first_command():
+    assert insert_stage_in("#!/bin/bash\n#PBS -N x\n\nmpirun vasp\n") == (
+        "#!/bin/bash\n#PBS -N x\n\n" + STAGE_IN_CALL + "mpirun vasp\n"
+    )
+
+
+def test_upstream_pulls(tmp_path):
+    job = _job(tmp_path)
+    job.config["static"]["cp"] = {"relax/WAVECAR": "WAVECAR", "elsewhere/CHGCAR": "CHGCAR"}
+    assert upstream_pulls(job, "static", ["relax"]) == {"POSCAR": "relax/CONTCAR", "WAVECAR": "relax/WAVECAR"}
+    assert upstream_pulls(job, "dos", ["relax", "static"]) == {"POSCAR": "relax/CONTCAR", "CHGCAR": "static/CHGCAR"}
+    assert upstream_pulls(job, "dos", []) == {}
+
+
+def test_chain_writes_stage_in_and_dependencies(tmp_path):
+    job = _job(tmp_path)
+    job_ids = run_chain(job, ["relax", "static", "dos"], yes=True, force=False)
+    assert job_ids == {"relax": "1.server", "static": "2.server", "dos": "3.server"}
+    assert job.submitted == [("relax", []), ("static", ["1.server"]), ("dos", ["1.server", "2.server"])]
+
+    assert not (tmp_path / "relax" / "stagein.sh").exists()
+    assert STAGE_IN_CALL in (tmp_path / "static" / "jobscript.sh").read_text()
+    assert 'relax/CONTCAR" "POSCAR"' in (tmp_path / "static" / "stagein.sh").read_text()
+
+    # Only a KPR mesh (or band path) depends on the pulled structure
+    settings = json.loads((tmp_path / "static" / CHAIN_NAME).read_text())
+    assert settings["kpoints"] == 0.03
+    assert "ink.vasp.chain" in (tmp_path / "static" / "stagein.sh").read_text()
+    assert not (tmp_path / "dos" / CHAIN_NAME).exists()
+    assert "ink.vasp.chain" not in (tmp_path / "dos" / "stagein.sh").read_text()
+
+
+def test_unchanged_upstream_is_waited_for_through_qsub_pid(tmp_path):
+    job = _job(tmp_path)
+    run_chain(job, ["relax", "static", "dos"], yes=True, force=False)
+
+    # relax and static still run; dos died without OUTCAR
+    job.scheduler = FakeScheduler({"1": "running", "2": "queued"})
+    job.submitted.clear()
+    assert run_chain(job, ["relax", "static", "dos"], yes=True, force=False) == {"dos": "4.server"}
+    assert job.submitted == [("dos", ["1.server", "2.server"])]
+
+    # relax finished meanwhile: only the listed static job is waited for
+    (tmp_path / "relax" / "OUTCAR").write_bytes(NORMAL_TERMINATION)
+    job.scheduler = FakeScheduler({"2": "running"})
+    job.submitted.clear()
+    assert run_chain(job, ["relax", "static", "dos"], yes=True, force=False) == {"dos": "5.server"}
+    assert job.submitted == [("dos", ["2.server"])]
+
+
+def test_rerun_after_finished_chain_submits_nothing(tmp_path, monkeypatch):
+    from ink.vasp.jobs import Job
+
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    data = Path(__file__).resolve().parents[1] / "data"
+    stage = {"incar": {"ENCUT": 500}, "potcar": str(data / "POTCAR"), "jobscript": JOBSCRIPT}
+    config = {
+        "global": {
+            "work_dir": str(tmp_path),
+            "jobdb": str(tmp_path / "jobs.db"),
+            "staging": {"store": str(tmp_path / "store")},
+        },
+        "relax": {**stage, "poscar": str(data / "POSCAR"), "kpoints": 0.03},
+        "static": {**stage, "poscar": "relax/CONTCAR", "kpoints": 0.03},
+        "dos": {**stage, "poscar": "relax/CONTCAR", "kpoints": 0.02},
+        "band": {**stage, "poscar": "relax/CONTCAR", "kpoints": "line"},
+    }
+    job = Job(config)
+    job.scheduler = FakeScheduler()
+    stages = ["relax", "static", "dos", "band"]
+    assert list(run_chain(job, stages, yes=True, force=False)) == stages
+
+    # The chain ran: relax moved the atoms, every stage finished
+    lines = (data / "POSCAR").read_text().splitlines()
+    lines[2] = "   2.2000000000000000    1.2526680520541464    7.0605008118513890"
+    (tmp_path / "relax" / "CONTCAR").write_text("\n".join(lines) + "\n")
+    for name in stages:
+        (tmp_path / name / "OUTCAR").write_bytes(NORMAL_TERMINATION)
+
+    job.scheduler = FakeScheduler()
+    assert run_chain(job, stages, yes=True, force=False) == {}
+    assert job.scheduler.submitted == []
+    # The relaxed structure was written, yet the manifests still match
+    assert (tmp_path / "static" / "POSCAR").read_text() != (tmp_path / "relax" / "POSCAR").read_text()
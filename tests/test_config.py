@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from ruamel.yaml import YAML
+
+from ink.vasp.config import ConfigLoader
+
+CONFIG = """\
+global:
+  work_dir: runs  # where jobs go
+relax:
+  ENCUT: 520
+"""
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Streams passed to ``YAML.load``."""
+    calls = []
+    load = YAML.load
+
+    def counting(self, stream):
+        calls.append(stream)
+        return load(self, stream)
+
+    monkeypatch.setattr(YAML, "load", counting)
+    return calls
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("INK_CONFIG_CACHE", str(tmp_path / "cache"))
+    path = tmp_path / "vasp_config.yaml"
+    path.write_text(CONFIG)
+    return path
+
+
+def test_cached_config_is_not_parsed_again(config_file, parses):
+    first = ConfigLoader([config_file]).load()
+    loader = ConfigLoader([config_file])
+    assert loader.load() == first
+    assert "# where jobs go" in loader.text
+    assert len(parses) == 1
+
+
+def test_touched_file_with_same_content_stays_cached(config_file, parses):
+    ConfigLoader([config_file]).load()
+    st = config_file.stat()
+    os.utime(config_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    ConfigLoader([config_file]).load()
+    assert len(parses) == 1
+
+
+def test_edited_yaml_invalidates_cache(config_file, parses):
+    ConfigLoader([config_file]).load()
+    st = config_file.stat()
+    # Same size and mtime as before: only the content hash can tell
+    config_file.write_text(CONFIG.replace("520", "600"))
+    os.utime(config_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert ConfigLoader([config_file]).load()["relax"]["ENCUT"] == 600
+    assert len(parses) == 2
+
+
+def test_later_file_overrides_top_level_keys(tmp_path, config_file):
+    local = tmp_path / "local" / "vasp_config.yaml"
+    local.parent.mkdir()
+    local.write_text("relax:\n  ENCUT: 400\n")
+    config = ConfigLoader([config_file, local]).load()
+    assert config["relax"] == {"ENCUT": 400}
+    assert config["global"]["work_dir"] == "runs"
+
+
+def test_corrupt_cache_falls_back_to_yaml(config_file, parses):
+    loader = ConfigLoader([config_file])
+    expected = loader.load()
+    loader.cache_file.write_bytes(b"not a pickle")
+
+    again = ConfigLoader([config_file])
+    assert again.load() == expected
+    assert again.text == loader.text
+    assert len(parses) == 2
+    # The broken entry was replaced by a good one
+    ConfigLoader([config_file]).load()
+    assert len(parses) == 2
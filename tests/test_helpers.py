@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ink.vasp.helpers import HelperError, HelperPool
+
+
+@pytest.fixture
+def pool():
+    echoed = []
+    pool = HelperPool(limit=2, echo=echoed.append)
+    pool.echoed = echoed
+    yield pool
+    pool.close()
+
+
+def test_commands_run_on_one_event_loop_thread(pool, tmp_path):
+    assert pool.run("relax", tmp_path, "pwd").strip() == str(tmp_path)
+    loop = pool._loop
+    helpers = [t for t in threading.enumerate() if t.name == "ink-helpers"]
+    assert helpers and all(t.daemon for t in helpers)
+
+    pool.run("static", tmp_path, "true")
+    assert pool._loop is loop
+
+
+def test_at_most_limit_commands_run_at_once(pool, tmp_path):
+    running = tmp_path / "running"
+    running.mkdir()
+    cmd = 'ls running | wc -l >> counts; touch running/{0}; sleep 0.2; rm running/{0}'
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda i: pool.run(f"t{i}", tmp_path, cmd.format(i)), range(6)))
+    elapsed = time.perf_counter() - start
+
+    counts = [int(n) for n in (tmp_path / "counts").read_text().split()]
+    assert len(counts) == 6
+    assert max(counts) <= pool.limit - 1
+    # Six 0.2 s commands, two at a time
+    assert elapsed >= 0.6
+
+
+def test_limit_is_fixed_once_the_loop_runs(pool, tmp_path):
+    pool.set_limit(4)
+    assert pool.limit == 4
+    pool.run("relax", tmp_path, "true")
+    pool.set_limit(1)
+    assert pool.limit == 4
+
+
+def test_output_is_one_block_prefixed_with_the_task(pool, tmp_path):
+    assert pool.run("relax", tmp_path, "echo one; echo two 1>&2") == "one\ntwo\n"
+    assert pool.echoed == ["[task relax] one\n[task relax] two"]
+    pool.run("static", tmp_path, "true")
+    assert len(pool.echoed) == 1
+
+
+def test_failing_command_raises_helper_error(pool, tmp_path):
+    with pytest.raises(HelperError) as excinfo:
+        pool.run("band", tmp_path, "echo reading POSCAR; echo no POSCAR found; exit 3")
+    error = excinfo.value
+    assert error.task_name == "band"
+    assert error.returncode == 3
+    assert str(error) == "'echo reading POSCAR; echo no POSCAR found; exit 3' exited with status 3: no POSCAR found"
+    # The output was still shown with the task prefix
+    assert pool.echoed == ["[task band] reading POSCAR\n[task band] no POSCAR found"]
+
+    # The pool keeps working after a failure
+    assert pool.run("band", tmp_path, "echo ok") == "ok\n"
+
+
+def test_silent_failure_has_no_detail(pool, tmp_path):
+    with pytest.raises(HelperError, match=r"^'exit 1' exited with status 1$"):
+        pool.run("dos", tmp_path, "exit 1")
+    assert pool.echoed == []
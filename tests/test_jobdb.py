@@ -0,0 +1,56 @@
+from ink.vasp.jobdb import MISSING_SNAPSHOTS, JobDB
+from ink.vasp.manifest import NORMAL_TERMINATION
+
+
+def _db(tmp_path):
+    (tmp_path / "relax").mkdir()
+    db = JobDB(tmp_path / "jobs.sqlite")
+    db.record_submission("relax", tmp_path / "relax", "11.server", "hash")
+    return db
+
+
+def _states(db):
+    return [(job_id, state) for _, _, job_id, state, _ in db.jobs()]
+
+
+def test_listed_job_takes_scheduler_state(tmp_path):
+    db = _db(tmp_path)
+    assert db.refresh({"11": "running"}) == 1
+    assert _states(db) == [("11.server", "running")]
+
+
+def test_one_missed_snapshot_keeps_job_active(tmp_path):
+    db = _db(tmp_path)
+    db.refresh({"11": "running"})
+    assert db.refresh({}) == 0
+    assert _states(db) == [("11.server", "running")]
+    # Listed again: the missed counter starts over
+    db.refresh({"11": "running"})
+    for _ in range(MISSING_SNAPSHOTS - 1):
+        db.refresh({})
+    assert _states(db) == [("11.server", "running")]
+
+
+def test_repeatedly_missing_job_is_finalized(tmp_path):
+    db = _db(tmp_path)
+    (tmp_path / "relax" / "OUTCAR").write_bytes(b"...\n" + NORMAL_TERMINATION + b"\n")
+    for _ in range(MISSING_SNAPSHOTS):
+        db.refresh({})
+    assert _states(db) == [("11.server", "completed")]
+
+
+def test_missing_job_without_outcar_failed(tmp_path):
+    db = _db(tmp_path)
+    for _ in range(MISSING_SNAPSHOTS):
+        db.refresh({})
+    assert db.counts() == {"failed": 1}
+    # Terminal rows are no longer polled
+    assert db.refresh({"11": "running"}) == 0
+
+
+def test_new_submission_supersedes_the_old_row(tmp_path):
+    db = _db(tmp_path)
+    db.record_submissions([("relax", tmp_path / "relax", "12.server", "hash2")])
+    assert _states(db) == [("11.server", "cancelled"), ("12.server", "submitted")]
+    db.refresh({"12": "queued"})
+    assert _states(db) == [("11.server", "cancelled"), ("12.server", "queued")]
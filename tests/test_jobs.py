@@ -0,0 +1,99 @@
+import json
+import subprocess
+
+from ink.vasp.jobs import Job
+from ink.vasp.manifest import MANIFEST_NAME
+from ink.vasp.scheduler import PBSScheduler
+
+from conftest import FakeScheduler
+
+JOBSCRIPT = "#!/bin/bash\n#PBS -N relax\n#PBS -l nodes=1:ppn=48\n\ncd $PBS_O_WORKDIR\nmpirun vasp_std\n"
+
+
+def _job(tmp_path, monkeypatch, scheduler):
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    job = Job({"global": {"work_dir": str(tmp_path), "jobdb": str(tmp_path / "jobs.db")}})
+    job.scheduler = scheduler
+    return job
+
+
+def _tasks(tmp_path, n):
+    dirs = []
+    for i in range(n):
+        d = tmp_path / f"task-{i}"
+        d.mkdir()
+        (d / "jobscript.sh").write_text(JOBSCRIPT)
+        (d / "POSCAR").write_text(f"structure {i}\n")
+        dirs.append(d)
+    return dirs
+
+
+def _stage_dir(tmp_path):
+    (stage_dir,) = (tmp_path / "arrays").iterdir()
+    return stage_dir
+
+
+def test_submit_array_writes_script_and_per_task_ids(tmp_path, monkeypatch):
+    scheduler = FakeScheduler()
+    job = _job(tmp_path, monkeypatch, scheduler)
+    dirs = _tasks(tmp_path, 3)
+
+    assert job.submit_array(dirs) == "1.server"
+
+    stage_dir = _stage_dir(tmp_path)
+    assert scheduler.submitted == [(stage_dir.name, 3, [])]
+    assert (stage_dir / "dirs.txt").read_text() == "".join(f"{d}\n" for d in dirs)
+    script = (stage_dir / "array.sh").read_text().splitlines()
+    assert script[:3] == ["#!/bin/bash", "#PBS -N relax", "#PBS -l nodes=1:ppn=48"]
+    assert "mpirun vasp_std" not in script
+    assert script[-1] == "bash jobscript.sh"
+    assert (stage_dir / "qsub.pid").read_text() == "1.server"
+
+    for i, d in enumerate(dirs):
+        assert (d / "qsub.pid").read_text() == f"1.server_{i}"
+        manifest = json.loads((d / MANIFEST_NAME).read_text())
+        assert manifest["job_id"] == f"1.server_{i}"
+        assert manifest["inputs"]["POSCAR"] is not None
+
+
+def test_submit_array_cancels_old_jobs_in_one_call(tmp_path, monkeypatch):
+    scheduler = FakeScheduler()
+    job = _job(tmp_path, monkeypatch, scheduler)
+    dirs = _tasks(tmp_path, 3)
+    (dirs[0] / "qsub.pid").write_text("7.server")
+    (dirs[2] / "qsub.pid").write_text("8.server")
+
+    cancel_calls = []
+    monkeypatch.setattr(scheduler, "cancel", lambda ids: cancel_calls.append(list(ids)))
+    job.submit_array(dirs)
+    assert cancel_calls == [["7.server", "8.server"]]
+
+
+def test_submit_array_slurm_header(tmp_path, monkeypatch):
+    scheduler = FakeScheduler()
+    scheduler.directive = "#SBATCH"
+    job = _job(tmp_path, monkeypatch, scheduler)
+    (d,) = _tasks(tmp_path, 1)
+    (d / "jobscript.sh").write_text("#!/bin/bash\n#SBATCH -N 1\n#PBS -N ignored\nsrun vasp_std\n")
+
+    job.submit_array([d])
+    script = (_stage_dir(tmp_path) / "array.sh").read_text().splitlines()
+    assert script[:2] == ["#!/bin/bash", "#SBATCH -N 1"]
+    assert "#PBS -N ignored" not in script
+
+
+def test_single_element_pbs_array_is_a_plain_job(tmp_path, monkeypatch):
+    calls = []
+
+    def qsub(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout="55.pbs01\n")
+
+    monkeypatch.setattr(subprocess, "run", qsub)
+    job = _job(tmp_path, monkeypatch, PBSScheduler())
+    (d,) = _tasks(tmp_path, 1)
+
+    assert job.submit_array([d]) == "55.pbs01"
+    assert calls == [["qsub", str(_stage_dir(tmp_path) / "array.sh")]]
+    # No "[]" in the id: the element is the job itself
+    assert (d / "qsub.pid").read_text() == "55.pbs01"
@@ -0,0 +1,54 @@
+import math
+
+import pytest
+import spglib
+from pymatgen.core import Lattice, Structure
+
+from ink.vasp.kmesh import _cell, _keeps_symmetry, count_irreducible, irreducible_mesh, kpr_mesh
+
+
+def _rotations(structure):
+    return spglib.get_symmetry(_cell(structure))["rotations"]
+
+
+@pytest.fixture
+def cubic():
+    # CsCl-type, Pm-3m
+    return Structure(Lattice.cubic(4.1), ["Cs", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+
+
+@pytest.fixture
+def hexagonal():
+    # hcp Mg, P6_3/mmc
+    return Structure(Lattice.hexagonal(3.21, 5.21), ["Mg", "Mg"], [[1 / 3, 2 / 3, 0.25], [2 / 3, 1 / 3, 0.75]])
+
+
+def test_kpr_mesh_floor_formula():
+    bnorm = (2 * math.pi / 4.0, 2 * math.pi / 6.0, 2 * math.pi / 40.0)
+    # 1 / (4 * 0.03) = 8.3, 1 / (6 * 0.03) = 5.6, 1 / (40 * 0.03) = 0.8 -> at least 1
+    assert kpr_mesh(bnorm, 0.03) == (8, 5, 1)
+
+
+def test_count_irreducible_simple_cubic(cubic):
+    assert count_irreducible(_cell(cubic), (4, 4, 4)) == 10
+    assert count_irreducible(_cell(cubic), (1, 1, 1)) == 1
+
+
+def test_keeps_symmetry(hexagonal):
+    rotations = _rotations(hexagonal)
+    assert _keeps_symmetry((6, 6, 4), rotations)
+    # The six-fold axis mixes a* and b*, which need the same division
+    assert not _keeps_symmetry((6, 7, 4), rotations)
+
+
+@pytest.mark.parametrize("name", ["cubic", "hexagonal"])
+@pytest.mark.parametrize("kpr", [0.02, 0.03, 0.05])
+def test_irreducible_mesh_keeps_symmetry_and_saves_points(request, name, kpr):
+    structure = request.getfixturevalue(name)
+    choice = irreducible_mesh(structure, kpr)
+    assert choice.base_mesh == kpr_mesh(structure.lattice.reciprocal_lattice.abc, kpr)
+    assert _keeps_symmetry(choice.mesh, _rotations(structure))
+    assert all(n >= base for n, base in zip(choice.mesh, choice.base_mesh))
+    assert choice.irreducible == count_irreducible(_cell(structure), choice.mesh)
+    assert choice.irreducible <= choice.base_irreducible
+    assert choice.base_irreducible == count_irreducible(_cell(structure), choice.base_mesh)
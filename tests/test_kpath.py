@@ -0,0 +1,70 @@
+import pytest
+from pymatgen.core import Lattice, Structure
+from pymatgen.core.operations import SymmOp
+from pymatgen.symmetry import kpath as pmg_kpath
+
+from ink.vasp.kpath import KPathCache, fingerprint
+
+
+@pytest.fixture
+def structure():
+    # Rock salt NaCl, conventional cell
+    return Structure.from_spacegroup("Fm-3m", Lattice.cubic(5.64), ["Na", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+
+
+@pytest.fixture
+def seek_calls(monkeypatch):
+    calls = []
+    seek = pmg_kpath.KPathSeek
+
+    class CountingSeek(seek):
+        def __init__(self, *args, **kwargs):
+            calls.append(args[0])
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(pmg_kpath, "KPathSeek", CountingSeek)
+    return calls
+
+
+def _rotated(structure):
+    rotated = structure.copy()
+    rotated.apply_operation(SymmOp.from_axis_angle_and_translation([1, 2, 3], 37.0))
+    return rotated
+
+
+def _translated(structure):
+    translated = structure.copy()
+    translated.translate_sites(list(range(len(translated))), [0.13, 0.27, 0.41])
+    return translated
+
+
+def test_rotated_and_translated_copies_share_the_fingerprint(structure):
+    key = fingerprint(structure, 30, 1e-5)
+    assert fingerprint(_rotated(structure), 30, 1e-5) == key
+    assert fingerprint(_translated(structure), 30, 1e-5) == key
+
+
+def test_path_parameters_change_the_fingerprint(structure):
+    key = fingerprint(structure, 30, 1e-5)
+    assert fingerprint(structure, 40, 1e-5) != key
+    assert fingerprint(structure, 30, 1e-3) != key
+
+
+def test_cache_hits_for_rotated_and_translated_copies(tmp_path, structure, seek_calls):
+    cache = KPathCache(tmp_path)
+    kpts, labels = cache.get(structure)
+    assert cache.get(_rotated(structure)) == (kpts, labels)
+    assert cache.get(_translated(structure)) == (kpts, labels)
+    assert len(seek_calls) == 1
+    # A new process reads the path from disk
+    assert KPathCache(tmp_path).get(_rotated(structure)) == (kpts, labels)
+    assert len(seek_calls) == 1
+
+
+def test_cache_misses_for_other_parameters(tmp_path, structure, seek_calls):
+    cache = KPathCache(tmp_path)
+    cache.get(structure, line_density=30)
+    cache.get(structure, line_density=20)
+    cache.get(structure, line_density=30, symprec=1e-3)
+    assert len(seek_calls) == 3
+    assert len(list(tmp_path.glob("*.json"))) == 3
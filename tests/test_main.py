@@ -0,0 +1,114 @@
+from pathlib import Path
+
+import pytest
+import yaml
+from typer.testing import CliRunner
+
+from ink.vasp import main
+
+
+def test_topological_order_keeps_task_order_without_deps():
+    assert main._topological_order(["b", "a", "c"], {}) == ["b", "a", "c"]
+
+
+def test_topological_order_puts_dependencies_first():
+    deps = {"relax": [], "band": ["static"], "static": ["relax"], "dos": ["static"]}
+    order = main._topological_order(["band", "dos", "static", "relax"], deps)
+    assert order == ["relax", "static", "band", "dos"]
+
+
+def test_topological_order_uses_key_among_ready_tasks():
+    deps = {"a": [], "b": [], "c": ["a"]}
+    costs = {"a": 1, "b": 5, "c": 10}
+    assert main._topological_order(["a", "b", "c"], deps, key=lambda n: -costs[n]) == ["b", "a", "c"]
+
+
+def test_topological_order_rejects_cycles():
+    with pytest.raises(ValueError, match="Cyclic depends_on between tasks: a, b"):
+        main._topological_order(["a", "b", "c"], {"a": ["b"], "b": ["a"], "c": []})
+
+
+def test_task_dependencies():
+    config = {
+        "relax": {},
+        "static": {"depends_on": "relax"},
+        "band": {"depends_on": ["static", "relax"]},
+    }
+    assert main._task_dependencies(["static", "band"], config) == {"static": [], "band": ["static"]}
+    with pytest.raises(ValueError, match="unknown task 'scf'"):
+        main._task_dependencies(["static"], {"static": {"depends_on": "scf"}})
+
+
+DEPS = {"t1": [], "t2": [], "t3": ["t2"], "t4": ["t3"], "t5": []}
+
+
+@pytest.fixture
+def fake_prepare(monkeypatch):
+    prepared = []
+
+    def prepare(task_name, config, work_dir, vaspkit_cmd):
+        if task_name == "t2":
+            raise RuntimeError("POSCAR not found")
+        prepared.append(task_name)
+        return work_dir / task_name / "jobscript.sh"
+
+    monkeypatch.setattr(main, "_prepare_task", prepare)
+    return prepared
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_failed_task_skips_dependents(tmp_path, fake_prepare, workers):
+    failed = []
+    results = list(main._prepare_tasks(list(DEPS), DEPS, {}, tmp_path, "vaspkit", workers, failed))
+    assert [name for name, _ in results] == ["t1", "t5"]
+    assert failed == ["t2", "t3", "t4"]
+    assert sorted(fake_prepare) == ["t1", "t5"]
+
+
+def test_serial_and_parallel_report_the_same(tmp_path, fake_prepare, capsys):
+    runs = []
+    for workers in (1, 4):
+        failed = []
+        results = list(main._prepare_tasks(list(DEPS), DEPS, {}, tmp_path, "vaspkit", workers, failed))
+        runs.append((results, failed, capsys.readouterr().out))
+    assert runs[0] == runs[1]
+    assert "Failed tasks: t2, t3, t4" in runs[0][2]
+    assert "[task t3] skipped: depends on failed task t2" in runs[0][2]
+
+
+def test_main_exits_non_zero_when_a_task_fails(tmp_path, monkeypatch):
+    monkeypatch.setenv("INK_JOBDB", str(tmp_path / "jobs.sqlite"))
+    config = {
+        "global": {"work_dir": str(tmp_path / "work"), "scheduler": "local"},
+        "relax": {"poscar": str(tmp_path / "missing" / "POSCAR"), "jobscript": "true\n"},
+    }
+    config_path = tmp_path / "vasp_config.yaml"
+    config_path.write_text(yaml.safe_dump(config))
+    monkeypatch.chdir(tmp_path)
+
+    result = CliRunner().invoke(main.app, ["-c", str(config_path), "-y"])
+    assert result.exit_code == 1
+    assert "Failed tasks: relax" in result.output
+    assert not Path(tmp_path / "work" / "relax" / "qsub.pid").exists()
+
+
+@pytest.mark.parametrize(
+    "depends_on, message",
+    [
+        ({"relax": "scf"}, "Task 'relax' depends on unknown task 'scf'."),
+        ({"relax": "static", "static": "relax"}, "Cyclic depends_on between tasks: relax, static"),
+    ],
+)
+def test_main_reports_bad_depends_on(tmp_path, monkeypatch, depends_on, message):
+    config = {"global": {"work_dir": str(tmp_path / "work"), "scheduler": "local"}}
+    for name in ("relax", "static"):
+        config[name] = {"jobscript": "true\n", "depends_on": depends_on.get(name)}
+    config_path = tmp_path / "vasp_config.yaml"
+    config_path.write_text(yaml.safe_dump(config))
+    monkeypatch.chdir(tmp_path)
+
+    result = CliRunner().invoke(main.app, ["-c", str(config_path), "-y"])
+    assert result.exit_code == 1
+    assert message in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
+    assert not (tmp_path / "work" / "relax").exists()
@@ -0,0 +1,91 @@
+from ink.vasp.manifest import NORMAL_TERMINATION, needs_submission, recorded_job_id, write_manifest
+from ink.vasp.pack import write_status
+
+
+def _task(tmp_path):
+    for name in ("POSCAR", "INCAR", "KPOINTS", "POTCAR", "jobscript.sh"):
+        (tmp_path / name).write_text(f"{name}\n")
+    return tmp_path
+
+
+def _submitted(cwd, job_id="7.server"):
+    (cwd / "qsub.pid").write_text(job_id)
+    write_manifest(cwd, job_id)
+
+
+def test_never_submitted(tmp_path, scheduler):
+    assert needs_submission(_task(tmp_path), scheduler) == "no previous submission recorded"
+
+
+def test_running_job_is_skipped(tmp_path, scheduler):
+    cwd = _task(tmp_path)
+    _submitted(cwd)
+    scheduler.states = {"7": "running"}
+    assert needs_submission(cwd, scheduler) is None
+
+
+def test_finished_job_is_skipped(tmp_path, scheduler):
+    cwd = _task(tmp_path)
+    _submitted(cwd)
+    (cwd / "OUTCAR").write_bytes(b"...\n" + NORMAL_TERMINATION + b"\n")
+    assert needs_submission(cwd, scheduler) is None
+
+
+def test_changed_input_resubmits(tmp_path, scheduler):
+    cwd = _task(tmp_path)
+    _submitted(cwd)
+    scheduler.states = {"7": "running"}
+    (cwd / "INCAR").write_text("ENCUT = 600\n")
+    assert needs_submission(cwd, scheduler) == "inputs changed: INCAR"
+
+
+def test_failed_job_resubmits(tmp_path, scheduler):
+    cwd = _task(tmp_path)
+    _submitted(cwd)
+    (cwd / "OUTCAR").write_text("cut off\n")
+    assert needs_submission(cwd, scheduler) == "previous job 7.server failed"
+
+
+def test_job_gone_without_outcar_resubmits(tmp_path, scheduler):
+    cwd = _task(tmp_path)
+    _submitted(cwd)
+    assert needs_submission(cwd, scheduler) == "previous job 7.server failed"
+
+
+def test_foreign_qsub_pid_resubmits(tmp_path, scheduler):
+    cwd = _task(tmp_path)
+    _submitted(cwd)
+    (cwd / "qsub.pid").write_text("8.server")
+    assert needs_submission(cwd, scheduler) == "qsub.pid does not match the manifest"
+
+
+def test_packed_task_uses_pack_id(tmp_path, scheduler):
+    cwd = _task(tmp_path)
+    write_status(cwd, pack_id="9.server", index=0)
+    write_manifest(cwd, "9.server")
+    scheduler.states = {"9": "queued"}
+    assert not (cwd / "qsub.pid").exists()
+    assert recorded_job_id(cwd) == "9.server"
+    assert needs_submission(cwd, scheduler) is None
+
+
+def test_recorded_job_id_follows_the_manifest(tmp_path):
+    cwd = _task(tmp_path)
+    # Submitted alone first, then in a pack
+    _submitted(cwd, "7.server")
+    write_status(cwd, pack_id="9.server", index=0)
+    write_manifest(cwd, "9.server")
+    assert recorded_job_id(cwd) == "9.server"
+
+    # Resubmitted alone after the pack
+    _submitted(cwd, "12.server")
+    assert recorded_job_id(cwd) == "12.server"
+
+
+def test_recorded_job_id_without_manifest_prefers_qsub_pid(tmp_path):
+    cwd = _task(tmp_path)
+    assert recorded_job_id(cwd) == ""
+    write_status(cwd, pack_id="9.server")
+    assert recorded_job_id(cwd) == "9.server"
+    (cwd / "qsub.pid").write_text("7.server\n")
+    assert recorded_job_id(cwd) == "7.server"
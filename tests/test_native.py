@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+from pymatgen.core import Lattice, Structure
+from pymatgen.io.vasp.inputs import Kpoints, Poscar
+
+from ink.vasp.jobs import Job
+from ink.vasp.native import kpoints_options, potcar_options, species, write_kpoints
+
+POSCAR = Path(__file__).resolve().parents[1] / "data" / "POSCAR"
+
+
+@pytest.mark.parametrize("spec", ["vaspkit -task 103", "vaspkit -task 102 -kpr 0.03"])
+def test_native_inputs_false_runs_vaspkit(spec, tmp_path):
+    global_cfg = {"native_inputs": False, "potcar_dir": str(tmp_path)}
+    assert potcar_options(spec, global_cfg) is None
+    assert kpoints_options(spec, global_cfg) is None
+
+
+def test_vaspkit_commands_are_native_by_default(tmp_path):
+    global_cfg = {"potcar_dir": str(tmp_path), "potcar_variants": {"Li": "Li_sv"}}
+    assert potcar_options("vaspkit -task 103", global_cfg) == {"Li": "Li_sv"}
+    assert kpoints_options("vaspkit -task 102 -kpr 0.03", global_cfg) == (0.03, "Gamma")
+    # Other task codes and options still go to vaspkit
+    assert kpoints_options("vaspkit -task 102 -kpr 0.03 -mode 1", global_cfg) is None
+    assert potcar_options("vaspkit -task 104", global_cfg) is None
+
+
+def test_species_keeps_separate_blocks():
+    structure = Structure(
+        Lattice.cubic(5.0),
+        ["O", "Fe", "O"],
+        [[0, 0, 0], [0.5, 0.5, 0.5], [0.25, 0.25, 0.25]],
+    )
+    assert species(structure) == ["O", "Fe", "O"]
+    assert Poscar(structure).site_symbols == species(structure)
+    assert species(structure.get_sorted_structure()) == ["Fe", "O"]
+
+
+@pytest.mark.parametrize("kpr", [0.02, 0.03, 0.05])
+def test_native_kpoints_matches_job(tmp_path, monkeypatch, kpr):
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    native_dir = tmp_path / "native"
+    native_dir.mkdir()
+    (native_dir / "POSCAR").write_bytes(POSCAR.read_bytes())
+    mesh = write_kpoints(native_dir, kpr)
+
+    job = Job({"global": {"work_dir": str(tmp_path), "jobdb": str(tmp_path / "jobs.db")}})
+    job._write_kpoints(kpr, tmp_path, poscar=POSCAR)
+
+    expected = Kpoints.from_file(tmp_path / "KPOINTS")
+    written = Kpoints.from_file(native_dir / "KPOINTS")
+    assert tuple(expected.kpts[0]) == mesh
+    assert written.kpts == expected.kpts
+    assert written.style == expected.style
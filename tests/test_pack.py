@@ -0,0 +1,133 @@
+import shlex
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+from ink.vasp.manifest import write_manifest
+from ink.vasp.pack import (
+    _replaced_by,
+    core_sets,
+    cpu_ranges,
+    dispatch,
+    pack_header,
+    read_status,
+    write_pack,
+    write_status,
+)
+from ink.vasp.scheduler import PBSScheduler, SlurmScheduler, TorqueScheduler
+
+
+def test_core_sets_are_disjoint_and_full():
+    assert core_sets(list(range(8)), 4) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    # Leftover CPUs that do not fill a set stay idle
+    assert core_sets(list(range(10)), 4) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert core_sets([0, 2, 4], 1) == [[0], [2], [4]]
+
+
+def test_core_sets_with_too_few_cpus_use_them_all():
+    assert core_sets([0, 1], 4) == [[0, 1]]
+    assert core_sets([0, 1], 0) == [[0], [1]]
+
+
+def test_cpu_ranges():
+    assert cpu_ranges([8, 0, 1, 2, 3]) == "0-3,8"
+    assert cpu_ranges([5]) == "5"
+
+
+def _task(path, pack_dir, pack_id="9.server"):
+    path.mkdir()
+    (path / "jobscript.sh").write_text("echo ran > ran.txt\n")
+    write_status(path, pack_id=pack_id, pack_dir=str(pack_dir), index=0, state="submitted")
+    write_manifest(path, pack_id)
+    return path
+
+
+def test_replaced_by(tmp_path):
+    pack_dir = tmp_path / "packs" / "pack-1"
+    task = _task(tmp_path / "task", pack_dir)
+    assert _replaced_by(task, pack_dir) is None
+
+    # Resubmitted on its own
+    write_manifest(task, "12.server")
+    assert _replaced_by(task, pack_dir) == "12.server"
+
+    # Put in a later pack
+    write_status(task, pack_id="13.server", pack_dir=str(tmp_path / "packs" / "pack-2"))
+    assert _replaced_by(task, pack_dir) == "13.server"
+
+
+@pytest.fixture
+def restore_signals():
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT)}
+    yield
+    for sig, handler in handlers.items():
+        signal.signal(sig, handler)
+
+
+def test_dispatch_skips_task_resubmitted_alone(tmp_path, monkeypatch, restore_signals, capsys):
+    monkeypatch.setenv("PBS_JOBID", "9.server")
+    pack_dir = tmp_path / "packs" / "pack-1"
+    pack_dir.mkdir(parents=True)
+    kept = _task(tmp_path / "kept", pack_dir)
+    moved = _task(tmp_path / "moved", pack_dir)
+    write_manifest(moved, "12.server")
+    (pack_dir / "dirs.txt").write_text(f"{kept}\n{moved}\n")
+
+    assert dispatch(pack_dir, cores_per_task=1, cores=1) == 0
+    assert "skip " + str(moved) + ": resubmitted as 12.server" in capsys.readouterr().out
+
+    assert (kept / "ran.txt").is_file()
+    status = read_status(kept)
+    assert status["state"] == "completed" and status["exit_code"] == 0
+    assert status["pack_id"] == "9.server"
+
+    assert not (moved / "ran.txt").exists()
+    assert read_status(moved)["state"] == "submitted"
+
+
+def _pack_job(tmp_path, scheduler, pack_cfg=None):
+    return SimpleNamespace(work_dir=tmp_path, scheduler=scheduler, config={"global": {"pack": pack_cfg or {}}})
+
+
+def _pack_tasks(tmp_path, jobscript, n=3):
+    dirs = []
+    for i in range(n):
+        d = tmp_path / f"task {i}"
+        d.mkdir()
+        (d / "jobscript.sh").write_text(jobscript)
+        dirs.append(d)
+    return dirs
+
+
+def test_pack_header_requests_the_whole_pack(tmp_path):
+    jobscript = (
+        "#!/bin/bash\n#PBS -N relax\n#PBS -l walltime=1:00:00,nodes=1:ppn=4\n"
+        "#PBS -l select=1:ncpus=4\nmpirun vasp\n"
+    )
+    dirs = _pack_tasks(tmp_path, jobscript)
+
+    header = pack_header(_pack_job(tmp_path, PBSScheduler()), dirs, cores_per_task=4, cores=64)
+    assert header == ["#PBS -N relax", "#PBS -l walltime=1:00:00", "#PBS -l select=1:ncpus=64:mpiprocs=64"]
+    header = pack_header(_pack_job(tmp_path, TorqueScheduler()), dirs, cores_per_task=4)
+    assert header[-1] == "#PBS -l nodes=1:ppn=12"
+
+    slurm = "#!/bin/bash\n#SBATCH -J relax\n#SBATCH -N 1\n#SBATCH --ntasks-per-node=4\n#SBATCH -t 1:00:00\n"
+    (dirs[0] / "jobscript.sh").write_text(slurm)
+    header = pack_header(_pack_job(tmp_path, SlurmScheduler()), dirs, cores_per_task=2)
+    assert header == ["#SBATCH -J relax", "#SBATCH -t 1:00:00", "#SBATCH --nodes=1", "#SBATCH --ntasks=6"]
+
+
+def test_configured_pack_header_is_used_verbatim(tmp_path):
+    dirs = _pack_tasks(tmp_path, "#PBS -l nodes=1:ppn=4\n")
+    job = _pack_job(tmp_path, PBSScheduler(), {"header": ["#PBS -q fat", "#PBS -l select=2:ncpus=128"]})
+    assert pack_header(job, dirs, cores_per_task=4, cores=64) == ["#PBS -q fat", "#PBS -l select=2:ncpus=128"]
+
+
+def test_pack_command_survives_spaces(tmp_path):
+    work_dir = tmp_path / "my work"
+    work_dir.mkdir()
+    dirs = _pack_tasks(work_dir, "#PBS -l nodes=1:ppn=4\n")
+    script = write_pack(_pack_job(work_dir, PBSScheduler()), dirs, cores_per_task=4, cores=8)
+    command = shlex.split(script.read_text().splitlines()[-1])
+    assert command[-5:] == [str(script.parent), "--cores-per-task", "4", "--cores", "8"]
@@ -0,0 +1,93 @@
+import pytest
+
+from ink.vasp.main import _topological_order
+from ink.vasp.plan import chain_cost, default_nbands, sort_key
+
+# 'tiny' is cheap but gates the most expensive task
+TASKS = ["big", "tiny", "huge", "last"]
+DEPS = {"huge": ["tiny"], "last": ["big", "huge"]}
+COSTS = {"big": 50.0, "tiny": 1.0, "huge": 100.0, "last": 5.0}
+
+
+def _plan(policy):
+    return _topological_order(TASKS, DEPS, sort_key(policy, TASKS, DEPS, COSTS))
+
+
+def _respects_deps(order):
+    position = {name: i for i, name in enumerate(order)}
+    return all(position[dep] < position[name] for name, deps in DEPS.items() for dep in deps)
+
+
+def test_chain_cost_adds_the_most_expensive_dependent_chain():
+    assert chain_cost(TASKS, DEPS, COSTS) == {"big": 55.0, "tiny": 106.0, "huge": 105.0, "last": 5.0}
+
+
+def test_longest_starts_the_most_expensive_chain_first():
+    order = _plan("longest")
+    assert order == ["tiny", "huge", "big", "last"]
+    assert _respects_deps(order)
+
+
+def test_shortest_starts_the_cheapest_ready_task_first():
+    order = _plan("shortest")
+    assert order == ["tiny", "big", "huge", "last"]
+    assert _respects_deps(order)
+
+
+def test_cheap_task_waits_for_expensive_dependency():
+    deps = {"tiny": ["huge"]}
+    key = sort_key("shortest", ["huge", "tiny"], deps, {"huge": 100.0, "tiny": 1.0})
+    assert _topological_order(["huge", "tiny"], deps, key) == ["huge", "tiny"]
+
+
+def test_unknown_policy_raises():
+    with pytest.raises(ValueError, match="Unknown plan policy"):
+        sort_key("random", TASKS, DEPS, COSTS)
+
+
+def test_default_nbands():
+    # Si2: 8 electrons -> max(5 + 3, 4)
+    assert default_nbands(8, 2) == 8
+    # Many electrons: the 0.6 * NELECT term wins
+    assert default_nbands(400, 20) == 240
+
+
+def test_potcar_values_use_the_index_only_for_the_library_assembly(tmp_path, monkeypatch):
+    from ink.vasp import plan
+    from ink.vasp.plan import potcar_values
+    from test_potcar import dataset
+
+    monkeypatch.setenv("INK_POTCAR_INDEX", str(tmp_path / "index"))
+    root = tmp_path / "potpaw_PBE"
+    for variant, zval, enmax in [("Li_sv", 3, 499.0), ("O", 6, 400.0)]:
+        (root / variant).mkdir(parents=True)
+        (root / variant / "POTCAR").write_bytes(dataset(variant, zval, enmax))
+    global_cfg = {"potcar_dir": str(root)}
+
+    potcar = tmp_path / "POTCAR"
+    potcar.write_bytes(dataset("Li_sv", 3, 499.0) + dataset("O", 6, 400.0))
+    scanned = []
+    scan_datasets = plan.scan_datasets
+    monkeypatch.setattr(plan, "scan_datasets", lambda path: scanned.append(path) or scan_datasets(path))
+    assert potcar_values(potcar, ["Li", "O"], global_cfg) == ([3.0, 6.0], 499.0)
+    assert scanned == []
+
+    # Same size, another Li variant: the file's own values count
+    potcar.write_bytes(dataset("Li_pv", 1, 140.0) + dataset("O", 6, 400.0))
+    assert potcar_values(potcar, ["Li", "O"], global_cfg) == ([1.0, 6.0], 400.0)
+    assert scanned == [potcar]
+
+
+def test_potcar_values_report_a_library_dataset_without_zval(tmp_path, monkeypatch):
+    from ink.vasp.plan import potcar_values
+    from test_potcar import dataset
+
+    monkeypatch.setenv("INK_POTCAR_INDEX", str(tmp_path / "index"))
+    root = tmp_path / "potpaw_PBE"
+    (root / "O").mkdir(parents=True)
+    broken = dataset("O", 6, 400.0).replace(b"ZVAL   =", b"ZVAL? ==")
+    (root / "O" / "POTCAR").write_bytes(broken)
+    potcar = tmp_path / "POTCAR"
+    potcar.write_bytes(broken)
+    with pytest.raises(ValueError, match="no ZVAL in the POTCAR library for PAW_PBE O 01Jan2000"):
+        potcar_values(potcar, ["O"], {"potcar_dir": str(root)})
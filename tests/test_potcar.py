@@ -0,0 +1,101 @@
+import pytest
+
+from ink.vasp import potcar
+from ink.vasp.potcar import PotcarLibrary, variant_for
+
+
+def dataset(variant, zval, enmax):
+    return (
+        f"  PAW_PBE {variant} 01Jan2000\n"
+        f" {zval:.1f}\n"
+        " parameters from PSCTR are:\n"
+        f"   VRHFIN ={variant.split('_')[0]}: s p\n"
+        f"   TITEL  = PAW_PBE {variant} 01Jan2000\n"
+        f"   POMASS =    1.000; ZVAL   =   {zval:.3f}    mass and valenz\n"
+        f"   ENMAX  =  {enmax:.3f}; ENMIN  =  300.000 eV\n"
+        " End of Dataset\n"
+    ).encode()
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "potpaw_PBE"
+    for variant, zval, enmax in [("Li_sv", 3, 499.0), ("Li", 1, 140.0), ("O", 6, 400.0), ("Fe_pv", 14, 293.2)]:
+        (root / variant).mkdir(parents=True)
+        (root / variant / "POTCAR").write_bytes(dataset(variant, zval, enmax))
+    return root
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Library roots passed to ``build_index``."""
+    calls = []
+    build_index = potcar.build_index
+
+    def counting(root, *args, **kwargs):
+        calls.append(root)
+        return build_index(root, *args, **kwargs)
+
+    monkeypatch.setattr(potcar, "build_index", counting)
+    return calls
+
+
+def test_assemble_concatenates_datasets(library, tmp_path):
+    lib = PotcarLibrary(library, tmp_path / "index")
+    expected = b"".join((library / v / "POTCAR").read_bytes() for v in ("O", "Li_sv", "O"))
+    assert lib.assemble(["O", "Li", "O"]) == expected
+    assert lib.assemble(["Li"], {"Li": "Li"}) == (library / "Li" / "POTCAR").read_bytes()
+    assert lib.zval("Li_sv") == 3.0 and lib.enmax("O") == 400.0
+
+
+def test_combined_file_is_indexed_by_titel(tmp_path):
+    root = tmp_path / "lib"
+    root.mkdir()
+    (root / "POTCAR").write_bytes(dataset("Sb", 5, 172.0) + dataset("W_sv", 14, 223.0))
+    lib = PotcarLibrary(root, tmp_path / "index")
+    assert lib.get("W_sv") == dataset("W_sv", 14, 223.0)
+    assert lib.assemble(["W"]) == dataset("W_sv", 14, 223.0)
+
+
+def test_unknown_variant_raises(library, tmp_path):
+    with pytest.raises(FileNotFoundError, match="Fe_sv"):
+        PotcarLibrary(library, tmp_path / "index").assemble(["Fe"], {"Fe": "Fe_sv"})
+
+
+def test_index_is_reused_until_a_file_changes(library, tmp_path, builds):
+    index_dir = tmp_path / "index"
+    assert PotcarLibrary(library, index_dir).enmax("O") == 400.0
+    assert PotcarLibrary(library, index_dir).enmax("O") == 400.0
+    assert len(builds) == 1
+
+    (library / "O" / "POTCAR").write_bytes(dataset("O", 6, 450.0))
+    lib = PotcarLibrary(library, index_dir)
+    assert lib.enmax("O") == 450.0
+    assert lib.assemble(["O"]) == dataset("O", 6, 450.0)
+    assert len(builds) == 2
+
+
+def test_added_variant_rebuilds_index(library, tmp_path, builds):
+    index_dir = tmp_path / "index"
+    PotcarLibrary(library, index_dir).index
+    (library / "W_sv").mkdir()
+    (library / "W_sv" / "POTCAR").write_bytes(dataset("W_sv", 14, 223.0))
+    assert PotcarLibrary(library, index_dir).zval(variant_for("W")) == 14.0
+    assert len(builds) == 2
+
+
+def test_potcar_command_shows_unparsed_values_as_dash(library, tmp_path, monkeypatch, capsys):
+    from ink.vasp.jobs import Job
+
+    monkeypatch.setenv("INK_POTCAR_INDEX", str(tmp_path / "index"))
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    # No ENMAX line: scan_datasets stores None
+    broken = dataset("Xx", 2, 100.0).replace(b"   ENMAX  =  100.000; ENMIN  =  300.000 eV\n", b"")
+    (library / "Xx").mkdir()
+    (library / "Xx" / "POTCAR").write_bytes(broken)
+
+    job = Job({"global": {"work_dir": str(tmp_path), "jobdb": str(tmp_path / "jobs.db")}})
+    job.potcar(["Xx", "O"], library=library, rebuild=False)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1].split() == ["Xx", "2.000", "-", "PAW_PBE", "Xx", "01Jan2000"]
+    assert lines[2].split()[:3] == ["O", "6.000", "400.000"]
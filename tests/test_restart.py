@@ -0,0 +1,76 @@
+import json
+
+from ink.vasp.restart import RESTART_NAME, load_attempts, restart
+
+
+class FakeStructure(str):
+    def copy(self):
+        return FakeStructure(self)
+
+
+class FakeJob:
+    """The parts of ``Job`` that ``restart`` uses."""
+
+    def __init__(self):
+        self.config = {"relax": {}}
+        self.submitted = []
+
+    def _structure(self, path):
+        return FakeStructure(path.read_text())
+
+    def _write_poscar(self, structure, cwd):
+        (cwd / "POSCAR").write_text(structure)
+
+    def _write_incar(self, incar, cwd):
+        (cwd / "INCAR").write_text("".join(f"{k} = {v}\n" for k, v in incar.items()))
+
+    def submit(self, cwd):
+        self.submitted.append(cwd)
+        return f"{len(self.submitted)}.server"
+
+
+def _run_attempt(cwd, n):
+    for name in ("OUTCAR", "OSZICAR", "vasprun.xml"):
+        (cwd / name).write_text(f"{name} {n}")
+    (cwd / "CONTCAR").write_text(f"structure after attempt {n}")
+
+
+def test_archives_are_numbered_per_attempt(tmp_path):
+    job = FakeJob()
+    (tmp_path / "INCAR").write_text("NSW = 100\nIBRION = 2\n")
+    (tmp_path / "POSCAR").write_text("initial structure")
+
+    for attempt in (1, 2):
+        _run_attempt(tmp_path, attempt)
+        assert restart(job, tmp_path, "relax", "nsw limit") == f"{attempt}.server"
+
+    assert (tmp_path / "OUTCAR.1").read_text() == "OUTCAR 1"
+    assert (tmp_path / "OUTCAR.2").read_text() == "OUTCAR 2"
+    assert (tmp_path / "POSCAR.1").read_text() == "initial structure"
+    assert (tmp_path / "POSCAR.2").read_text() == "structure after attempt 1"
+    assert (tmp_path / "POSCAR").read_text() == "structure after attempt 2"
+    assert not (tmp_path / "OUTCAR").exists()
+
+    record = load_attempts(tmp_path)
+    assert record["attempts"] == 2
+    assert [h["job_id"] for h in record["history"]] == ["1.server", "2.server"]
+
+
+def test_stops_at_max_attempts(tmp_path):
+    job = FakeJob()
+    (tmp_path / "INCAR").write_text("NSW = 100\n")
+    (tmp_path / RESTART_NAME).write_text(json.dumps({"attempts": 3, "history": []}))
+    assert restart(job, tmp_path, "relax", "nsw limit", max_attempts=3) is None
+    assert job.submitted == []
+
+
+def test_empty_contcar_keeps_poscar(tmp_path):
+    job = FakeJob()
+    (tmp_path / "INCAR").write_text("NSW = 100\n")
+    (tmp_path / "POSCAR").write_text("initial structure")
+    (tmp_path / "OUTCAR").write_text("OUTCAR 1")
+    (tmp_path / "CONTCAR").write_text("")
+    restart(job, tmp_path, "relax", "terminated")
+    assert (tmp_path / "POSCAR").read_text() == "initial structure"
+    assert not (tmp_path / "POSCAR.1").exists()
+    assert (tmp_path / "OUTCAR.1").is_file()
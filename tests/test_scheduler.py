@@ -0,0 +1,59 @@
+import subprocess
+
+import pytest
+
+from ink.vasp.scheduler import PBSScheduler, SchedulerQueryError, SlurmScheduler
+
+QSTAT = """\
+Job id            Name             User              Time Use S Queue
+----------------  ---------------- ----------------  -------- - -----
+101.pbs01         relax            alice             00:10:00 R workq
+102[].pbs01       array            alice                    0 B workq
+102[0].pbs01      array            alice             00:01:00 R workq
+102[1].pbs01      array            alice                    0 Q workq
+103.pbs01         done             alice             00:20:00 F workq
+"""
+
+
+def test_pbs_parse_query():
+    states = PBSScheduler.parse_query(QSTAT)
+    assert states == {
+        "101": "running",
+        "102[]": "running",
+        "102[0]": "running",
+        "102[1]": "queued",
+        "103": "completed",
+    }
+
+
+def test_pbs_parse_query_skips_header_and_blank_lines():
+    assert PBSScheduler.parse_query("") == {}
+    assert PBSScheduler.parse_query("Job id  Name  User  Time Use S Queue\n") == {}
+    assert PBSScheduler.parse_query(QSTAT + "\n") == PBSScheduler.parse_query(QSTAT)
+
+
+def test_slurm_parse_query():
+    output = "2001 RUNNING\n2002_3 PENDING\n2003 TIMEOUT\n2004 WEIRD_STATE\n\n"
+    assert SlurmScheduler.parse_query(output) == {
+        "2001": "running",
+        "2002_3": "queued",
+        "2003": "failed",
+        "2004": "weird_state",
+    }
+
+
+def test_is_active_uses_one_snapshot(scheduler):
+    scheduler.states = {"1": "running", "2": "completed"}
+    assert scheduler.is_active("1.server")
+    scheduler.states = {}
+    assert not scheduler.is_active("2")
+    assert scheduler.is_active("1")
+
+
+def test_is_active_raises_when_query_fails(scheduler, monkeypatch):
+    def fail():
+        raise subprocess.CalledProcessError(1, ["qstat"])
+
+    monkeypatch.setattr(scheduler, "query", fail)
+    with pytest.raises(SchedulerQueryError):
+        scheduler.is_active("1")
@@ -0,0 +1,108 @@
+import errno
+
+import pytest
+
+from ink.vasp.staging import Store
+
+
+def _refuse(*modes, error=errno.EXDEV):
+    """A ``Store._link`` that fails for ``modes`` and records every attempt."""
+    tried = []
+    link = Store._link
+
+    def fake(obj, dst, mode):
+        tried.append(mode)
+        if mode in modes:
+            raise OSError(error, f"{mode} refused")
+        link(obj, dst, mode)
+
+    return fake, tried
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "input"
+    path.write_bytes(b"data" * 100)
+    return path
+
+
+def test_auto_falls_back_in_order(tmp_path, src, monkeypatch):
+    fake, tried = _refuse("reflink", "hardlink")
+    monkeypatch.setattr(Store, "_link", staticmethod(fake))
+    store = Store(tmp_path / "store")
+    assert store.materialize(src, tmp_path / "t1" / "POTCAR") == "symlink"
+    assert tried == ["reflink", "hardlink", "symlink"]
+    # The working mode is remembered per file system pair
+    assert store.materialize(src, tmp_path / "t2" / "POTCAR") == "symlink"
+    assert tried[3:] == ["symlink"]
+    assert (tmp_path / "t2" / "POTCAR").read_bytes() == src.read_bytes()
+
+
+def test_rewritten_files_never_share_data(tmp_path, src, monkeypatch):
+    fake, tried = _refuse("reflink", error=errno.EOPNOTSUPP)
+    monkeypatch.setattr(Store, "_link", staticmethod(fake))
+    store = Store(tmp_path / "store")
+    assert store.materialize(src, tmp_path / "t" / "CHGCAR") == "copy"
+    assert tried == ["reflink", "copy"]
+    assert not (tmp_path / "t" / "CHGCAR").is_symlink()
+
+
+def test_unexpected_errors_propagate(tmp_path, src, monkeypatch):
+    fake, _ = _refuse("reflink", error=errno.EACCES)
+    monkeypatch.setattr(Store, "_link", staticmethod(fake))
+    with pytest.raises(OSError):
+        Store(tmp_path / "store").materialize(src, tmp_path / "t" / "POTCAR")
+
+
+def test_configured_mode_and_unchanged(tmp_path, src):
+    store = Store(tmp_path / "store", {"CHGCAR": "hardlink"})
+    dst = tmp_path / "t" / "CHGCAR"
+    assert store.materialize(src, dst) == "hardlink"
+    assert store.materialize(src, dst) == "unchanged"
+    assert store.materialize(src, dst, mode="copy") == "copy"
+
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        Store(tmp_path / "store", {"POTCAR": "teleport"})
+    with pytest.raises(ValueError):
+        Store(tmp_path / "store").materialize(tmp_path / "x", tmp_path / "t" / "POTCAR", mode="teleport")
+
+
+def test_rewritten_files_bypass_the_store_and_are_not_recopied(tmp_path, src, monkeypatch):
+    fake, tried = _refuse("reflink", error=errno.EOPNOTSUPP)
+    monkeypatch.setattr(Store, "_link", staticmethod(fake))
+    store = Store(tmp_path / "store")
+    dst = tmp_path / "t" / "WAVECAR"
+    assert store.materialize(src, dst) == "copy"
+    assert not (tmp_path / "store").exists()
+    assert dst.stat().st_mtime_ns == src.stat().st_mtime_ns
+
+    assert store.materialize(src, dst) == "unchanged"
+    assert tried == ["reflink", "copy"]
+
+    # A rewritten source is copied again
+    src.write_bytes(b"new data")
+    assert store.materialize(src, dst) == "copy"
+    assert dst.read_bytes() == b"new data"
+
+
+def test_remembered_mode_falls_back_when_it_fails(tmp_path, src, monkeypatch):
+    store = Store(tmp_path / "store")
+    assert store.materialize(src, tmp_path / "t1" / "POTCAR") in ("reflink", "hardlink")
+    remembered = store.materialize(src, tmp_path / "t2" / "POTCAR")
+
+    # The object reached its link count cap
+    fake, tried = _refuse("reflink", "hardlink", error=errno.EMLINK)
+    monkeypatch.setattr(Store, "_link", staticmethod(fake))
+    assert store.materialize(src, tmp_path / "t3" / "POTCAR") == "symlink"
+    assert tried[0] == remembered
+    # The remembered mode is kept for other files
+    assert list(store._auto_modes.values()) == [remembered]
+
+
+def test_copy_mode_keeps_a_matching_copy(tmp_path, src):
+    store = Store(tmp_path / "store")
+    dst = tmp_path / "t" / "POTCAR"
+    assert store.materialize(src, dst, mode="copy") == "copy"
+    assert store.materialize(src, dst, mode="copy") == "unchanged"
@@ -0,0 +1,131 @@
+import os
+
+from ink.vasp.submitd import MISSING_SNAPSHOTS, SubmitQueue
+
+
+def _queue(tmp_path, names="abc"):
+    dirs = []
+    for name in names:
+        (tmp_path / name).mkdir()
+        dirs.append(tmp_path / name)
+    queue = SubmitQueue(tmp_path / "queue.sqlite")
+    queue.add(dirs)
+    return queue, [str(d.resolve()) for d in dirs]
+
+
+def _pending(queue):
+    return [directory for directory, _, _ in queue.rows("pending")]
+
+
+def test_add_keeps_order_and_ignores_duplicates(tmp_path):
+    queue, dirs = _queue(tmp_path)
+    assert _pending(queue) == dirs
+    assert queue.add([tmp_path / "a"]) == 0
+    assert [d for d, _, _ in queue.rows("pending", 2)] == dirs[:2]
+
+
+def test_requeue_finished(tmp_path):
+    queue, dirs = _queue(tmp_path)
+    queue.set_state(dirs[0], "finished")
+    assert queue.add([tmp_path / "a"]) == 0
+    assert queue.add([tmp_path / "a"], requeue=True) == 1
+    assert _pending(queue) == dirs[1:] + dirs[:1]
+
+
+def test_retry_moves_to_back_then_fails(tmp_path):
+    queue, dirs = _queue(tmp_path)
+    assert queue.retry(dirs[0], "queue limit", max_attempts=2)
+    assert _pending(queue) == dirs[1:] + dirs[:1]
+    assert not queue.retry(dirs[0], "queue limit", max_attempts=2)
+    assert _pending(queue) == dirs[1:]
+    assert queue.counts() == {"pending": 2, "failed": 1}
+
+
+def test_claim_and_recover(tmp_path):
+    queue, (a, b, c) = _queue(tmp_path)
+    (tmp_path / "a" / "qsub.pid").write_text("1.old")
+    queue.mark_submitting(a)
+    queue.mark_submitting(b)
+    queue.mark_submitting(c)
+    # a: unchanged qsub.pid, b: none written, c: written after the mark
+    (tmp_path / "c" / "qsub.pid").write_text("3.new")
+    assert queue.recover() == (1, 2)
+    assert queue.rows("submitted") == [(c, "3.new", queue.rows("submitted")[0][2])]
+    assert sorted(_pending(queue)) == [a, b]
+
+
+def test_recover_ignores_file_server_clock(tmp_path):
+    queue, (a, _, _) = _queue(tmp_path)
+    queue.mark_submitting(a)
+    pid_file = tmp_path / "a" / "qsub.pid"
+    pid_file.write_text("1.new")
+    # mtime far in the past, as written by a file server with a slow clock
+    os.utime(pid_file, (1, 1))
+    assert queue.recover() == (1, 0)
+
+
+def _submitted(queue, dirs):
+    for i, directory in enumerate(dirs, start=1):
+        queue.set_state(directory, "submitted", job_id=f"{i}.s")
+    return queue.rows("submitted")[0][2]
+
+
+def test_refresh_finishes_jobs_that_left_the_scheduler(tmp_path):
+    queue, (a, b, c) = _queue(tmp_path)
+    now = _submitted(queue, (a, b, c))
+    snapshot = {"1": "running", "2": "completed"}
+    # 2 is listed as done: finished at once; 3 is not listed yet: grace period
+    assert queue.refresh(snapshot, now) == 1
+    # 3 must be missing from repeated snapshots
+    assert queue.refresh(snapshot, now + 60) == 0
+    assert queue.refresh(snapshot, now + 90) == 1
+    assert [d for d, _, _ in queue.rows("submitted")] == [a]
+
+
+def test_refresh_forgives_one_truncated_listing(tmp_path):
+    queue, dirs = _queue(tmp_path)
+    now = _submitted(queue, dirs) + 60
+    listing = {"1": "running", "2": "queued", "3": "held"}
+    assert MISSING_SNAPSHOTS == 2
+    assert queue.refresh({}, now) == 0
+    # Listed again: the miss is forgotten
+    assert queue.refresh(listing, now + 30) == 0
+    assert queue.refresh({}, now + 60) == 0
+    assert len(queue.rows("submitted")) == 3
+    assert queue.refresh({}, now + 90) == 3
+    assert queue.counts() == {"finished": 3}
+
+
+def test_requeued_job_starts_without_misses(tmp_path):
+    queue, (a, b, c) = _queue(tmp_path)
+    now = _submitted(queue, (a,)) + 60
+    queue.refresh({}, now)
+    queue.refresh({}, now + 30)
+    assert queue.counts()["finished"] == 1
+    queue.add([tmp_path / "a"], requeue=True)
+    now = _submitted(queue, (a,)) + 60
+    assert queue.refresh({}, now) == 0
+    assert queue.refresh({}, now + 30) == 1
+
+
+def test_explicit_zero_options_override_the_config(tmp_path, monkeypatch):
+    import ink.vasp.submitd as submitd
+    from ink.vasp.jobs import Job
+
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    calls = []
+    monkeypatch.setattr(submitd, "run_daemon", lambda job, queue, **kwargs: calls.append(kwargs))
+    job = Job(
+        {
+            "global": {
+                "work_dir": str(tmp_path),
+                "jobdb": str(tmp_path / "jobs.db"),
+                "submitd": {"limit": 50, "min_interval": 30, "max_interval": 600},
+            }
+        }
+    )
+    options = dict(enqueue_only=False, follow=False, requeue=False, force=False)
+
+    job.submitd(None, limit=0, min_interval=0, max_interval=0, **options)
+    job.submitd(None, limit=None, min_interval=None, max_interval=None, **options)
+    assert [(c["limit"], c["min_interval"], c["max_interval"]) for c in calls] == [(0, 0.0, 0.0), (50, 30.0, 600.0)]
@@ -0,0 +1,42 @@
+import pytest
+
+from ink.vasp.sweep import expand_sweep, point_name
+
+
+def test_product_expands_every_combination_in_order():
+    points = expand_sweep({"params": {"ENCUT": [400, 500], "strain": [-0.01, 0, 0.01]}})
+    assert len(points) == 6
+    assert points[0] == {"ENCUT": 400, "strain": -0.01}
+    assert points[1] == {"ENCUT": 400, "strain": 0}
+    assert points[-1] == {"ENCUT": 500, "strain": 0.01}
+
+
+def test_zip_pairs_values_by_position():
+    points = expand_sweep({"mode": "zip", "params": {"ENCUT": [400, 500], "kpoints": [0.04, 0.03]}})
+    assert points == [{"ENCUT": 400, "kpoints": 0.04}, {"ENCUT": 500, "kpoints": 0.03}]
+
+
+def test_scalar_param_is_a_single_value():
+    assert expand_sweep({"params": {"ENCUT": 520, "ISMEAR": [0, 1]}}) == [
+        {"ENCUT": 520, "ISMEAR": 0},
+        {"ENCUT": 520, "ISMEAR": 1},
+    ]
+
+
+def test_zip_with_unequal_lengths_raises():
+    with pytest.raises(ValueError, match=r"equally long lists, got lengths \[2, 3\]"):
+        expand_sweep({"mode": "zip", "params": {"ENCUT": [400, 500], "strain": [-0.01, 0, 0.01]}})
+
+
+@pytest.mark.parametrize("sweep", [{"mode": "grid", "params": {"ENCUT": [400]}}, {"params": {}}])
+def test_bad_sweep_block_raises(sweep):
+    with pytest.raises(ValueError):
+        expand_sweep(sweep)
+
+
+def test_point_name_is_stable():
+    sweep = {"params": {"ENCUT": [500], "strain": [[0.01, 0, -0.01]], "kpoints": ["data/KPOINTS"]}}
+    names = [point_name(p) for p in expand_sweep(sweep)]
+    assert names == ["ENCUT-500_strain-0.01,0,-0.01_kpoints-data_KPOINTS"]
+    assert [point_name(p) for p in expand_sweep(sweep)] == names
+    assert point_name({"kpoints": {"mode": "gamma", "mesh": [4, 4, 4]}}) == "kpoints-mode=gamma,mesh=4,4,4"
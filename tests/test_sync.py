@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from ink.vasp.sync import sync_file, sync_tree, up_to_date
+
+
+def _source(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "a.txt").write_text("a")
+    (src / "sub" / "b.txt").write_text("bb")
+    return src
+
+
+def test_first_sync_copies_everything(tmp_path):
+    src, dst = _source(tmp_path), tmp_path / "dst"
+    stats = sync_tree(src, dst)
+    assert (stats.copied, stats.unchanged, stats.bytes_copied) == (2, 0, 3)
+    assert (dst / "sub" / "b.txt").read_text() == "bb"
+
+
+def test_second_sync_copies_nothing(tmp_path):
+    src, dst = _source(tmp_path), tmp_path / "dst"
+    sync_tree(src, dst)
+    stats = sync_tree(src, dst)
+    assert (stats.copied, stats.unchanged) == (0, 2)
+
+
+def test_changed_and_deleted_files(tmp_path):
+    src, dst = _source(tmp_path), tmp_path / "dst"
+    sync_tree(src, dst)
+    (src / "a.txt").write_text("changed")
+    (src / "sub" / "b.txt").unlink()
+    (dst / "extra.txt").write_text("x")
+    stats = sync_tree(src, dst)
+    assert (stats.copied, stats.deleted) == (1, 2)
+    assert (dst / "a.txt").read_text() == "changed"
+    assert sorted(p.name for p in dst.rglob("*")) == ["a.txt", "sub"]
+
+
+def test_up_to_date_size_and_mtime(tmp_path):
+    src, dst = tmp_path / "s", tmp_path / "d"
+    src.write_text("1234")
+    dst.write_text("abcd")
+    os.utime(dst, (src.stat().st_atime, src.stat().st_mtime))
+    # Same size and mtime: trusted without reading the content
+    assert up_to_date(src, dst)
+    assert not up_to_date(src, dst, checksum=True)
+    os.utime(dst, (0, 0))
+    assert not up_to_date(src, dst)
+    assert not up_to_date(src, tmp_path / "missing")
+
+
+def test_link_modes(tmp_path):
+    src, dst = _source(tmp_path), tmp_path / "dst"
+    stats = sync_tree(src, dst, mode="symlink")
+    assert stats.linked == 2
+    assert os.readlink(dst / "a.txt") == str((src / "a.txt").resolve())
+    assert up_to_date((src / "a.txt").resolve(), dst / "a.txt", mode="symlink")
+    assert not up_to_date((src / "a.txt").resolve(), dst / "a.txt", mode="hardlink")
+    assert sync_tree(src, dst, mode="symlink").unchanged == 2
+
+
+def test_unknown_mode_is_rejected_for_files_too(tmp_path, monkeypatch):
+    from ink.vasp.jobs import Job
+
+    src = tmp_path / "phonon.yaml"
+    src.write_text("phonon")
+    with pytest.raises(ValueError, match="Unknown cp mode 'softlink'"):
+        sync_file(src, tmp_path / "copy.yaml", mode="softlink")
+
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    cwd = tmp_path / "relax"
+    cwd.mkdir()
+    job = Job(
+        {
+            "global": {"work_dir": str(tmp_path), "jobdb": str(tmp_path / "jobs.db")},
+            "relax": {"cp": {"phonon.yaml": {"to": "phonon.yaml", "mode": "softlink"}}},
+        }
+    )
+    # Even an up-to-date target does not hide the bad mode
+    (cwd / "phonon.yaml").write_text("phonon")
+    os.utime(cwd / "phonon.yaml", (src.stat().st_atime, src.stat().st_mtime))
+    with pytest.raises(ValueError, match="Unknown cp mode 'softlink' for 'phonon.yaml'"):
+        job._handle_cp("relax", cwd)
+
+
+def test_staged_cp_files_are_not_recopied(tmp_path, monkeypatch, capsys):
+    from ink.vasp.jobs import Job
+
+    monkeypatch.delenv("INK_JOBDB", raising=False)
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "CHGCAR").write_bytes(b"charge" * 1000)
+    cwd = tmp_path / "dos"
+    cwd.mkdir()
+    job = Job(
+        {
+            "global": {"work_dir": str(tmp_path), "jobdb": str(tmp_path / "jobs.db")},
+            "dos": {"cp": {"static/CHGCAR": "CHGCAR"}},
+        }
+    )
+    job._handle_cp("dos", cwd)
+    assert "Staged file" in capsys.readouterr().out
+    inode = (cwd / "CHGCAR").stat().st_ino
+
+    copies = []
+    monkeypatch.setattr("shutil.copyfile", lambda *args: copies.append(args))
+    job._handle_cp("dos", cwd)
+    assert copies == []
+    assert capsys.readouterr().out == ""
+    assert (cwd / "CHGCAR").stat().st_ino == inode
@@ -0,0 +1,113 @@
+import json
+import threading
+
+import pytest
+
+import ink.vasp.timing as timing
+from ink.vasp.timing import Timer, prometheus_text, summary, timed
+
+
+@pytest.fixture
+def timer(monkeypatch):
+    fresh = Timer()
+    monkeypatch.setattr(timing, "timer", fresh)
+    return fresh
+
+
+def test_nested_spans_are_counted_separately(timer):
+    @timed("write")
+    def write():
+        with timer.span("parse"):
+            pass
+
+    with timer.span("setup"):
+        write()
+        write()
+
+    spans = timer.report("relax")["spans"]
+    assert list(spans) == ["parse", "setup", "write"]
+    assert spans["setup"]["count"] == 1
+    assert spans["write"]["count"] == 2
+    assert spans["parse"]["count"] == 2
+    # The outer span includes the inner ones
+    assert spans["setup"]["total_s"] >= spans["write"]["total_s"] >= spans["parse"]["total_s"]
+    assert spans["write"]["max_s"] <= spans["write"]["total_s"]
+
+
+def test_spans_from_threads_are_aggregated(timer):
+    @timed("submit")
+    def submit():
+        pass
+
+    threads = [threading.Thread(target=lambda: [submit() for _ in range(100)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert timer.report()["spans"]["submit"]["count"] == 800
+
+
+def test_timed_keeps_the_function(timer):
+    @timed("x")
+    def f(a, b=2):
+        """Doc."""
+        return a + b
+
+    assert f(1, b=3) == 4
+    assert f.__name__ == "f" and f.__doc__ == "Doc."
+    with pytest.raises(ZeroDivisionError):
+        timed("y")(lambda: 1 / 0)()
+    assert timer.report()["spans"]["y"]["count"] == 1
+
+
+def _report():
+    timer = Timer()
+    timer.add("write_poscar", 0.25)
+    timer.add("write_poscar", 0.75)
+    timer.add("submit", 1.5)
+    return timer.report("relax")
+
+
+def test_prometheus_text():
+    report = _report()
+    lines = prometheus_text(report).splitlines()
+    assert 'ink_phase_seconds{command="relax",phase="write_poscar"} 1.000000' in lines
+    assert 'ink_phase_seconds{command="relax",phase="submit"} 1.500000' in lines
+    assert 'ink_phase_calls{command="relax",phase="write_poscar"} 2' in lines
+    assert any(line.startswith(f'ink_run_seconds{{command="relax",version="{report["version"]}"}} ') for line in lines)
+    assert lines.count("# TYPE ink_phase_seconds gauge") == 1
+    # Every sample line is "<metric>{labels} <number>"
+    for line in lines:
+        if not line.startswith("#"):
+            float(line.rsplit(" ", 1)[1])
+
+
+def test_summary():
+    lines = summary(_report()).splitlines()
+    assert lines[0].split() == ["phase", "calls", "total", "s", "max", "s"]
+    assert lines[1].split() == ["submit", "1", "1.500", "1.500"]
+    assert lines[2].split() == ["write_poscar", "2", "1.000", "0.750"]
+    assert lines[3].split()[0] == "wall"
+
+
+def test_export_writes_configured_outputs(tmp_path, capsys):
+    timer = Timer()
+    timer.add("submit", 0.5)
+    textfile_dir = tmp_path / "textfile"
+    textfile_dir.mkdir()
+    global_cfg = {"timing": {"report": "timing.json", "textfile": str(textfile_dir), "print": True}}
+
+    timer.export(global_cfg, "batch", work_dir=tmp_path)
+
+    report = json.loads((tmp_path / "timing.json").read_text())
+    assert report["command"] == "batch"
+    assert report["spans"]["submit"] == {"count": 1, "total_s": 0.5, "mean_s": 0.5, "max_s": 0.5}
+    assert "ink_phase_calls{command=\"batch\",phase=\"submit\"} 1" in (textfile_dir / "ink_batch.prom").read_text()
+    assert [p.name for p in textfile_dir.iterdir()] == ["ink_batch.prom"]
+    assert "submit" in capsys.readouterr().out
+
+
+def test_export_without_timing_config_writes_nothing(tmp_path, capsys):
+    Timer().export({}, "batch", work_dir=tmp_path)
+    assert list(tmp_path.iterdir()) == []
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from ink.vasp import watch
+from ink.vasp.watch import Progress, parse_outcar, read_new_lines, update
+
+FORCE_BLOCK = [
+    " POSITION                                       TOTAL-FORCE (eV/Angst)",
+    " -----------------------------------------------------------------------------------",
+    "      0.00000      0.00000      0.00000         0.000000      0.000000      0.300000",
+    "      1.00000      1.00000      1.00000         0.000000      0.400000      0.300000",
+    " -----------------------------------------------------------------------------------",
+    "    total drift:                                0.000000      0.000000      0.000000",
+]
+
+
+def append(path, text):
+    with path.open("a") as f:
+        f.write(text)
+
+
+def test_partial_last_line_is_read_again(tmp_path):
+    oszicar = tmp_path / "OSZICAR"
+    oszicar.write_text("DAV:   1    0.1E+02\nDAV:   2")
+    progress = Progress()
+    assert read_new_lines(oszicar, progress, "oszicar") == ["DAV:   1    0.1E+02"]
+
+    append(oszicar, "    0.2E+01\n")
+    assert read_new_lines(oszicar, progress, "oszicar") == ["DAV:   2    0.2E+01"]
+    assert read_new_lines(oszicar, progress, "oszicar") == []
+    assert progress.oszicar_offset == oszicar.stat().st_size
+
+
+def test_truncated_file_is_read_from_the_start(tmp_path):
+    oszicar = tmp_path / "OSZICAR"
+    oszicar.write_text("DAV:   1\nDAV:   2\n   1 F= -.1E+02 E0= -.1E+02  d E =-.1E+02\n")
+    progress = Progress()
+    update(tmp_path, progress)
+    assert progress.ionic_steps == 1
+
+    oszicar.write_text("DAV:   1\n")
+    assert read_new_lines(oszicar, progress, "oszicar") == ["DAV:   1"]
+    assert progress.ionic_steps == 0 and progress.energy is None
+
+
+def test_replaced_file_is_read_from_the_start(tmp_path):
+    outcar = tmp_path / "OUTCAR"
+    outcar.write_text("\n".join(FORCE_BLOCK) + "\n")
+    progress = Progress()
+    update(tmp_path, progress)
+    assert progress.max_force == pytest.approx(0.5)
+
+    # Longer than before, so only the new inode tells it is another file
+    new = tmp_path / "OUTCAR.new"
+    new.write_text("restarted\n" * 100)
+    os.replace(new, outcar)
+    lines = read_new_lines(outcar, progress, "outcar")
+    assert lines == ["restarted"] * 100
+    assert progress.max_force is None
+    assert progress.outcar_inode == outcar.stat().st_ino
+
+
+def test_first_read_of_large_outcar_starts_inside_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch, "OUTCAR_WINDOW", 40)
+    outcar = tmp_path / "OUTCAR"
+    outcar.write_text("x" * 100 + "\n" + "a line of 30 characters.......\nlast\n")
+    progress = Progress()
+    lines = read_new_lines(outcar, progress, "outcar", watch.OUTCAR_WINDOW)
+    # The window starts inside the 'x' line, which is dropped
+    assert lines == ["a line of 30 characters.......", "last"]
+    assert progress.outcar_offset == outcar.stat().st_size
+
+    append(outcar, "more\n")
+    assert read_new_lines(outcar, progress, "outcar", watch.OUTCAR_WINDOW) == ["more"]
+
+
+def test_force_block_split_across_reads(tmp_path):
+    outcar = tmp_path / "OUTCAR"
+    progress = Progress()
+    outcar.write_text("\n".join(FORCE_BLOCK[:3]) + "\n" + FORCE_BLOCK[3][:30])
+    update(tmp_path, progress)
+    assert progress.max_force is None
+    assert progress.force_rulers == 1
+
+    append(outcar, FORCE_BLOCK[3][30:] + "\n" + "\n".join(FORCE_BLOCK[4:]) + "\n")
+    update(tmp_path, progress)
+    assert progress.max_force == pytest.approx(0.5)
+    assert progress.force_rulers == -1
+    assert not progress.finished
+
+    parse_outcar([" General timing and accounting informations for this job:"], progress)
+    assert progress.finished